@@ -8,6 +8,11 @@ from src.db.base import Base
 from src.core.config import settings
 from src.models import user_model
 from src.models import reservation_model
+from src.models import facility_model
+from src.models import waitlist_model
+from src.models import idempotency_model
+from src.models import token_model
+from src.models import rate_limit_model
 
 
 sys.path.insert(0, dirname(dirname(abspath(__file__))))
@@ -0,0 +1,33 @@
+"""Índices trigram para el buscador de usuarios
+
+Revision ID: 4d8e2b6f1c90
+Revises: 9f3c1a7d5e21
+Create Date: 2026-10-19 11:00:00.000000
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+
+# revision identifiers, used by Alembic.
+revision: str = '4d8e2b6f1c90'
+down_revision: Union[str, None] = '9f3c1a7d5e21'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+SEARCH_COLUMNS = ('full_name', 'email', 'apartment')
+
+
+def upgrade() -> None:
+    # pg_trgm permite que ILIKE '%texto%' use índice en vez de recorrer toda la tabla
+    op.execute("CREATE EXTENSION IF NOT EXISTS pg_trgm")
+    for column in SEARCH_COLUMNS:
+        op.create_index(
+            f'ix_users_{column}_trgm', 'users', [column], unique=False,
+            postgresql_using='gin', postgresql_ops={column: 'gin_trgm_ops'},
+        )
+
+
+def downgrade() -> None:
+    for column in SEARCH_COLUMNS:
+        op.drop_index(f'ix_users_{column}_trgm', table_name='users')
@@ -0,0 +1,58 @@
+"""Versiones de tablas para ETags de listados
+
+Revision ID: 9f3c1a7d5e21
+Revises: 22cb26324bb5
+Create Date: 2026-10-19 10:00:00.000000
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+# revision identifiers, used by Alembic.
+revision: str = '9f3c1a7d5e21'
+down_revision: Union[str, None] = '22cb26324bb5'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+VERSIONED_TABLES = ('users', 'reservations', 'facilities')
+VERSION_SLOTS = 16
+
+
+def upgrade() -> None:
+    # Varios contadores por tabla: cada conexión incrementa el suyo (pg_backend_pid() % slots)
+    # para que dos transacciones que escriben a la vez no se bloqueen en la misma fila
+    op.create_table('table_versions',
+                    sa.Column('table_name', sa.String(), nullable=False),
+                    sa.Column('slot', sa.SmallInteger(), nullable=False),
+                    sa.Column('version', sa.BigInteger(), server_default='0', nullable=False),
+                    sa.PrimaryKeyConstraint('table_name', 'slot')
+                    )
+    op.execute(f"""
+        INSERT INTO table_versions (table_name, slot)
+        SELECT t, s FROM unnest(ARRAY{list(VERSIONED_TABLES)}) AS t, generate_series(0, {VERSION_SLOTS - 1}) AS s
+    """)
+
+    op.execute(f"""
+        CREATE FUNCTION bump_table_version() RETURNS trigger AS $$
+        BEGIN
+            UPDATE table_versions SET version = version + 1
+            WHERE table_name = TG_TABLE_NAME AND slot = pg_backend_pid() % {VERSION_SLOTS};
+            RETURN NULL;
+        END
+        $$ LANGUAGE plpgsql
+    """)
+    for table in VERSIONED_TABLES:
+        op.execute(f"""
+            CREATE TRIGGER {table}_bump_version
+            AFTER INSERT OR UPDATE OR DELETE OR TRUNCATE ON {table}
+            FOR EACH STATEMENT EXECUTE FUNCTION bump_table_version()
+        """)
+
+
+def downgrade() -> None:
+    for table in VERSIONED_TABLES:
+        op.execute(f"DROP TRIGGER IF EXISTS {table}_bump_version ON {table}")
+    op.execute("DROP FUNCTION IF EXISTS bump_table_version()")
+    op.drop_table('table_versions')
@@ -0,0 +1,35 @@
+"""Contadores de rate limiting (tabla UNLOGGED)
+
+Revision ID: a4e9c1f7d3b2
+Revises: f2c8d4a6b1e3
+Create Date: 2026-10-19 18:20:00.000000
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+# revision identifiers, used by Alembic.
+revision: str = 'a4e9c1f7d3b2'
+down_revision: Union[str, None] = 'f2c8d4a6b1e3'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    # UNLOGGED: sin WAL ni réplica; son contadores efímeros y se escriben en cada petición limitada
+    op.create_table('rate_limit_counters',
+                    sa.Column('key', sa.String(length=32), nullable=False),
+                    sa.Column('window_start', sa.BigInteger(), nullable=False),
+                    sa.Column('hits', sa.Integer(), nullable=False),
+                    sa.Column('expires_at', sa.DateTime(timezone=True), nullable=False),
+                    sa.PrimaryKeyConstraint('key', 'window_start'),
+                    prefixes=['UNLOGGED']
+                    )
+    op.create_index(op.f('ix_rate_limit_counters_expires_at'), 'rate_limit_counters', ['expires_at'], unique=False)
+
+
+def downgrade() -> None:
+    op.drop_index(op.f('ix_rate_limit_counters_expires_at'), table_name='rate_limit_counters')
+    op.drop_table('rate_limit_counters')
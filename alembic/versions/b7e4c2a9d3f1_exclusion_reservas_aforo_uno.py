@@ -0,0 +1,45 @@
+"""Restricción de exclusión para instalaciones de aforo 1
+
+Revision ID: b7e4c2a9d3f1
+Revises: 4d8e2b6f1c90
+Create Date: 2026-10-19 12:30:00.000000
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+# revision identifiers, used by Alembic.
+revision: str = 'b7e4c2a9d3f1'
+down_revision: Union[str, None] = '4d8e2b6f1c90'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    # btree_gist permite combinar igualdad sobre texto (facility) con solape de rangos en un índice GiST
+    op.execute("CREATE EXTENSION IF NOT EXISTS btree_gist")
+
+    op.add_column('reservations', sa.Column('is_exclusive', sa.Boolean(), server_default=sa.false(), nullable=False))
+
+    # Las reservas vigentes de instalaciones de aforo 1 pasan a estar protegidas.
+    # Si ya hubiera solapes entre ellas, la creación de la restricción falla y hay que resolverlos antes.
+    op.execute("""
+        UPDATE reservations r
+        SET is_exclusive = true
+        FROM facilities f
+        WHERE f.name = r.facility AND f.capacity = 1 AND r.end_time > now()
+    """)
+
+    op.execute("""
+        ALTER TABLE reservations
+        ADD CONSTRAINT reservations_exclusive_no_overlap
+        EXCLUDE USING gist (facility WITH =, tstzrange(start_time, end_time) WITH &&)
+        WHERE (is_exclusive)
+    """)
+
+
+def downgrade() -> None:
+    op.drop_constraint('reservations_exclusive_no_overlap', 'reservations')
+    op.drop_column('reservations', 'is_exclusive')
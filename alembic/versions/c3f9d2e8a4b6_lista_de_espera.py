@@ -0,0 +1,46 @@
+"""Lista de espera de tramos completos
+
+Revision ID: c3f9d2e8a4b6
+Revises: b7e4c2a9d3f1
+Create Date: 2026-10-19 13:30:00.000000
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+# revision identifiers, used by Alembic.
+revision: str = 'c3f9d2e8a4b6'
+down_revision: Union[str, None] = 'b7e4c2a9d3f1'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    op.create_table('waitlist',
+                    sa.Column('id', sa.Integer(), nullable=False),
+                    sa.Column('user_id', sa.Integer(), nullable=False),
+                    sa.Column('facility', sa.String(), nullable=False),
+                    sa.Column('start_time', sa.DateTime(timezone=True), nullable=False),
+                    sa.Column('end_time', sa.DateTime(timezone=True), nullable=False),
+                    sa.Column('status', sa.String(), server_default='waiting', nullable=False),
+                    sa.Column('reservation_id', sa.Integer(), nullable=True),
+                    sa.Column('created_at', sa.DateTime(timezone=True), server_default=sa.text('now()'), nullable=False),
+                    sa.Column('promoted_at', sa.DateTime(timezone=True), nullable=True),
+                    sa.ForeignKeyConstraint(['user_id'], ['users.id'], ondelete='CASCADE'),
+                    sa.ForeignKeyConstraint(['reservation_id'], ['reservations.id'], ondelete='SET NULL'),
+                    sa.PrimaryKeyConstraint('id')
+                    )
+    op.create_index(op.f('ix_waitlist_id'), 'waitlist', ['id'], unique=False)
+    op.create_index('ix_waitlist_queue', 'waitlist', ['facility', 'start_time', 'end_time', 'created_at'],
+                    unique=False, postgresql_where=sa.text("status = 'waiting'"))
+    op.create_index('uq_waitlist_waiting_user_slot', 'waitlist', ['user_id', 'facility', 'start_time', 'end_time'],
+                    unique=True, postgresql_where=sa.text("status = 'waiting'"))
+
+
+def downgrade() -> None:
+    op.drop_index('uq_waitlist_waiting_user_slot', table_name='waitlist')
+    op.drop_index('ix_waitlist_queue', table_name='waitlist')
+    op.drop_index(op.f('ix_waitlist_id'), table_name='waitlist')
+    op.drop_table('waitlist')
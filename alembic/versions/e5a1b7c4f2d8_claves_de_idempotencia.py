@@ -0,0 +1,37 @@
+"""Claves de idempotencia para la creación de reservas
+
+Revision ID: e5a1b7c4f2d8
+Revises: c3f9d2e8a4b6
+Create Date: 2026-10-19 14:30:00.000000
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+# revision identifiers, used by Alembic.
+revision: str = 'e5a1b7c4f2d8'
+down_revision: Union[str, None] = 'c3f9d2e8a4b6'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    op.create_table('idempotency_keys',
+                    sa.Column('user_id', sa.Integer(), nullable=False),
+                    sa.Column('key', sa.String(length=255), nullable=False),
+                    sa.Column('request_hash', sa.String(length=64), nullable=False),
+                    sa.Column('status_code', sa.Integer(), nullable=True),
+                    sa.Column('response_body', sa.Text(), nullable=True),
+                    sa.Column('created_at', sa.DateTime(timezone=True), server_default=sa.text('now()'), nullable=False),
+                    sa.Column('expires_at', sa.DateTime(timezone=True), nullable=False),
+                    sa.ForeignKeyConstraint(['user_id'], ['users.id'], ondelete='CASCADE'),
+                    sa.PrimaryKeyConstraint('user_id', 'key')
+                    )
+    op.create_index(op.f('ix_idempotency_keys_expires_at'), 'idempotency_keys', ['expires_at'], unique=False)
+
+
+def downgrade() -> None:
+    op.drop_index(op.f('ix_idempotency_keys_expires_at'), table_name='idempotency_keys')
+    op.drop_table('idempotency_keys')
@@ -0,0 +1,93 @@
+"""
+Avalancha del lunes por la mañana: N vecinos piden a la vez el mismo tramo de una
+instalación con aforo para `--capacity` personas.
+
+- lock:  cada petición en su transacción: SELECT ... FOR UPDATE + duplicados + COUNT + INSERT
+- actor: la cola de la instalación decide en memoria y guarda cada lote con un INSERT multi-fila
+
+Necesita Postgres con las migraciones aplicadas (usa DATABASE_URL). Crea una instalación
+y usuarios temporales y los borra al terminar.
+
+Uso: python -m benchmarks.booking_actor [--clients 200] [--capacity 20] [--slots 20]
+"""
+import argparse
+import asyncio
+import statistics
+import time
+from datetime import datetime, timedelta, timezone
+
+from fastapi import HTTPException
+from sqlalchemy import create_engine
+from sqlalchemy.orm import sessionmaker
+
+from benchmarks.booking_contention import run, setup, teardown
+from src.core.config import settings
+from src.services.booking import book_with_lock
+from src.services.booking_actor import BookingActors
+from src.services.facility_registry import FacilityInfo
+
+
+async def _timed_submit(actors: BookingActors, facility: FacilityInfo, user_id: int, start: datetime):
+    began = time.perf_counter()
+    try:
+        await actors.submit(facility, user_id, start, start + timedelta(hours=1))
+        accepted = True
+    except HTTPException:
+        accepted = False
+    return accepted, time.perf_counter() - began
+
+
+async def run_actor(session_factory, facility: FacilityInfo, user_ids: list, slots: int,
+                    first_slot: datetime, batch_size: int) -> None:
+    actors = BookingActors(session_factory, batch_size)
+    latencies, accepted = [], 0
+    started = time.perf_counter()
+    try:
+        for slot in range(slots):
+            start = first_slot + timedelta(hours=slot)
+            results = await asyncio.gather(*(_timed_submit(actors, facility, user_id, start) for user_id in user_ids))
+            for ok, latency in results:
+                accepted += ok
+                latencies.append(latency)
+    finally:
+        await actors.stop()
+    elapsed = time.perf_counter() - started
+
+    latencies.sort()
+    attempts = len(latencies)
+    expected = slots * min(facility.capacity, len(user_ids))
+    print(f"{'actor':10s} {attempts / elapsed:8.0f} intentos/s   "
+          f"p50 {statistics.median(latencies) * 1000:6.1f} ms   p99 {latencies[int(attempts * 0.99)] * 1000:7.1f} ms   "
+          f"aceptadas {accepted}/{expected}")
+    assert accepted == expected, "Cada tramo debe llenarse exactamente hasta el aforo"
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--clients", type=int, default=200)
+    parser.add_argument("--capacity", type=int, default=20)
+    parser.add_argument("--slots", type=int, default=20)
+    parser.add_argument("--batch", type=int, default=settings.BOOKING_BATCH_SIZE)
+    args = parser.parse_args()
+
+    # El modo lock necesita una conexión por cliente; el actor, una por lote en curso
+    engine = create_engine(settings.DATABASE_URL, pool_size=args.clients, max_overflow=0)
+    if engine.dialect.name != "postgresql":
+        raise SystemExit("Este benchmark necesita Postgres (DATABASE_URL)")
+    session_factory = sessionmaker(autocommit=False, autoflush=False, bind=engine)
+
+    teardown(session_factory)
+    facility, user_ids = setup(session_factory, args.clients, capacity=args.capacity)
+    try:
+        print(f"{args.clients} clientes simultáneos por tramo, aforo {args.capacity}, {args.slots} tramos")
+        base = datetime(2030, 1, 1, 8, 0, tzinfo=timezone.utc)
+        run(session_factory, "lock", book_with_lock, facility, user_ids, args.slots, base)
+        asyncio.run(run_actor(session_factory, facility, user_ids, args.slots,
+                              base + timedelta(days=30), args.batch))
+    finally:
+        teardown(session_factory)
+        engine.dispose()
+
+
+if __name__ == "__main__":
+    main()
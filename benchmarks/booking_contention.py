@@ -0,0 +1,129 @@
+"""
+Contención en una pista de pádel (aforo 1): N vecinos intentan a la vez el mismo tramo.
+
+- lock:      SELECT ... FOR UPDATE de la instalación + duplicados + COUNT + INSERT
+- exclusion: INSERT directo; la restricción de exclusión rechaza los solapes (23P01)
+
+Necesita Postgres con las migraciones aplicadas (usa DATABASE_URL). Crea una instalación
+y usuarios temporales y los borra al terminar.
+
+Uso: python -m benchmarks.booking_contention [--clients 32] [--slots 50]
+"""
+import argparse
+import statistics
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+from datetime import datetime, timedelta, timezone
+
+from fastapi import HTTPException
+from sqlalchemy import create_engine
+from sqlalchemy.orm import sessionmaker
+
+from src.core.config import settings
+from src.models.facility_model import Facility
+from src.models.reservation_model import Reservation
+from src.models.user_model import User
+from src.services.booking import book_exclusive, book_with_lock
+from src.services.facility_registry import FacilityInfo
+
+BENCH_FACILITY = "bench-padel"
+BENCH_EMAIL = "bench-{}@example.invalid"
+
+
+def setup(session_factory, clients: int, capacity: int = 1) -> tuple:
+    db = session_factory()
+    try:
+        facility = Facility(name=BENCH_FACILITY, price=15.0, capacity=capacity)
+        users = [User(email=BENCH_EMAIL.format(i), hashed_password="x") for i in range(clients)]
+        db.add_all([facility, *users])
+        db.commit()
+        info = FacilityInfo(id=facility.id, name=facility.name, price=facility.price, capacity=capacity)
+        return info, [user.id for user in users]
+    finally:
+        db.close()
+
+
+def teardown(session_factory) -> None:
+    db = session_factory()
+    try:
+        db.query(Reservation).filter(Reservation.facility == BENCH_FACILITY).delete()
+        db.query(Facility).filter(Facility.name == BENCH_FACILITY).delete()
+        db.query(User).filter(User.email.like(BENCH_EMAIL.format("%"))).delete(synchronize_session=False)
+        db.commit()
+    finally:
+        db.close()
+
+
+def attempt(session_factory, strategy, facility: FacilityInfo, user_id: int, start: datetime,
+            barrier: threading.Barrier):
+    db = session_factory()
+    try:
+        barrier.wait()
+        began = time.perf_counter()
+        try:
+            strategy(db, user_id, facility, start, start + timedelta(hours=1))
+            db.commit()
+            accepted = True
+        except HTTPException:
+            db.rollback()
+            accepted = False
+        return accepted, time.perf_counter() - began
+    finally:
+        db.close()
+
+
+def run(session_factory, name: str, strategy, facility: FacilityInfo, user_ids: list, slots: int,
+        first_slot: datetime) -> None:
+    latencies, accepted = [], 0
+    started = time.perf_counter()
+    with ThreadPoolExecutor(max_workers=len(user_ids)) as pool:
+        for slot in range(slots):
+            start = first_slot + timedelta(hours=slot)
+            barrier = threading.Barrier(len(user_ids))
+            futures = [
+                pool.submit(attempt, session_factory, strategy, facility, user_id, start, barrier)
+                for user_id in user_ids
+            ]
+            for future in futures:
+                ok, latency = future.result()
+                accepted += ok
+                latencies.append(latency)
+    elapsed = time.perf_counter() - started
+
+    latencies.sort()
+    attempts = len(latencies)
+    expected = slots * min(facility.capacity, len(user_ids))
+    print(f"{name:10s} {attempts / elapsed:8.0f} intentos/s   "
+          f"p50 {statistics.median(latencies) * 1000:6.1f} ms   p99 {latencies[int(attempts * 0.99)] * 1000:7.1f} ms   "
+          f"aceptadas {accepted}/{expected}")
+    assert accepted == expected, "Cada tramo debe llenarse exactamente hasta el aforo"
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--clients", type=int, default=32)
+    parser.add_argument("--slots", type=int, default=50)
+    args = parser.parse_args()
+
+    # Pool propio con una conexión por cliente, para que la espera sea la de la BD y no la del pool
+    engine = create_engine(settings.DATABASE_URL, pool_size=args.clients, max_overflow=0)
+    if engine.dialect.name != "postgresql":
+        raise SystemExit("Este benchmark necesita Postgres (DATABASE_URL)")
+    session_factory = sessionmaker(autocommit=False, autoflush=False, bind=engine)
+
+    teardown(session_factory)
+    facility, user_ids = setup(session_factory, args.clients)
+    try:
+        print(f"{args.clients} clientes simultáneos por tramo, {args.slots} tramos")
+        base = datetime(2030, 1, 1, 8, 0, tzinfo=timezone.utc)
+        run(session_factory, "lock", book_with_lock, facility, user_ids, args.slots, base)
+        run(session_factory, "exclusion", book_exclusive, facility, user_ids, args.slots,
+            base + timedelta(days=30))
+    finally:
+        teardown(session_factory)
+        engine.dispose()
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,39 @@
+"""
+Bytes en la red para los listados grandes del panel de admin, sin comprimir y comprimidos.
+
+Uso: python -m benchmarks.compression [--rows 10000]
+"""
+import argparse
+import time
+
+from src.core.compression import _BrotliEncoder, _GzipEncoder, brotli
+from src.core.config import settings
+from src.core.fast_json import rows_response
+from src.routers.reservations import RESERVATION_COLUMNS
+from benchmarks.serialization import synthetic_rows
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--rows", type=int, default=10_000)
+    args = parser.parse_args()
+
+    body = rows_response(RESERVATION_COLUMNS, synthetic_rows(args.rows)).body
+    encoders = [_GzipEncoder(settings.GZIP_LEVEL)]
+    if brotli is not None:
+        encoders.append(_BrotliEncoder(settings.BROTLI_QUALITY))
+
+    print(f"GET /reservations/ con {args.rows} reservas: {len(body) / 1024:.1f} KiB sin comprimir")
+    for encoder in encoders:
+        start = time.perf_counter()
+        compressed = encoder.compress(body, final=True)
+        elapsed_ms = (time.perf_counter() - start) * 1000
+        saved = 1 - len(compressed) / len(body)
+        print(f"  {encoder.encoding:5s} {len(compressed) / 1024:8.1f} KiB  ahorro {saved:6.1%}  ({elapsed_ms:.1f} ms CPU)")
+    if brotli is None:
+        print("  (brotli no instalado: pip install brotli para comparar)")
+    print("Con ETag, una lista sin cambios cuesta una respuesta 304 sin cuerpo.")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,255 @@
+"""
+Prueba de carga de la API de reservas: un enjambre de vecinos (asyncio + httpx) compite
+por los mismos tramos de "Piscina" (aforo 20) y "Pádel court 1" (aforo 1) contra la app
+real y un Postgres local. Además de reservar, consultan disponibilidad y sus reservas y
+cancelan alguna, para que haya huecos que volver a disputar.
+
+Al terminar muestra throughput y latencias p50/p95/p99 por endpoint y comprueba en la BD
+que ningún tramo supera el aforo de su instalación ni hay reservas solapadas de un mismo
+vecino. Si algo falla (invariante roto o respuestas 5xx) sale con código 1.
+
+Sin --url arranca la app con uvicorn en un puerto libre (usa DATABASE_URL, con las
+migraciones y los datos iniciales aplicados). Crea vecinos temporales y los borra al
+terminar junto con sus reservas.
+
+Uso:
+    python -m benchmarks.load_test [--residents 200] [--rounds 10] [--slots 4] [--workers 4]
+    python -m benchmarks.load_test --url http://localhost:8000 --residents 500
+"""
+import argparse
+import asyncio
+import random
+import socket
+import statistics
+import subprocess
+import sys
+import time
+from collections import Counter, defaultdict
+from datetime import datetime, timedelta, timezone
+from typing import Dict, List, Optional
+
+from sqlalchemy import create_engine, text
+from sqlalchemy.orm import sessionmaker
+
+from src.core.config import settings
+from src.models.user_model import User
+from src.services.auth_tokens import access_token_for
+
+FACILITIES = ("Piscina", "Pádel court 1")
+LOAD_EMAIL = "load-{}@example.invalid"
+# Día lejano para no chocar con reservas reales
+DAY = datetime(2031, 3, 3, tzinfo=timezone.utc)
+FIRST_HOUR = 9
+
+# Reservas que solapan con más reservas de las que admite su instalación
+OVER_CAPACITY_SQL = text("""
+    SELECT r.facility, r.start_time, count(o.id) AS occupied, f.capacity
+    FROM reservations r
+    JOIN facilities f ON f.name = r.facility
+    JOIN reservations o ON o.facility = r.facility AND o.start_time < r.end_time AND o.end_time > r.start_time
+    WHERE r.facility = ANY(:facilities) AND r.start_time >= :day AND r.start_time < :day + interval '1 day'
+    GROUP BY r.id, r.facility, r.start_time, f.capacity
+    HAVING count(o.id) > f.capacity
+""")
+
+# Un mismo vecino con dos reservas solapadas en la misma instalación
+DOUBLE_BOOKED_SQL = text("""
+    SELECT r.user_id, r.facility, r.start_time
+    FROM reservations r
+    JOIN reservations o ON o.facility = r.facility AND o.user_id = r.user_id AND o.id < r.id
+                       AND o.start_time < r.end_time AND o.end_time > r.start_time
+    WHERE r.facility = ANY(:facilities) AND r.start_time >= :day AND r.start_time < :day + interval '1 day'
+""")
+
+
+class Stats:
+    def __init__(self):
+        self.latencies: Dict[str, List[float]] = defaultdict(list)
+        self.statuses: Dict[str, Counter] = defaultdict(Counter)
+
+    def record(self, endpoint: str, status: int, seconds: float) -> None:
+        self.latencies[endpoint].append(seconds)
+        self.statuses[endpoint][status] += 1
+
+    def server_errors(self) -> int:
+        return sum(n for counter in self.statuses.values() for status, n in counter.items() if status >= 500)
+
+    def report(self, elapsed: float) -> None:
+        print(f"{'endpoint':28s} {'peticiones':>10s} {'req/s':>8s} {'p50 ms':>8s} {'p95 ms':>8s} {'p99 ms':>8s}  estados")
+        for endpoint, latencies in sorted(self.latencies.items()):
+            cuts = statistics.quantiles(latencies, n=100, method="inclusive") if len(latencies) > 1 else latencies * 99
+            statuses = " ".join(f"{status}:{n}" for status, n in sorted(self.statuses[endpoint].items()))
+            print(f"{endpoint:28s} {len(latencies):10d} {len(latencies) / elapsed:8.0f} "
+                  f"{cuts[49] * 1000:8.1f} {cuts[94] * 1000:8.1f} {cuts[98] * 1000:8.1f}  {statuses}")
+
+
+def setup(session_factory, residents: int) -> List[str]:
+    """Vecinos temporales; el token se firma aquí para no medir el login (bcrypt)."""
+    db = session_factory(expire_on_commit=False)
+    try:
+        users = [User(email=LOAD_EMAIL.format(i), hashed_password="x", is_active=True, role="user")
+                 for i in range(residents)]
+        db.add_all(users)
+        db.commit()
+        # Sin sesión (sid): tokens de la prueba que no hace falta poder revocar
+        return [access_token_for(user.id, user.email, user.role, expires_delta=timedelta(hours=2)) for user in users]
+    finally:
+        db.close()
+
+
+def teardown(session_factory) -> None:
+    # Las reservas, esperas y claves de idempotencia caen por ON DELETE CASCADE
+    db = session_factory()
+    try:
+        db.query(User).filter(User.email.like(LOAD_EMAIL.format("%"))).delete(synchronize_session=False)
+        db.commit()
+    finally:
+        db.close()
+
+
+def check_invariants(session_factory) -> bool:
+    db = session_factory()
+    try:
+        params = {"facilities": list(FACILITIES), "day": DAY}
+        over = db.execute(OVER_CAPACITY_SQL, params).all()
+        doubled = db.execute(DOUBLE_BOOKED_SQL, params).all()
+        booked = db.execute(text(
+            "SELECT facility, count(*) FROM reservations "
+            "WHERE facility = ANY(:facilities) AND start_time >= :day AND start_time < :day + interval '1 day' "
+            "GROUP BY facility"
+        ), params).all()
+    finally:
+        db.close()
+
+    for facility, count in booked:
+        print(f"Reservas finales en {facility}: {count}")
+    for facility, start_time, occupied, capacity in over:
+        print(f"AFORO SUPERADO: {facility} {start_time:%H:%M} con {occupied}/{capacity}")
+    for user_id, facility, start_time in doubled:
+        print(f"RESERVA DOBLE: vecino {user_id} en {facility} {start_time:%H:%M}")
+    return not over and not doubled
+
+
+async def resident(client, token: str, rounds: int, slots: int, stats: Stats, gate: asyncio.Event) -> None:
+    import httpx
+
+    headers = {"Authorization": f"Bearer {token}"}
+    booked: List[int] = []
+
+    async def call(endpoint: str, method: str, path: str, **kwargs) -> Optional["httpx.Response"]:
+        began = time.perf_counter()
+        try:
+            response = await client.request(method, path, headers=headers, **kwargs)
+        except httpx.HTTPError:
+            stats.record(endpoint, 599, time.perf_counter() - began)
+            return None
+        stats.record(endpoint, response.status_code, time.perf_counter() - began)
+        return response
+
+    await gate.wait()
+    for _ in range(rounds):
+        facility = random.choice(FACILITIES)
+        start = DAY + timedelta(hours=FIRST_HOUR + random.randrange(slots))
+        payload = {"facility": facility, "start_time": start.isoformat(),
+                   "end_time": (start + timedelta(hours=1)).isoformat()}
+        response = await call("POST /reservations", "POST", "/api/v1/reservations/", json=payload)
+        if response is not None and response.status_code == 200:
+            booked.append(response.json()["id"])
+
+        if random.random() < 0.5:
+            await call("GET /availability", "GET", "/api/v1/reservations/availability",
+                       params={"facility": facility, "date_str": DAY.date().isoformat()})
+        if random.random() < 0.2:
+            await call("GET /reservations/me", "GET", "/api/v1/reservations/me")
+        if booked and random.random() < 0.3:
+            # Cancelar libera la plaza para otro vecino (y promociona desde la lista de espera)
+            await call("DELETE /reservations/{id}", "DELETE", f"/api/v1/reservations/{booked.pop()}")
+
+
+async def swarm(url: str, tokens: List[str], rounds: int, slots: int) -> Stats:
+    import httpx
+
+    stats = Stats()
+    gate = asyncio.Event()
+    limits = httpx.Limits(max_connections=len(tokens), max_keepalive_connections=len(tokens))
+    async with httpx.AsyncClient(base_url=url, timeout=60, limits=limits) as client:
+        tasks = [asyncio.create_task(resident(client, token, rounds, slots, stats, gate)) for token in tokens]
+        started = time.perf_counter()
+        gate.set()  # Todos a la vez: la avalancha del lunes por la mañana
+        await asyncio.gather(*tasks)
+        elapsed = time.perf_counter() - started
+    print(f"{len(tokens)} vecinos x {rounds} rondas sobre {slots} tramos en {elapsed:.1f}s")
+    stats.report(elapsed)
+    return stats
+
+
+def free_port() -> int:
+    with socket.socket() as sock:
+        sock.bind(("127.0.0.1", 0))
+        return sock.getsockname()[1]
+
+
+def start_server(workers: int) -> tuple:
+    import httpx
+
+    port = free_port()
+    process = subprocess.Popen([
+        sys.executable, "-m", "uvicorn", "src.main:app",
+        "--host", "127.0.0.1", "--port", str(port), "--workers", str(workers), "--log-level", "warning",
+    ])
+    url = f"http://127.0.0.1:{port}"
+    deadline = time.monotonic() + 60
+    while time.monotonic() < deadline:
+        if process.poll() is not None:
+            raise SystemExit("El servidor terminó durante el arranque")
+        try:
+            if httpx.get(f"{url}/health/ready", timeout=1).status_code == 200:
+                return process, url
+        except httpx.HTTPError:
+            pass
+        time.sleep(0.5)
+    process.terminate()
+    raise SystemExit("El servidor no estuvo listo en 60s")
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--residents", type=int, default=200)
+    parser.add_argument("--rounds", type=int, default=10)
+    parser.add_argument("--slots", type=int, default=4, help="Tramos de una hora en disputa")
+    parser.add_argument("--workers", type=int, default=4, help="Workers de uvicorn si se arranca el servidor")
+    parser.add_argument("--url", help="Servidor ya en marcha (si no, se arranca uno)")
+    parser.add_argument("--seed", type=int, default=2026)
+    args = parser.parse_args()
+    random.seed(args.seed)
+
+    engine = create_engine(settings.DATABASE_URL)
+    if engine.dialect.name != "postgresql":
+        raise SystemExit("Esta prueba necesita Postgres (DATABASE_URL)")
+    session_factory = sessionmaker(autocommit=False, autoflush=False, bind=engine)
+
+    teardown(session_factory)
+    tokens = setup(session_factory, args.residents)
+    process = None
+    try:
+        url = args.url
+        if url is None:
+            process, url = start_server(args.workers)
+        stats = asyncio.run(swarm(url, tokens, args.rounds, args.slots))
+        consistent = check_invariants(session_factory)
+    finally:
+        if process is not None:
+            process.terminate()
+            process.wait(timeout=30)
+        teardown(session_factory)
+        engine.dispose()
+
+    if stats.server_errors():
+        print(f"{stats.server_errors()} respuestas 5xx o errores de conexión")
+    if not consistent or stats.server_errors():
+        raise SystemExit(1)
+    print("OK: ningún tramo supera el aforo")
+
+
+if __name__ == "__main__":
+    main()
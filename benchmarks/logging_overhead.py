@@ -0,0 +1,82 @@
+"""
+Coste del logging en el hilo de la petición: StreamHandler síncrono vs QueueHandler.
+
+Simula N peticiones que emiten las mismas líneas que /support/contact + el envío de
+email, contra un destino lento (stderr bloqueado, p. ej. un colector saturado).
+
+Uso: python -m benchmarks.logging_overhead [--requests 2000] [--sink-latency-us 50]
+"""
+import argparse
+import io
+import logging
+import queue
+import time
+from logging.handlers import QueueHandler, QueueListener
+
+from src.core.logging_config import JsonFormatter, RequestIdFilter, request_id_var
+
+
+class SlowSink(io.StringIO):
+    """Destino que tarda `latency` segundos por escritura."""
+
+    def __init__(self, latency: float):
+        super().__init__()
+        self.latency = latency
+
+    def write(self, s):
+        time.sleep(self.latency)
+        return len(s)
+
+
+def simulate_requests(logger: logging.Logger, requests: int) -> float:
+    """Devuelve los µs por petición que pasa el hilo de la petición haciendo logging."""
+    start = time.perf_counter()
+    for i in range(requests):
+        token = request_id_var.set(f"req-{i}")
+        logger.info("[SOPORTE] Solicitud de contacto de %s <%s>: %s", "Ana", "ana@test.com", "Piscina")
+        logger.debug("[EMAIL] Preparando email de SOPORTE de %s para %s", "ana@test.com", "admin@test.com")
+        logger.debug("[EMAIL] Conectando al servidor SMTP: %s:%s", "smtp.test.com", 587)
+        logger.info("[EMAIL] Correo entregado al servidor para: %s", "admin@test.com")
+        request_id_var.reset(token)
+    return (time.perf_counter() - start) / requests * 1e6
+
+
+def build_logger(name: str, handler: logging.Handler) -> logging.Logger:
+    logger = logging.getLogger(name)
+    logger.handlers = [handler]
+    logger.propagate = False
+    logger.setLevel(logging.INFO)
+    return logger
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--requests", type=int, default=2000)
+    parser.add_argument("--sink-latency-us", type=float, default=50)
+    args = parser.parse_args()
+    latency = args.sink_latency_us / 1e6
+
+    # 1. Handler síncrono: el hilo de la petición formatea y escribe
+    sync_handler = logging.StreamHandler(SlowSink(latency))
+    sync_handler.setFormatter(JsonFormatter())
+    sync_handler.addFilter(RequestIdFilter())
+    sync_us = simulate_requests(build_logger("bench.sync", sync_handler), args.requests)
+
+    # 2. QueueHandler: el hilo de la petición solo encola
+    log_queue = queue.SimpleQueue()
+    queue_handler = QueueHandler(log_queue)
+    queue_handler.addFilter(RequestIdFilter())
+    sink_handler = logging.StreamHandler(SlowSink(latency))
+    sink_handler.setFormatter(JsonFormatter())
+    listener = QueueListener(log_queue, sink_handler)
+    listener.start()
+    queued_us = simulate_requests(build_logger("bench.queue", queue_handler), args.requests)
+    listener.stop()
+
+    print(f"Peticiones simuladas: {args.requests} (latencia del destino: {args.sink_latency_us:.0f} µs/escritura)")
+    print(f"  StreamHandler síncrono: {sync_us:8.1f} µs/petición")
+    print(f"  QueueHandler + listener: {queued_us:8.1f} µs/petición")
+
+
+if __name__ == "__main__":
+    main()
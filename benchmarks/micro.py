@@ -0,0 +1,179 @@
+"""
+Micro-benchmarks de las rutas calientes, cada una aislada y con datos sintéticos fijos:
+
+- get_current_user:      decodificar el JWT + comprobar revocaciones en memoria (sin BD)
+- create_access_token:   firmar un token de acceso
+- group_slots:           agrupado de /availability (10k reservas de un día)
+- reservation_response:  validación de 10k ReservationResponse (response_model de los listados)
+- user_create:           validadores de UserCreate (contraseñas válidas e inválidas)
+- email_mime:            construcción del mensaje MIME de _send_email
+
+Guarda los resultados en JSON (por defecto benchmarks/results/<commit>.json) para poder
+comparar entre commits con --compare.
+
+Uso:
+    python -m benchmarks.micro [--repeat 5] [--only group_slots,user_create]
+    python -m benchmarks.micro --compare benchmarks/results/<commit-anterior>.json
+"""
+import argparse
+import json
+import platform
+import statistics
+import subprocess
+import timeit
+from datetime import datetime, timedelta, timezone
+from pathlib import Path
+from types import SimpleNamespace
+from typing import Callable, Dict, List, Tuple
+
+from pydantic import TypeAdapter, ValidationError
+
+RESULTS_DIR = Path(__file__).resolve().parent / "results"
+BASE = datetime(2026, 3, 2, 8, 0, tzinfo=timezone.utc)
+
+
+def bench_get_current_user() -> Tuple[Callable, int]:
+    from src.core.deps import get_current_user
+    from src.models.reservation_model import Reservation  # noqa: F401 (relación User.reservations)
+    from src.services.auth_tokens import access_token_for, revocations
+
+    # Un conjunto de revocaciones de tamaño realista (mil sesiones cerradas y cien usuarios)
+    now = datetime.now(timezone.utc).timestamp()
+    for i in range(1000):
+        revocations.add(i, f"{i:032x}", now, now + 300)
+    for i in range(100):
+        revocations.add(10_000 + i, None, now, now + 300)
+    token = access_token_for(500, "vecino500@example.com", "user", "f" * 32)
+    return lambda: get_current_user(token=token), 2000
+
+
+def bench_create_access_token() -> Tuple[Callable, int]:
+    from src.services.auth_tokens import access_token_for
+
+    return lambda: access_token_for(500, "vecino500@example.com", "user", "f" * 32), 2000
+
+
+def bench_group_slots() -> Tuple[Callable, int]:
+    from src.services.reservation_repository import group_slots
+
+    # 10k reservas de un día repartidas en 14 tramos de una hora
+    reservations = []
+    for i in range(10_000):
+        start = BASE + timedelta(hours=i % 14)
+        reservations.append(SimpleNamespace(start_time=start, end_time=start + timedelta(hours=1)))
+    return lambda: group_slots(reservations, 30), 20
+
+
+def bench_reservation_response() -> Tuple[Callable, int]:
+    from src.models.reservation_model import Reservation
+    from src.schemas.reservation_schema import ReservationResponse
+
+    objects = []
+    for i in range(10_000):
+        start = BASE + timedelta(hours=i % 12, days=i // 12)
+        objects.append(Reservation(id=i + 1, user_id=i % 500 + 1, facility="Piscina", start_time=start,
+                                   end_time=start + timedelta(hours=1), created_at=BASE))
+    adapter = TypeAdapter(List[ReservationResponse])
+    return lambda: adapter.validate_python(objects, from_attributes=True), 5
+
+
+def bench_user_create() -> Tuple[Callable, int]:
+    from src.schemas.user_schema import UserCreate
+
+    passwords = ["Vecina2026", "corta1A", "sinmayusculas1", "SINMINUSCULAS1", "SinNumeros"]
+    payloads = [
+        {"email": f"vecino{i}@example.com", "full_name": f"Vecino {i}", "password": passwords[i % len(passwords)]}
+        for i in range(1000)
+    ]
+
+    def validate_all():
+        for payload in payloads:
+            try:
+                UserCreate(**payload)
+            except ValidationError:
+                pass
+
+    return validate_all, 10
+
+
+def bench_email_mime() -> Tuple[Callable, int]:
+    from src.services.email import _build_message, _verification_html
+
+    html = _verification_html("482913")
+    return lambda: _build_message("vecino500@example.com", "Código de verificación · Residencial", html), 500
+
+
+BENCHMARKS: Dict[str, Callable[[], Tuple[Callable, int]]] = {
+    "get_current_user": bench_get_current_user,
+    "create_access_token": bench_create_access_token,
+    "group_slots": bench_group_slots,
+    "reservation_response": bench_reservation_response,
+    "user_create": bench_user_create,
+    "email_mime": bench_email_mime,
+}
+
+
+def run(names: List[str], repeat: int) -> Dict[str, dict]:
+    results = {}
+    for name in names:
+        func, number = BENCHMARKS[name]()
+        func()  # Calentamiento (imports perezosos, cachés de Pydantic)
+        per_call = [total / number * 1e6 for total in timeit.Timer(func).repeat(repeat=repeat, number=number)]
+        results[name] = {"best_us": min(per_call), "median_us": statistics.median(per_call), "number": number}
+        print(f"{name:22s} {min(per_call):12.1f} µs/llamada  (mediana {statistics.median(per_call):.1f})")
+    return results
+
+
+def git_revision() -> Tuple[str, bool]:
+    try:
+        commit = subprocess.check_output(["git", "rev-parse", "--short", "HEAD"], text=True).strip()
+        dirty = bool(subprocess.check_output(["git", "status", "--porcelain", "--untracked-files=no"], text=True))
+        return commit, dirty
+    except (OSError, subprocess.CalledProcessError):
+        return "sin-git", False
+
+
+def compare(current: Dict[str, dict], baseline_path: Path) -> None:
+    baseline = json.loads(baseline_path.read_text())
+    print(f"\nComparado con {baseline['commit']} ({baseline_path.name}):")
+    for name, result in current.items():
+        before = baseline["results"].get(name)
+        if before:
+            ratio = result["best_us"] / before["best_us"]
+            print(f"  {name:22s} {before['best_us']:12.1f} -> {result['best_us']:10.1f} µs  (x{ratio:.2f})")
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--repeat", type=int, default=5)
+    parser.add_argument("--only", help="Lista separada por comas de benchmarks a ejecutar")
+    parser.add_argument("--output", type=Path, help="Fichero JSON de resultados")
+    parser.add_argument("--compare", type=Path, help="Resultados anteriores con los que comparar")
+    args = parser.parse_args()
+
+    names = args.only.split(",") if args.only else list(BENCHMARKS)
+    unknown = set(names) - set(BENCHMARKS)
+    if unknown:
+        raise SystemExit(f"Benchmarks desconocidos: {', '.join(sorted(unknown))}")
+
+    results = run(names, args.repeat)
+
+    commit, dirty = git_revision()
+    output = args.output or RESULTS_DIR / f"{commit}{'-dirty' if dirty else ''}.json"
+    output.parent.mkdir(parents=True, exist_ok=True)
+    output.write_text(json.dumps({
+        "commit": commit,
+        "dirty": dirty,
+        "date": datetime.now(timezone.utc).isoformat(timespec="seconds"),
+        "python": platform.python_version(),
+        "machine": platform.machine(),
+        "results": results,
+    }, indent=2))
+    print(f"\nResultados guardados en {output}")
+
+    if args.compare:
+        compare(results, args.compare)
+
+
+if __name__ == "__main__":
+    main()
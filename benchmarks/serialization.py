@@ -0,0 +1,82 @@
+"""
+Serialización de 10k reservas: ruta estándar de FastAPI vs ruta rápida (?fast=true).
+
+- Estándar: objetos ORM -> validación Pydantic (response_model) -> jsonable_encoder -> json.dumps
+- Rápida:   tuplas de columnas -> dict(zip(...)) -> orjson
+
+Uso: python -m benchmarks.serialization [--rows 10000] [--repeat 5]
+"""
+import argparse
+import json
+import time
+from datetime import datetime, timedelta, timezone
+from typing import List
+
+from fastapi.encoders import jsonable_encoder
+from pydantic import TypeAdapter
+
+from src.core.fast_json import rows_response
+from src.models.reservation_model import Reservation
+from src.routers.reservations import RESERVATION_COLUMNS
+from src.schemas.reservation_schema import ReservationResponse
+
+FACILITIES = ("Pádel court 1", "Pádel court 2", "Piscina", "Gimnasio", "Sauna")
+
+
+def synthetic_rows(count: int) -> List[tuple]:
+    """Filas fijas (mismo orden de columnas que RESERVATION_COLUMNS)."""
+    base = datetime(2026, 1, 1, 8, 0, tzinfo=timezone.utc)
+    rows = []
+    for i in range(count):
+        start = base + timedelta(hours=i % 12, days=i // 12)
+        values = {
+            "facility": FACILITIES[i % len(FACILITIES)],
+            "start_time": start,
+            "end_time": start + timedelta(hours=1),
+            "id": i + 1,
+            "user_id": i % 500 + 1,
+            "created_at": base,
+        }
+        rows.append(tuple(values[column.key] for column in RESERVATION_COLUMNS))
+    return rows
+
+
+def standard_path(objects, adapter: TypeAdapter) -> bytes:
+    validated = adapter.validate_python(objects, from_attributes=True)
+    return json.dumps(jsonable_encoder(validated)).encode()
+
+
+def fast_path(rows) -> bytes:
+    return rows_response(RESERVATION_COLUMNS, rows).body
+
+
+def best_of(repeat: int, func, *args) -> float:
+    timings = []
+    for _ in range(repeat):
+        start = time.perf_counter()
+        func(*args)
+        timings.append(time.perf_counter() - start)
+    return min(timings) * 1000
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--rows", type=int, default=10_000)
+    parser.add_argument("--repeat", type=int, default=5)
+    args = parser.parse_args()
+
+    rows = synthetic_rows(args.rows)
+    keys = [column.key for column in RESERVATION_COLUMNS]
+    objects = [Reservation(**dict(zip(keys, row))) for row in rows]
+    adapter = TypeAdapter(List[ReservationResponse])
+
+    standard_ms = best_of(args.repeat, standard_path, objects, adapter)
+    fast_ms = best_of(args.repeat, fast_path, rows)
+
+    print(f"{args.rows} ReservationResponse (mejor de {args.repeat}):")
+    print(f"  Pydantic + json:  {standard_ms:8.1f} ms")
+    print(f"  tuplas + orjson:  {fast_ms:8.1f} ms  (x{standard_ms / fast_ms:.1f})")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,121 @@
+"""
+Carga del canal de ocupación en directo con muchos suscriptores simulados.
+
+Modo local (por defecto): miles de suscripciones sobre el bus de un worker, una parte
+de ellas lentas, y eventos publicados desde otro hilo como hacen los endpoints.
+Mide la latencia de entrega y comprueba que las colas de los lentos no crecen.
+
+Modo HTTP (--url): abre N conexiones SSE reales contra un servidor en marcha y cuenta
+los eventos recibidos mientras se generan reservas desde otro proceso.
+
+Uso:
+    python -m benchmarks.sse_fanout [--subscribers 5000] [--events 200] [--slow 0.1]
+    python -m benchmarks.sse_fanout --url http://localhost:8000 --subscribers 500 --seconds 30
+"""
+import argparse
+import asyncio
+import random
+import statistics
+import time
+
+from src.services.occupancy import OccupancyBus
+
+FACILITY = "Piscina"
+DAY = "2026-03-02"
+
+
+async def local_run(subscribers: int, events: int, rate: float, slow_ratio: float, max_queue: int) -> None:
+    bus = OccupancyBus(max_queue)
+    subs = [bus.subscribe(FACILITY, DAY) for _ in range(subscribers)]
+    slow = set(random.sample(range(subscribers), int(subscribers * slow_ratio)))
+    latencies = []
+    received = 0
+
+    async def consume(index: int, subscriber) -> None:
+        nonlocal received
+        while True:
+            message = await subscriber.queue.get()
+            if b'"sent": ' in message:
+                sent = float(message.split(b'"sent": ')[1].split(b"}")[0])
+                latencies.append(time.perf_counter() - sent)
+            received += 1
+            if index in slow:
+                await asyncio.sleep(0.05)  # Cliente lento (móvil con mala cobertura)
+
+    def produce() -> None:
+        for count in range(events):
+            bus.publish({"type": "slot", "facility": FACILITY, "day": DAY,
+                         "data": {"count": count, "sent": time.perf_counter()}})
+            time.sleep(1 / rate)
+
+    tasks = [asyncio.create_task(consume(i, sub)) for i, sub in enumerate(subs)]
+    max_backlog = 0
+    producer = asyncio.create_task(asyncio.to_thread(produce))
+    while not producer.done():
+        max_backlog = max(max_backlog, max(sub.queue.qsize() for sub in subs))
+        await asyncio.sleep(0.05)
+    # Se deja vaciar las colas de los clientes rápidos antes de cerrar
+    while any(not sub.queue.empty() for i, sub in enumerate(subs) if i not in slow):
+        await asyncio.sleep(0.01)
+    for task in tasks:
+        task.cancel()
+    await asyncio.gather(*tasks, return_exceptions=True)
+
+    latencies.sort()
+    fast_dropped = sum(sub.dropped for i, sub in enumerate(subs) if i not in slow)
+    slow_dropped = sum(sub.dropped for i, sub in enumerate(subs) if i in slow)
+    print(f"{subscribers} suscriptores ({len(slow)} lentos), {events} eventos a {rate:.0f}/s")
+    print(f"  mensajes entregados: {received} de {subscribers * events}")
+    print(f"  latencia p50 {statistics.median(latencies) * 1000:.2f} ms   "
+          f"p99 {latencies[int(len(latencies) * 0.99)] * 1000:.2f} ms")
+    print(f"  cola máxima observada: {max_backlog} (límite {max_queue})")
+    print(f"  resyncs: {slow_dropped} a clientes lentos, {fast_dropped} a clientes rápidos")
+
+
+async def http_run(url: str, subscribers: int, seconds: float) -> None:
+    import httpx
+
+    stream_url = f"{url.rstrip('/')}/api/v1/reservations/availability/stream"
+    counts = {"snapshot": 0, "slot": 0, "capacity": 0, "resync": 0}
+    connected = 0
+
+    async def subscribe(client: "httpx.AsyncClient") -> None:
+        nonlocal connected
+        async with client.stream("GET", stream_url, params={"facility": FACILITY, "date_str": DAY}) as response:
+            connected += 1
+            async for line in response.aiter_lines():
+                if line.startswith("event: "):
+                    counts[line[7:]] = counts.get(line[7:], 0) + 1
+
+    limits = httpx.Limits(max_connections=subscribers + 10)
+    async with httpx.AsyncClient(timeout=None, limits=limits) as client:
+        tasks = [asyncio.create_task(subscribe(client)) for _ in range(subscribers)]
+        await asyncio.sleep(seconds)
+        for task in tasks:
+            task.cancel()
+        await asyncio.gather(*tasks, return_exceptions=True)
+
+    print(f"{connected}/{subscribers} conexiones SSE abiertas durante {seconds:.0f}s")
+    for name, total in counts.items():
+        print(f"  {name:9s} {total}")
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--subscribers", type=int, default=5000)
+    parser.add_argument("--events", type=int, default=200)
+    parser.add_argument("--rate", type=float, default=50, help="Eventos por segundo (reservas/cancelaciones)")
+    parser.add_argument("--slow", type=float, default=0.1, help="Fracción de clientes lentos")
+    parser.add_argument("--queue", type=int, default=32)
+    parser.add_argument("--url", help="Servidor en marcha para la prueba HTTP real")
+    parser.add_argument("--seconds", type=float, default=30)
+    args = parser.parse_args()
+
+    if args.url:
+        asyncio.run(http_run(args.url, args.subscribers, args.seconds))
+    else:
+        asyncio.run(local_run(args.subscribers, args.events, args.rate, args.slow, args.queue))
+
+
+if __name__ == "__main__":
+    main()
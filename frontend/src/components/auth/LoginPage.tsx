@@ -4,6 +4,7 @@ import {signInWithPopup} from "firebase/auth";
 import toast from "react-hot-toast";
 import {auth, googleProvider, githubProvider} from "../../config/Firebase";
 import {useNavigate} from 'react-router-dom';
+import {storeTokens, TokenPair} from "../../config/api";
 
 
 export default function LoginPage() {
@@ -14,9 +15,10 @@ export default function LoginPage() {
     const navigate = useNavigate();
 
 
-    const handleSuccessfulLogin = async (token: string) => {
+    const handleSuccessfulLogin = async (tokens: TokenPair) => {
+        const token = tokens.access_token;
         console.log("1. Token recibido en handleSuccessfulLogin:", token.substring(0, 10) + "...");
-        localStorage.setItem('token', token);
+        storeTokens(tokens);
 
         try {
             console.log("2. Solicitando perfil a /api/v1/users/me...");
@@ -66,7 +68,7 @@ export default function LoginPage() {
         if (!response.ok) throw new Error(data.detail || 'Error al validar con el servidor');
 
         console.log("Backend devolvió token de acceso correctamente.");
-        return data.access_token;
+        return data as TokenPair;
     };
 
     const handleSocialLogin = async (provider: any) => {
@@ -83,10 +85,10 @@ export default function LoginPage() {
             const fbToken = await result.user.getIdToken();
 
             toast.loading('Verificando cuenta...', {id: loadingToast});
-            const backendToken = await authenticateWithBackendSocial(fbToken);
+            const backendTokens = await authenticateWithBackendSocial(fbToken);
 
             toast.dismiss(loadingToast);
-            await handleSuccessfulLogin(backendToken);
+            await handleSuccessfulLogin(backendTokens);
 
         } catch (error: any) {
             console.error("Error en social login:", error);
@@ -127,7 +129,7 @@ export default function LoginPage() {
 
             console.log("Login correcto. Token recibido.");
             toast.dismiss(loadingToast);
-            await handleSuccessfulLogin(data.access_token);
+            await handleSuccessfulLogin(data);
 
         } catch (error: any) {
             console.error("Error login manual:", error);
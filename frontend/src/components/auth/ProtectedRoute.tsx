@@ -1,6 +1,7 @@
 import { useEffect } from 'react';
 import { Navigate, useLocation } from 'react-router-dom';
 import toast from 'react-hot-toast';
+import { clearTokens } from '../../config/api';
 
 interface ProtectedRouteProps {
   children: JSX.Element;
@@ -33,6 +34,7 @@ function parseJwt(token: string): JwtPayload | null {
 
 export const ProtectedRoute = ({ children, requireAdmin = false }: ProtectedRouteProps) => {
   const token = localStorage.getItem('token');
+  const hasRefreshToken = !!localStorage.getItem('refreshToken');
   const location = useLocation();
 
   // Decodificar payload si existe token
@@ -41,16 +43,17 @@ export const ProtectedRoute = ({ children, requireAdmin = false }: ProtectedRout
   // Calcular condiciones
   const isTokenMissing = !token;
   const isInvalidToken = token && !payload;
-  const isExpired = payload && (payload.exp * 1000 < Date.now());
+  // Con token de refresco, un token de acceso caducado se renueva en la primera petición (authFetch)
+  const isExpired = payload && !hasRefreshToken && (payload.exp * 1000 < Date.now());
   const isUnauthorized = requireAdmin && payload && payload.role !== 'admin';
 
   // EFECTOS: Manejar las notificaciones y limpieza fuera del render
   useEffect(() => {
     if (isInvalidToken) {
-      localStorage.removeItem('token');
+      clearTokens();
     }
     if (isExpired) {
-      localStorage.removeItem('token');
+      clearTokens();
       // Usamos setTimeout 0 para asegurar que ocurra en el siguiente ciclo
       setTimeout(() => toast.error('Tu sesión ha expirado. Ingresa nuevamente.'), 0);
     }
@@ -18,6 +18,7 @@ import {signInWithPopup} from "firebase/auth";
 import {auth, googleProvider, githubProvider} from "../../config/Firebase";
 import {useNavigate, Link} from 'react-router-dom'; // Añadido Link
 import toast from 'react-hot-toast';
+import {storeTokens} from "../../config/api";
 
 // --- Expresiones Regulares Actualizadas ---
 const NAME_REGEX = /^[a-zA-ZÀ-ÿ\s]{3,}$/;
@@ -266,7 +267,7 @@ export default function RegisterPage() {
             });
             const data = await response.json();
             if (!response.ok) throw new Error(data.detail || 'Error en el servidor');
-            localStorage.setItem('token', data.access_token);
+            storeTokens(data);
             return true;
         } catch (error: any) {
             throw error;
@@ -1,6 +1,7 @@
 import { useState, useEffect, useCallback } from 'react';
 import { useNavigate } from 'react-router-dom';
 import toast from 'react-hot-toast';
+import { authFetch, logout } from '../../config/api';
 import {
     LayoutDashboard, Users, Calendar, DollarSign, LogOut,
     Eye, Trash2, Search, Home, Activity, X, Shield, Loader2, Edit,
@@ -90,17 +91,17 @@ export default function AdminDashboard() {
             return;
         }
 
-        const headers = { 'Authorization': `Bearer ${token}`, 'Content-Type': 'application/json' };
+        const headers = { 'Content-Type': 'application/json' };
 
         try {
             const controller = new AbortController();
             const timeoutId = setTimeout(() => controller.abort(), 10000);
 
             const [statsRes, usersRes, resRes, facRes] = await Promise.allSettled([
-                fetch('http://localhost:8000/api/v1/reservations/stats', { headers, signal: controller.signal }),
-                fetch('http://localhost:8000/api/v1/users', { headers, signal: controller.signal }),
-                fetch('http://localhost:8000/api/v1/reservations', { headers, signal: controller.signal }),
-                fetch('http://localhost:8000/api/v1/reservations/facilities', { headers, signal: controller.signal })
+                authFetch('http://localhost:8000/api/v1/reservations/stats', { headers, signal: controller.signal }),
+                authFetch('http://localhost:8000/api/v1/users', { headers, signal: controller.signal }),
+                authFetch('http://localhost:8000/api/v1/reservations', { headers, signal: controller.signal }),
+                authFetch('http://localhost:8000/api/v1/reservations/facilities', { headers, signal: controller.signal })
             ]);
 
             clearTimeout(timeoutId);
@@ -213,17 +214,15 @@ export default function AdminDashboard() {
     }, [fetchAllData]);
 
     const handleLogout = () => {
-        localStorage.removeItem('token');
+        logout();
         navigate('/login');
     };
 
     const handleDeleteUser = async (userId: number) => {
         if (!confirm("¿Eliminar usuario?")) return;
-        const token = localStorage.getItem('token');
         try {
-            const res = await fetch(`http://localhost:8000/api/v1/users/${userId}`, {
-                method: 'DELETE',
-                headers: { 'Authorization': `Bearer ${token}` }
+            const res = await authFetch(`http://localhost:8000/api/v1/users/${userId}`, {
+                method: 'DELETE'
             });
             if (res.ok) {
                 setUsers(prev => prev.filter(u => u.id !== userId));
@@ -236,11 +235,9 @@ export default function AdminDashboard() {
     const handleSaveFacility = async () => {
         if (!editingFacility) return;
         setUpdatingFacility(true);
-        const token = localStorage.getItem('token');
         try {
-            const res = await fetch(`http://localhost:8000/api/v1/reservations/facilities/${editingFacility.id}?price=${editForm.price}&capacity=${editForm.capacity}`, {
-                method: 'PUT',
-                headers: { 'Authorization': `Bearer ${token}` }
+            const res = await authFetch(`http://localhost:8000/api/v1/reservations/facilities/${editingFacility.id}?price=${editForm.price}&capacity=${editForm.capacity}`, {
+                method: 'PUT'
             });
             if (res.ok) {
                 toast.success("Guardado");
@@ -6,6 +6,7 @@ import {
     BarChart3, TrendingUp, ChevronDown, ChevronUp, CreditCard,
 } from 'lucide-react';
 import toast from 'react-hot-toast';
+import {authFetch, logout} from '../../config/api';
 
 // --- Expresiones Regulares ---
 const APARTMENT_REGEX = /^\d{1,2}[A-Z]$/; // Máximo 2 números seguidos de 1 letra
@@ -270,10 +271,10 @@ export default function Dashboard() {
         }
 
         try {
-            const headers = {'Authorization': `Bearer ${token}`, 'Content-Type': 'application/json'};
+            const headers = {'Content-Type': 'application/json'};
 
             // A. Cargar usuario
-            const userResponse = await fetch('http://localhost:8000/api/v1/users/me', {headers});
+            const userResponse = await authFetch('http://localhost:8000/api/v1/users/me', {headers});
             if (userResponse.status === 401) {
                 handleLogout();
                 return;
@@ -303,7 +304,7 @@ export default function Dashboard() {
             }
 
             // B. Cargar reservas del usuario
-            const resResponse = await fetch('http://localhost:8000/api/v1/reservations/me', {headers});
+            const resResponse = await authFetch('http://localhost:8000/api/v1/reservations/me', {headers});
             if (resResponse.ok) {
                 const resData = await resResponse.json();
                 const processedReservations = resData.map((res: any) => {
@@ -339,8 +340,8 @@ export default function Dashboard() {
         if (!token) return;
 
         try {
-            const headers = {'Authorization': `Bearer ${token}`, 'Content-Type': 'application/json'};
-            const facilitiesResponse = await fetch('http://localhost:8000/api/v1/reservations/facilities', {headers});
+            const headers = {'Content-Type': 'application/json'};
+            const facilitiesResponse = await authFetch('http://localhost:8000/api/v1/reservations/facilities', {headers});
 
             if (facilitiesResponse.ok) {
                 const facilitiesData = await facilitiesResponse.json();
@@ -461,10 +462,8 @@ export default function Dashboard() {
 
         const fetchAvailability = async () => {
             try {
-                const token = localStorage.getItem('token');
-                const response = await fetch(
-                    `http://localhost:8000/api/v1/reservations/availability?facility=${encodeURIComponent(newResFacility)}&date_str=${newResDate}`,
-                    {headers: {'Authorization': `Bearer ${token}`}}
+                const response = await authFetch(
+                    `http://localhost:8000/api/v1/reservations/availability?facility=${encodeURIComponent(newResFacility)}&date_str=${newResDate}`
                 );
 
                 if (response.ok) {
@@ -676,13 +675,11 @@ export default function Dashboard() {
         const loadingToast = toast.loading("Subiendo foto...");
 
         try {
-            const token = localStorage.getItem('token');
             const formData = new FormData();
             formData.append('file', file);
 
-            const response = await fetch('http://localhost:8000/api/v1/users/me/avatar', {
+            const response = await authFetch('http://localhost:8000/api/v1/users/me/avatar', {
                 method: 'POST',
-                headers: {'Authorization': `Bearer ${token}`},
                 body: formData
             });
 
@@ -710,10 +707,8 @@ export default function Dashboard() {
         const loadingToast = toast.loading("Eliminando reserva...");
 
         try {
-            const token = localStorage.getItem('token');
-            const response = await fetch(`http://localhost:8000/api/v1/reservations/${reservationId}`, {
-                method: 'DELETE',
-                headers: {'Authorization': `Bearer ${token}`}
+            const response = await authFetch(`http://localhost:8000/api/v1/reservations/${reservationId}`, {
+                method: 'DELETE'
             });
 
             if (response.ok) {
@@ -828,7 +823,7 @@ export default function Dashboard() {
     };
 
     const handleLogout = () => {
-        localStorage.removeItem('token');
+        logout();
         localStorage.removeItem('paymentSuccess');
         localStorage.removeItem('reservationCancelled');
         navigate('/login');
@@ -872,10 +867,9 @@ export default function Dashboard() {
         const loadingToast = toast.loading("Guardando...");
 
         try {
-            const token = localStorage.getItem('token');
-            const response = await fetch('http://localhost:8000/api/v1/users/me', {
+            const response = await authFetch('http://localhost:8000/api/v1/users/me', {
                 method: 'PUT',
-                headers: {'Authorization': `Bearer ${token}`, 'Content-Type': 'application/json'},
+                headers: {'Content-Type': 'application/json'},
                 body: JSON.stringify({
                     phone: profileForm.phone,
                     address: profileForm.address,
@@ -2,6 +2,7 @@ import {useState, useEffect, useRef} from 'react';
 import {useLocation, useNavigate} from 'react-router-dom';
 import {CreditCard, Lock, Calendar, User, Check, X, Download, ArrowLeft, Loader2} from 'lucide-react';
 import toast from 'react-hot-toast';
+import {authFetch} from '../../config/api';
 
 export default function PaymentGateway() {
     const location = useLocation();
@@ -117,11 +118,9 @@ export default function PaymentGateway() {
         setHasSubmitted(true);
 
         try {
-            const token = localStorage.getItem('token');
-            const response = await fetch('http://localhost:8000/api/v1/reservations/', {
+            const response = await authFetch('http://localhost:8000/api/v1/reservations/', {
                 method: 'POST',
                 headers: {
-                    'Authorization': `Bearer ${token}`,
                     'Content-Type': 'application/json'
                 },
                 body: JSON.stringify({
@@ -0,0 +1,89 @@
+const API_URL = 'http://localhost:8000/api/v1';
+
+export interface TokenPair {
+    access_token: string;
+    refresh_token?: string;
+}
+
+// Guarda el par de tokens de /auth/login, /auth/login/social o /auth/refresh
+export function storeTokens(tokens: TokenPair) {
+    localStorage.setItem('token', tokens.access_token);
+    if (tokens.refresh_token) {
+        localStorage.setItem('refreshToken', tokens.refresh_token);
+    }
+}
+
+export function clearTokens() {
+    localStorage.removeItem('token');
+    localStorage.removeItem('refreshToken');
+}
+
+// Un único refresco en vuelo: si varias peticiones reciben 401 a la vez, todas esperan al mismo
+// (el token de refresco rota y presentar uno ya canjeado cierra la sesión entera)
+let refreshing: Promise<string | null> | null = null;
+
+export function refreshAccessToken(): Promise<string | null> {
+    if (!refreshing) {
+        refreshing = (async () => {
+            const refreshToken = localStorage.getItem('refreshToken');
+            if (!refreshToken) return null;
+            try {
+                const response = await fetch(`${API_URL}/auth/refresh`, {
+                    method: 'POST',
+                    headers: {'Content-Type': 'application/json'},
+                    body: JSON.stringify({refresh_token: refreshToken}),
+                });
+                if (!response.ok) {
+                    clearTokens();
+                    return null;
+                }
+                const tokens: TokenPair = await response.json();
+                storeTokens(tokens);
+                return tokens.access_token;
+            } catch (error) {
+                // Sin red no se borran los tokens: se podrá refrescar más tarde
+                console.error('Error refrescando el token', error);
+                return null;
+            } finally {
+                refreshing = null;
+            }
+        })();
+    }
+    return refreshing;
+}
+
+/**
+ * fetch con el token de acceso. Los tokens de acceso duran pocos minutos: ante un 401 se
+ * canjea una vez el token de refresco y se repite la petición con el nuevo. Si tampoco
+ * se puede refrescar, devuelve el 401 y el llamador cierra la sesión como hasta ahora.
+ */
+export async function authFetch(input: string, init: RequestInit = {}): Promise<Response> {
+    const withToken = (token: string | null): RequestInit => {
+        const headers = new Headers(init.headers);
+        if (token) headers.set('Authorization', `Bearer ${token}`);
+        return {...init, headers};
+    };
+
+    const response = await fetch(input, withToken(localStorage.getItem('token')));
+    if (response.status !== 401) return response;
+
+    const token = await refreshAccessToken();
+    if (!token) return response;
+    return fetch(input, withToken(token));
+}
+
+// Cierra la sesión también en el servidor (el token de refresco deja de valer)
+export async function logout() {
+    const refreshToken = localStorage.getItem('refreshToken');
+    clearTokens();
+    if (!refreshToken) return;
+    try {
+        await fetch(`${API_URL}/auth/logout`, {
+            method: 'POST',
+            headers: {'Content-Type': 'application/json'},
+            body: JSON.stringify({refresh_token: refreshToken}),
+        });
+    } catch (error) {
+        console.error('Error cerrando la sesión', error);
+    }
+}
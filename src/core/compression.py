@@ -0,0 +1,158 @@
+import zlib
+from typing import Dict
+
+from starlette.datastructures import Headers, MutableHeaders
+
+from src.core.metrics import RESPONSE_BYTES
+
+try:  # Brotli es opcional: si no está instalado solo se ofrece gzip
+    import brotli
+except ImportError:  # pragma: no cover - depende del entorno
+    brotli = None
+
+# Tipos que no se comprimen: ya comprimidos o flujos que deben llegar sin buffering (SSE)
+SKIP_CONTENT_TYPES = ("image/", "video/", "audio/", "application/zip", "text/event-stream")
+
+
+def parse_accept_encoding(header: str) -> Dict[str, float]:
+    """Accept-Encoding como codificación -> q ("br;q=0" la rechaza; sin q vale 1)."""
+    qualities = {}
+    for item in header.split(","):
+        coding, *params = (part.strip() for part in item.split(";"))
+        if not coding:
+            continue
+        q = 1.0
+        for param in params:
+            name, _, value = param.partition("=")
+            if name.strip().lower() == "q":
+                try:
+                    q = float(value)
+                except ValueError:
+                    q = 0.0
+        qualities[coding.lower()] = q
+    return qualities
+
+
+class _GzipEncoder:
+    encoding = "gzip"
+
+    def __init__(self, level: int):
+        self._compressor = zlib.compressobj(level, zlib.DEFLATED, 16 + zlib.MAX_WBITS)
+
+    def compress(self, data: bytes, final: bool) -> bytes:
+        # En streaming se hace SYNC_FLUSH por trozo para que el cliente reciba datos sin esperar al final
+        flush_mode = zlib.Z_FINISH if final else zlib.Z_SYNC_FLUSH
+        return self._compressor.compress(data) + self._compressor.flush(flush_mode)
+
+
+class _BrotliEncoder:
+    encoding = "br"
+
+    def __init__(self, quality: int):
+        self._compressor = brotli.Compressor(quality=quality)
+
+    def compress(self, data: bytes, final: bool) -> bytes:
+        out = self._compressor.process(data)
+        return out + (self._compressor.finish() if final else self._compressor.flush())
+
+
+class CompressionMiddleware:
+    """
+    Comprime respuestas con brotli (si está instalado y el cliente lo acepta) o gzip.
+    Las respuestas por debajo de `minimum_size` se envían tal cual y las respuestas
+    en streaming se comprimen trozo a trozo. Los bytes antes/después se cuentan en
+    /metrics (response_bytes_total) para medir el ahorro real en la red.
+    """
+
+    def __init__(self, app, minimum_size: int = 1024, gzip_level: int = 6, brotli_quality: int = 4):
+        self.app = app
+        self.minimum_size = minimum_size
+        self.gzip_level = gzip_level
+        self.brotli_quality = brotli_quality
+
+    def _encoder_for(self, accept_encoding: str):
+        qualities = parse_accept_encoding(accept_encoding)
+        wildcard = qualities.get("*", 0.0)
+        # La de mayor q entre las que el cliente acepta (q > 0); a igualdad, brotli
+        candidates = [("gzip", lambda: _GzipEncoder(self.gzip_level))]
+        if brotli is not None:
+            candidates.insert(0, ("br", lambda: _BrotliEncoder(self.brotli_quality)))
+        best_q, best = 0.0, None
+        for coding, encoder in candidates:
+            q = qualities.get(coding, wildcard)
+            if q > best_q:
+                best_q, best = q, encoder
+        return best() if best is not None else None
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http":
+            await self.app(scope, receive, send)
+            return
+
+        encoder = self._encoder_for(Headers(scope=scope).get("accept-encoding", ""))
+        if encoder is None:
+            await self.app(scope, receive, send)
+            return
+
+        initial_message = None
+        passthrough = False
+        compressing = False
+        raw_bytes = sent_bytes = 0
+
+        async def send_compressed(message):
+            nonlocal initial_message, passthrough, compressing, raw_bytes, sent_bytes
+
+            if message["type"] == "http.response.start":
+                # Se retiene hasta ver el primer trozo del cuerpo y decidir si se comprime
+                initial_message = message
+                headers = Headers(raw=message["headers"])
+                content_type = headers.get("content-type", "")
+                passthrough = (
+                    "content-encoding" in headers
+                    or message["status"] in (204, 304)
+                    or content_type.startswith(SKIP_CONTENT_TYPES)
+                )
+                return
+
+            if message["type"] != "http.response.body":
+                await send(message)
+                return
+
+            body = message.get("body", b"")
+            more_body = message.get("more_body", False)
+
+            if initial_message is not None:
+                start, initial_message = initial_message, None
+                if not passthrough and (more_body or len(body) >= self.minimum_size):
+                    compressing = True
+                    headers = MutableHeaders(raw=start["headers"])
+                    headers["Content-Encoding"] = encoder.encoding
+                    headers.add_vary_header("Accept-Encoding")
+                    if "etag" in headers and not headers["etag"].startswith("W/"):
+                        # El cuerpo cambia byte a byte: la ETag fuerte deja de ser válida
+                        headers["ETag"] = "W/" + headers["etag"]
+                    if more_body:
+                        del headers["Content-Length"]
+                    else:
+                        compressed = encoder.compress(body, final=True)
+                        headers["Content-Length"] = str(len(compressed))
+                        RESPONSE_BYTES.labels("uncompressed", encoder.encoding).inc(len(body))
+                        RESPONSE_BYTES.labels("compressed", encoder.encoding).inc(len(compressed))
+                        message["body"] = compressed
+                        await send(start)
+                        await send(message)
+                        return
+                await send(start)
+
+            if compressing:
+                compressed = encoder.compress(body, final=not more_body)
+                raw_bytes += len(body)
+                sent_bytes += len(compressed)
+                if not more_body:
+                    RESPONSE_BYTES.labels("uncompressed", encoder.encoding).inc(raw_bytes)
+                    RESPONSE_BYTES.labels("compressed", encoder.encoding).inc(sent_bytes)
+                message["body"] = compressed
+
+            await send(message)
+
+        await self.app(scope, receive, send_compressed)
@@ -1,11 +1,22 @@
 from pydantic_settings import BaseSettings
-from typing import Optional
+from typing import Dict, Optional
 
 
 class Settings(BaseSettings):
     # --- Proyecto ---
     PROJECT_NAME: str = "Sistema de Reservas Vecinos"
     API_V1_STR: str = "/api/v1"
+    LOG_LEVEL: str = "INFO"
+    LOG_FORMAT: str = "json"  # "json" o "text"
+
+    # --- Compresión de respuestas ---
+    COMPRESSION_MINIMUM_SIZE: int = 1024
+    GZIP_LEVEL: int = 6
+    BROTLI_QUALITY: int = 4
+
+    # --- Profiling bajo demanda (cabecera X-Profile de un admin) ---
+    PROFILE_SAMPLE_INTERVAL_MS: float = 1.0
+    PROFILE_HISTORY: int = 20
 
     # --- Base de datos ---
     POSTGRES_USER: str
@@ -14,12 +25,51 @@ class Settings(BaseSettings):
     POSTGRES_PORT: int = 5432
     POSTGRES_DB: str
     DATABASE_URL: str
+    # Consultas más lentas que esto (ms) se registran en el log con los parámetros ocultos
+    SLOW_QUERY_THRESHOLD_MS: float = 200.0
+
+    # Réplicas de lectura opcionales (URLs separadas por comas). Vacío = todo al primario
+    READ_REPLICA_URLS: str = ""
+    # Una réplica con más retraso que esto (s) deja de recibir lecturas
+    REPLICA_MAX_LAG_SECONDS: float = 5.0
+    REPLICA_CHECK_INTERVAL_SECONDS: float = 2.0
+    # Tras escribir, las lecturas del mismo cliente van al primario durante esta ventana (s)
+    REPLICA_STICKY_SECONDS: float = 5.0
+
+    # Segundos que un worker sirve la configuración de instalaciones sin revalidarla
+    FACILITY_CACHE_TTL: float = 5.0
+
+    # --- Reservas ---
+    # "lock": bloqueo de la instalación por reserva. "actor": una cola por instalación que
+    # decide en memoria y guarda en lotes (mismo resultado, menos bloqueos en picos)
+    BOOKING_MODE: str = "lock"
+    BOOKING_BATCH_SIZE: int = 64
+    # Horas que se guarda la respuesta de una reserva con Idempotency-Key, y cada cuánto se purgan
+    IDEMPOTENCY_TTL_HOURS: int = 24
+    IDEMPOTENCY_SWEEP_SECONDS: float = 3600.0
+
+    # --- Ocupación en directo (SSE) ---
+    # Eventos pendientes por conexión antes de pedirle al cliente que resincronice
+    SSE_QUEUE_SIZE: int = 32
+    SSE_HEARTBEAT_SECONDS: float = 15.0
 
     # --- Seguridad ---
     SECRET_KEY: str
     PASSWORD_RESET_SECRET_KEY: str
     ALGORITHM: str = "HS256"
-    ACCESS_TOKEN_EXPIRE_MINUTES: int = 30
+    # Tokens de acceso cortos (se autorizan sin consultar la BD); se renuevan con el de refresco
+    ACCESS_TOKEN_EXPIRE_MINUTES: int = 5
+    REFRESH_TOKEN_EXPIRE_DAYS: int = 30
+    # Cada cuánto relee cada worker las revocaciones hechas por los demás
+    REVOCATION_SYNC_SECONDS: float = 2.0
+
+    # --- Rate limiting (login, registro, correos) ---
+    RATE_LIMIT_ENABLED: bool = True
+    # "postgres": contadores compartidos por todos los workers. "memory": por proceso.
+    # "auto": postgres si la BD lo es
+    RATE_LIMIT_BACKEND: str = "auto"
+    # Sustituye límites por defecto: {"login:ip": "50/60"} (peticiones/segundos, por IP o por email)
+    RATE_LIMITS: Dict[str, str] = {}
 
     # --- Administración ---
     ADMIN_USER: str
@@ -27,6 +77,9 @@ class Settings(BaseSettings):
     ADMIN_EMAIL: str
     # Email al que se desvían los correos si el destinatario es el admin (para pruebas)
     DEVIATION_EMAIL: Optional[str] = None
+    # Procesos para hashear contraseñas en la importación masiva, por worker de uvicorn
+    # (0 = un proceso por CPU; con varios workers, repartir los núcleos entre ellos)
+    IMPORT_HASH_WORKERS: int = 2
 
     # --- Email (SMTP) ---
     MAIL_USERNAME: str
@@ -39,6 +92,13 @@ class Settings(BaseSettings):
     # --- Firebase ---
     FIREBASE_CREDENTIALS_PATH: str
 
+    # --- Arranque (plazos máximos por dependencia, en segundos) ---
+    DB_INIT_TIMEOUT: float = 20.0
+    FIREBASE_INIT_TIMEOUT: float = 5.0
+    MINIO_INIT_TIMEOUT: float = 5.0
+    # Plazo de lectura de cada operación con MinIO (subida y borrado de avatares), en segundos
+    MINIO_READ_TIMEOUT: float = 30.0
+
     class Config:
         env_file = ".env"
         case_sensitive = True
@@ -1,31 +1,52 @@
 from fastapi import Depends, HTTPException, status
 from fastapi.security import OAuth2PasswordBearer
-from jose import jwt, JWTError
 from sqlalchemy.orm import Session
 from src.db.session import get_db
 from src.core.config import settings
 from src.models.user_model import User
+from src.services.auth_tokens import revocations
 
 oauth2_scheme = OAuth2PasswordBearer(tokenUrl="/api/v1/auth/login")
 
 
-def get_current_user(token: str = Depends(oauth2_scheme), db: Session = Depends(get_db)):
-    credentials_exception = HTTPException(
+def _credentials_exception() -> HTTPException:
+    return HTTPException(
         status_code=status.HTTP_401_UNAUTHORIZED,
         detail="No se pudieron validar las credenciales",
         headers={"WWW-Authenticate": "Bearer"},
     )
+
+
+def get_current_user(token: str = Depends(oauth2_scheme)) -> User:
+    """
+    Usuario autenticado a partir de los claims del token (id, email y rol), sin consultar la BD:
+    el token dura poco y las revocaciones (logout, cambio de contraseña...) se comprueban en memoria.
+    Devuelve un User sin sesión con esas tres columnas; para el resto, get_current_user_record.
+    """
+    credentials_exception = _credentials_exception()
+    # Import perezoso: jose (y su backend criptográfico) solo se carga con la primera petición autenticada
+    from jose import jwt, JWTError
+
     try:
         payload = jwt.decode(token, settings.SECRET_KEY, algorithms=[settings.ALGORITHM])
-        email: str = payload.get("sub")
-        if email is None:
-            raise credentials_exception
     except JWTError:
         raise credentials_exception
 
-    user = db.query(User).filter(User.email == email).first()
-    if user is None:
+    user_id = payload.get("uid")
+    role = payload.get("role")
+    # Los tokens anteriores (solo con el email) ya no valen: hay que volver a iniciar sesión
+    if not isinstance(user_id, int) or role is None:
         raise credentials_exception
+    if revocations.is_revoked(user_id, payload.get("sid"), payload.get("iat", 0)):
+        raise credentials_exception
+    return User(id=user_id, email=payload.get("sub"), role=role)
+
+
+def get_current_user_record(current_user: User = Depends(get_current_user), db: Session = Depends(get_db)) -> User:
+    """Fila completa del usuario autenticado, para los endpoints que necesitan algo más que los claims."""
+    user = db.get(User, current_user.id)
+    if user is None:
+        raise _credentials_exception()
     return user
 
 
@@ -35,4 +56,4 @@ def get_current_admin(current_user: User = Depends(get_current_user)):
             status_code=403,
             detail="Operación no permitida: Se requieren privilegios de administrador"
         )
-    return current_user
\ No newline at end of file
+    return current_user
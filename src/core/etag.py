@@ -0,0 +1,49 @@
+from typing import Optional
+
+from fastapi import Request, Response
+from sqlalchemy import text
+from sqlalchemy.orm import Session
+
+# `table_versions` tiene varios contadores por tabla (ver migración 9f3c1a7d5e21)
+TABLE_VERSION_SQL = text("SELECT sum(version) FROM table_versions WHERE table_name = :table_name")
+
+
+def table_version(db: Session, table_name: str) -> Optional[int]:
+    """
+    Versión de una tabla: suma de sus contadores, que los triggers incrementan en cada
+    INSERT/UPDATE/DELETE. Solo disponible en Postgres con las migraciones aplicadas.
+    """
+    if db.get_bind().dialect.name != "postgresql":
+        return None
+    return db.execute(TABLE_VERSION_SQL, {"table_name": table_name}).scalar()
+
+
+def table_etag(db: Session, table_name: str, *scope) -> Optional[str]:
+    """
+    ETag débil de un listado: versión de la tabla + lo que cambie el contenido para
+    este cliente (p. ej. el id del usuario). Se lee ANTES que los datos: si entre medias
+    hay una escritura, la ETag queda vieja y el cliente simplemente vuelve a descargar.
+    """
+    version = table_version(db, table_name)
+    if version is None:
+        return None
+    return 'W/"' + "-".join([table_name, str(version), *map(str, scope)]) + '"'
+
+
+def is_not_modified(request: Request, etag: Optional[str]) -> bool:
+    if etag is None:
+        return False
+    if_none_match = request.headers.get("if-none-match")
+    if not if_none_match:
+        return False
+    return if_none_match.strip() == "*" or etag in (tag.strip() for tag in if_none_match.split(","))
+
+
+def not_modified_response(etag: str) -> Response:
+    return Response(status_code=304, headers={"ETag": etag})
+
+
+def set_etag(response: Response, etag: Optional[str]) -> Response:
+    if etag is not None:
+        response.headers["ETag"] = etag
+    return response
@@ -0,0 +1,33 @@
+from typing import Iterable, List, Sequence, Type
+
+import orjson
+from fastapi import Query
+from pydantic import BaseModel
+from starlette.responses import JSONResponse
+
+# Parámetro opcional de los listados: salta la validación Pydantic fila a fila y serializa con orjson
+FAST_QUERY = Query(False, description="Respuesta rápida: columnas como tuplas + orjson, sin validación por fila")
+
+
+class FastJSONResponse(JSONResponse):
+    """
+    Respuesta serializada con orjson. Las fechas UTC se escriben con sufijo "Z",
+    igual que hace Pydantic, para que el frontend reciba exactamente el mismo JSON.
+    """
+
+    def render(self, content) -> bytes:
+        return orjson.dumps(content, option=orjson.OPT_UTC_Z)
+
+
+def columns_for(model, schema: Type[BaseModel]) -> List:
+    """Columnas del modelo ORM que necesita el esquema de respuesta (y solo esas)."""
+    return [getattr(model, name) for name in schema.model_fields]
+
+
+def rows_response(columns: Sequence, rows: Iterable[tuple]) -> FastJSONResponse:
+    """
+    Construye la respuesta directamente desde tuplas de BD, sin instanciar objetos
+    ORM ni validar cada fila con Pydantic (los datos ya vienen tipados de la BD).
+    """
+    keys = tuple(column.key for column in columns)
+    return FastJSONResponse([dict(zip(keys, row)) for row in rows])
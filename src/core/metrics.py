@@ -0,0 +1,131 @@
+import os
+import time
+from typing import Dict, Tuple
+
+from anyio.to_thread import current_default_thread_limiter
+from prometheus_client import (
+    CONTENT_TYPE_LATEST,
+    REGISTRY,
+    CollectorRegistry,
+    Counter,
+    Gauge,
+    Histogram,
+    generate_latest,
+)
+
+# Con varios workers de uvicorn cada proceso escribe sus métricas en ficheros mmap
+# dentro de PROMETHEUS_MULTIPROC_DIR y /metrics agrega los de todos los procesos.
+MULTIPROCESS_DIR = os.getenv("PROMETHEUS_MULTIPROC_DIR")
+
+# Ruta para peticiones que no casan con ningún endpoint (evita explosión de cardinalidad con 404s)
+UNMATCHED_ROUTE = "<unmatched>"
+
+REQUEST_LATENCY = Histogram(
+    "http_request_duration_seconds",
+    "Latencia de las peticiones HTTP por ruta, método y código de estado",
+    ("method", "route", "status"),
+    buckets=(0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0),
+)
+REQUESTS_IN_FLIGHT = Gauge(
+    "http_requests_in_flight",
+    "Peticiones HTTP en curso",
+    multiprocess_mode="livesum",
+)
+THREADPOOL_IN_USE = Gauge(
+    "threadpool_threads_in_use",
+    "Hilos del threadpool de anyio ocupados (endpoints y dependencias síncronas)",
+    multiprocess_mode="livesum",
+)
+THREADPOOL_CAPACITY = Gauge(
+    "threadpool_threads_total",
+    "Tamaño máximo del threadpool de anyio",
+    multiprocess_mode="livesum",
+)
+RESPONSE_BYTES = Counter(
+    "http_response_bytes_total",
+    "Bytes de cuerpo de respuesta antes y después de comprimir",
+    ("stage", "encoding"),
+)
+
+
+class MetricsMiddleware:
+    """
+    Middleware ASGI que mide la latencia por plantilla de ruta (/reservations/{reservation_id},
+    no la URL real), las peticiones en curso y la ocupación del threadpool.
+    Los hijos del histograma se cachean por (método, ruta, estado) para no crear
+    diccionarios de etiquetas en cada petición.
+    """
+
+    def __init__(self, app):
+        self.app = app
+        self._children: Dict[Tuple[str, object, int], object] = {}
+        self._route_templates: Dict[object, str] = {}
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http":
+            await self.app(scope, receive, send)
+            return
+
+        status_code = 500
+
+        async def send_wrapper(message):
+            nonlocal status_code
+            if message["type"] == "http.response.start":
+                status_code = message["status"]
+            await send(message)
+
+        limiter = current_default_thread_limiter()
+        REQUESTS_IN_FLIGHT.inc()
+        THREADPOOL_IN_USE.set(limiter.borrowed_tokens)
+        start = time.perf_counter()
+        try:
+            await self.app(scope, receive, send_wrapper)
+        finally:
+            elapsed = time.perf_counter() - start
+            REQUESTS_IN_FLIGHT.dec()
+            THREADPOOL_IN_USE.set(limiter.borrowed_tokens)
+            self._child(scope, status_code).observe(elapsed)
+
+    def _child(self, scope, status_code: int):
+        # El router de Starlette deja el endpoint resuelto en el scope
+        endpoint = scope.get("endpoint")
+        key = (scope["method"], endpoint, status_code)
+        child = self._children.get(key)
+        if child is None:
+            child = REQUEST_LATENCY.labels(scope["method"], self._route_template(scope, endpoint), str(status_code))
+            self._children[key] = child
+        return child
+
+    def _route_template(self, scope, endpoint) -> str:
+        if endpoint is None:
+            return UNMATCHED_ROUTE
+        if not self._route_templates:
+            self._route_templates = {
+                getattr(route, "endpoint", None): route.path for route in scope["app"].routes
+            }
+        return self._route_templates.get(endpoint, UNMATCHED_ROUTE)
+
+
+def render_metrics() -> Tuple[bytes, str]:
+    """Serializa las métricas en formato texto de Prometheus (agregando todos los workers si aplica)."""
+    if MULTIPROCESS_DIR:
+        from prometheus_client import multiprocess
+
+        registry = CollectorRegistry()
+        multiprocess.MultiProcessCollector(registry)
+        return generate_latest(registry), CONTENT_TYPE_LATEST
+
+    return generate_latest(REGISTRY), CONTENT_TYPE_LATEST
+
+
+def start_worker_metrics() -> None:
+    """Registra el tamaño del threadpool de este worker (llamar desde el lifespan)."""
+    THREADPOOL_CAPACITY.set(current_default_thread_limiter().total_tokens)
+
+
+def stop_worker_metrics() -> None:
+    """Limpia los gauges `live*` del worker al apagarse (solo en modo multiproceso)."""
+    if MULTIPROCESS_DIR:
+        from prometheus_client import multiprocess
+
+        multiprocess.mark_process_dead(os.getpid())
@@ -0,0 +1,188 @@
+import itertools
+import sys
+import threading
+import time
+from collections import Counter, deque
+from datetime import datetime, timezone
+from typing import Deque, Optional
+
+from fastapi import HTTPException
+from starlette.responses import JSONResponse
+
+from src.core.config import settings
+
+PROFILE_HEADER = b"x-profile"
+
+# Hojas de pila que indican un hilo ocioso (event loop esperando, worker del threadpool sin trabajo)
+IDLE_LEAVES = {
+    ("select", "selectors.py"),
+    ("wait", "threading.py"),
+    ("get", "queue.py"),
+}
+
+
+class StackSampler:
+    """
+    Profiler por muestreo: un hilo aparte captura cada `interval` segundos la pila de
+    todos los hilos (event loop + threadpool, donde corren los endpoints síncronos)
+    y acumula las pilas en formato "folded" (compatible con speedscope / flamegraph.pl).
+    """
+
+    def __init__(self, interval: float):
+        self.interval = interval
+        self.samples: Counter = Counter()
+        self._stop = threading.Event()
+        self._thread = threading.Thread(target=self._run, name="profiler-sampler", daemon=True)
+
+    def start(self) -> None:
+        self._thread.start()
+
+    def stop(self) -> None:
+        self._stop.set()
+        self._thread.join()
+
+    def _run(self) -> None:
+        own_id = threading.get_ident()
+        while not self._stop.wait(self.interval):
+            for thread_id, frame in sys._current_frames().items():
+                if thread_id == own_id:
+                    continue
+                code = frame.f_code
+                if (code.co_name, code.co_filename.rsplit("/", 1)[-1]) in IDLE_LEAVES:
+                    continue
+                stack = []
+                while frame is not None:
+                    code = frame.f_code
+                    stack.append(f"{code.co_name} ({_short_path(code.co_filename)}:{code.co_firstlineno})")
+                    frame = frame.f_back
+                self.samples[";".join(reversed(stack))] += 1
+
+    def folded(self) -> str:
+        return "\n".join(f"{stack} {count}" for stack, count in self.samples.most_common())
+
+
+def _short_path(filename: str) -> str:
+    index = filename.rfind("/src/")
+    if index != -1:
+        return filename[index + 1:]
+    return "/".join(filename.rsplit("/", 2)[-2:])
+
+
+class ProfileStore:
+    """Últimos N perfiles en memoria (por worker), consultables desde el endpoint de admin."""
+
+    def __init__(self, max_profiles: int):
+        self._profiles: Deque[dict] = deque(maxlen=max_profiles)
+        self._ids = itertools.count(1)
+        self._lock = threading.Lock()
+
+    def add(self, method: str, path: str, status: int, duration: float, sampler: StackSampler) -> int:
+        with self._lock:
+            profile_id = next(self._ids)
+            self._profiles.append({
+                "id": profile_id,
+                "method": method,
+                "path": path,
+                "status": status,
+                "duration_ms": round(duration * 1000, 2),
+                "samples": sum(sampler.samples.values()),
+                "created_at": datetime.now(timezone.utc).isoformat(),
+                "folded": sampler.folded(),
+            })
+        return profile_id
+
+    def list(self) -> list:
+        with self._lock:
+            return [{k: v for k, v in p.items() if k != "folded"} for p in reversed(self._profiles)]
+
+    def get(self, profile_id: int) -> Optional[dict]:
+        with self._lock:
+            return next((p for p in self._profiles if p["id"] == profile_id), None)
+
+
+profile_store = ProfileStore(settings.PROFILE_HISTORY)
+
+
+def authorize_admin(authorization: str) -> bool:
+    """Misma comprobación que get_current_admin, pero fuera de la inyección de dependencias."""
+    from src.core.deps import get_current_admin, get_current_user
+
+    scheme, _, token = authorization.partition(" ")
+    if scheme.lower() != "bearer" or not token:
+        return False
+
+    try:
+        get_current_admin(get_current_user(token=token))
+        return True
+    except HTTPException:
+        return False
+
+
+class ProfilingMiddleware:
+    """
+    Perfila bajo demanda las peticiones con la cabecera `X-Profile` de un administrador.
+    El perfil queda en memoria y su id se devuelve en la cabecera `X-Profile-Id`.
+    Sin la cabecera el coste es recorrer la lista de cabeceras una vez.
+    """
+
+    def __init__(self, app):
+        self.app = app
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http":
+            await self.app(scope, receive, send)
+            return
+
+        wants_profile = False
+        authorization = ""
+        for name, value in scope["headers"]:
+            if name == PROFILE_HEADER:
+                wants_profile = True
+            elif name == b"authorization":
+                authorization = value.decode("latin-1")
+        if not wants_profile:
+            await self.app(scope, receive, send)
+            return
+
+        # Solo claims y revocaciones en memoria: no hace falta el threadpool
+        if not authorize_admin(authorization):
+            response = JSONResponse({"detail": "El profiling requiere privilegios de administrador"}, status_code=403)
+            await response(scope, receive, send)
+            return
+
+        sampler = StackSampler(settings.PROFILE_SAMPLE_INTERVAL_MS / 1000)
+        start = time.perf_counter()
+        status_code = 500
+        response_start = None
+        profile_id = None
+
+        def finish() -> int:
+            nonlocal profile_id
+            if profile_id is None:
+                sampler.stop()
+                profile_id = profile_store.add(
+                    scope["method"], scope["path"], status_code, time.perf_counter() - start, sampler
+                )
+            return profile_id
+
+        async def send_wrapper(message):
+            nonlocal status_code, response_start
+            if message["type"] == "http.response.start":
+                # Se retiene el inicio de la respuesta hasta conocer el id del perfil
+                status_code = message["status"]
+                response_start = message
+                return
+            if response_start is not None:
+                if not message.get("more_body", False):
+                    response_start["headers"] = list(response_start.get("headers", [])) + [
+                        (b"x-profile-id", str(finish()).encode())
+                    ]
+                await send(response_start)
+                response_start = None
+            await send(message)
+
+        sampler.start()
+        try:
+            await self.app(scope, receive, send_wrapper)
+        finally:
+            finish()
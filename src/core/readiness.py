@@ -0,0 +1,95 @@
+import logging
+import threading
+import time
+from typing import Callable, Dict, Optional
+
+logger = logging.getLogger(__name__)
+
+# Estados posibles de una dependencia externa
+PENDING = "pending"
+READY = "ready"
+FAILED = "failed"
+
+
+class Dependency:
+    """
+    Dependencia externa (BD, Firebase, MinIO...) con inicialización perezosa.
+    El estado se consulta desde /health/ready y se reintenta en el primer uso
+    si falló en el arranque (como mucho una vez cada `retry_after` segundos).
+    """
+
+    def __init__(self, name: str, init: Callable[[], None], critical: bool = False,
+                 timeout: float = 5.0, retry_after: float = 30.0):
+        self.name = name
+        self.critical = critical
+        self.timeout = timeout
+        self.retry_after = retry_after
+        self._init = init
+        self._lock = threading.Lock()
+        self.state = PENDING
+        self.error: Optional[str] = None
+        self.duration: Optional[float] = None
+        self._last_attempt = 0.0
+
+    def ensure(self) -> bool:
+        """Inicializa la dependencia si aún no está lista. Devuelve True si está disponible."""
+        if self.state == READY:
+            return True
+
+        with self._lock:
+            if self.state == READY:
+                return True
+            if self.state == FAILED and time.monotonic() - self._last_attempt < self.retry_after:
+                return False
+
+            self._last_attempt = time.monotonic()
+            try:
+                self._init()
+            except Exception as e:
+                self.state = FAILED
+                self.error = str(e)
+                self.duration = time.monotonic() - self._last_attempt
+                logger.warning("Dependencia %s no disponible: %s", self.name, e)
+                return False
+
+            self.state = READY
+            self.error = None
+            self.duration = time.monotonic() - self._last_attempt
+            logger.info("Dependencia %s lista en %.2fs", self.name, self.duration)
+            return True
+
+    def mark_failed(self, error: str) -> None:
+        """
+        Marca la dependencia como caída (p. ej. al superar su plazo de arranque).
+        No toma el lock: se llama desde el event loop mientras el hilo de
+        inicialización puede seguir ocupándolo; si termina bien pasará a READY.
+        """
+        if self.state != READY:
+            self.state = FAILED
+            self.error = error
+            self._last_attempt = time.monotonic()
+
+    def snapshot(self) -> dict:
+        return {
+            "state": self.state,
+            "critical": self.critical,
+            "error": self.error,
+            "duration_ms": round(self.duration * 1000, 1) if self.duration is not None else None,
+        }
+
+
+# Registro global de dependencias de la aplicación
+dependencies: Dict[str, Dependency] = {}
+
+
+def register(name: str, init: Callable[[], None], **kwargs) -> Dependency:
+    dependency = Dependency(name, init, **kwargs)
+    dependencies[name] = dependency
+    return dependency
+
+
+def readiness_report() -> dict:
+    """Estado agregado: listo solo si todas las dependencias críticas lo están."""
+    report = {name: dep.snapshot() for name, dep in dependencies.items()}
+    ready = all(dep.state == READY for dep in dependencies.values() if dep.critical)
+    return {"status": "ready" if ready else "unavailable", "dependencies": report}
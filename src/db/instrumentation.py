@@ -0,0 +1,121 @@
+import logging
+import re
+import time
+from contextlib import contextmanager
+from contextvars import ContextVar
+from typing import Optional
+
+from sqlalchemy import event
+from sqlalchemy.engine import Engine
+
+logger = logging.getLogger(__name__)
+
+
+class QueryStats:
+    """Número de sentencias SQL y tiempo total en BD atribuidos a una petición."""
+
+    __slots__ = ("count", "duration")
+
+    def __init__(self):
+        self.count = 0
+        self.duration = 0.0
+
+
+# Estadísticas de la petición en curso. Los endpoints síncronos corren en el threadpool,
+# pero anyio copia el contexto al hilo, así que comparten el mismo objeto QueryStats.
+current_query_stats: ContextVar[Optional[QueryStats]] = ContextVar("current_query_stats", default=None)
+
+
+def instrument_engine(engine: Engine, slow_query_ms: float) -> None:
+    """Cuenta y cronometra cada sentencia del engine; registra las que superan `slow_query_ms`."""
+
+    @event.listens_for(engine, "before_cursor_execute")
+    def _before_cursor_execute(conn, cursor, statement, parameters, context, executemany):
+        conn.info["query_start"] = time.perf_counter()
+
+    @event.listens_for(engine, "after_cursor_execute")
+    def _after_cursor_execute(conn, cursor, statement, parameters, context, executemany):
+        elapsed = time.perf_counter() - conn.info.pop("query_start", time.perf_counter())
+
+        stats = current_query_stats.get()
+        if stats is not None:
+            stats.count += 1
+            stats.duration += elapsed
+
+        if elapsed * 1000 >= slow_query_ms:
+            # Nunca se registran los valores: pueden contener emails, hashes o códigos
+            logger.warning(
+                "Consulta lenta (%.1f ms): %s [parámetros ocultos: %s]",
+                elapsed * 1000, " ".join(statement.split()), _describe_parameters(parameters, executemany),
+            )
+
+
+def _describe_parameters(parameters, executemany: bool) -> str:
+    if executemany:
+        return f"{len(parameters)} filas"
+    if isinstance(parameters, dict):
+        return ", ".join(sorted(parameters))
+    return f"{len(parameters or ())} posicionales"
+
+
+class QueryStatsMiddleware:
+    """
+    Middleware ASGI que abre un QueryStats por petición y lo publica en la cabecera
+    `Server-Timing` (visible en la pestaña Network de las DevTools).
+    """
+
+    def __init__(self, app):
+        self.app = app
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http":
+            await self.app(scope, receive, send)
+            return
+
+        stats = QueryStats()
+        token = current_query_stats.set(stats)
+
+        async def send_wrapper(message):
+            if message["type"] == "http.response.start":
+                message.setdefault("headers", [])
+                message["headers"] = list(message["headers"]) + [(b"server-timing", server_timing(stats).encode())]
+            await send(message)
+
+        try:
+            await self.app(scope, receive, send_wrapper)
+        finally:
+            current_query_stats.reset(token)
+
+
+def server_timing(stats: QueryStats) -> str:
+    return f'db;desc="{stats.count} queries";dur={stats.duration * 1000:.2f}'
+
+
+_SERVER_TIMING_COUNT = re.compile(r'db;desc="(\d+) queries"')
+
+
+def query_count(response) -> int:
+    """Número de sentencias SQL que ejecutó una respuesta (leído de su cabecera Server-Timing)."""
+    match = _SERVER_TIMING_COUNT.search(response.headers.get("server-timing", ""))
+    if match is None:
+        raise AssertionError("La respuesta no trae la cabecera Server-Timing con el recuento de consultas")
+    return int(match.group(1))
+
+
+@contextmanager
+def track_queries():
+    """Cuenta las sentencias ejecutadas en el bloque (mismo hilo/contexto)."""
+    stats = QueryStats()
+    token = current_query_stats.set(stats)
+    try:
+        yield stats
+    finally:
+        current_query_stats.reset(token)
+
+
+@contextmanager
+def assert_max_queries(max_queries: int):
+    """Helper de tests: falla si el bloque ejecuta más de `max_queries` sentencias."""
+    with track_queries() as stats:
+        yield stats
+    assert stats.count <= max_queries, f"Se ejecutaron {stats.count} consultas (máximo {max_queries})"
@@ -0,0 +1,159 @@
+import itertools
+import logging
+import threading
+import time
+from typing import Dict, List, Optional
+
+from sqlalchemy import create_engine, text
+from sqlalchemy.orm import sessionmaker
+
+from src.db.instrumentation import instrument_engine
+
+logger = logging.getLogger(__name__)
+
+# Segundos de retraso de la réplica. Si ya ha aplicado todo lo recibido el retraso es 0
+# aunque el primario lleve rato sin escrituras (si no, now() - replay crecería sin parar).
+# En un servidor que no es réplica las funciones devuelven NULL -> 0.
+REPLICA_LAG_SQL = text("""
+    SELECT COALESCE(
+        CASE WHEN pg_last_wal_receive_lsn() = pg_last_wal_replay_lsn() THEN 0
+             ELSE EXTRACT(EPOCH FROM now() - pg_last_xact_replay_timestamp())
+        END, 0)
+""")
+
+STICKY_COOKIE = "primary_until"
+SAFE_METHODS = {"GET", "HEAD", "OPTIONS"}
+
+
+class Replica:
+    def __init__(self, url: str, slow_query_ms: float, connect_timeout: int):
+        self.url = url
+        self.engine = create_engine(url, pool_pre_ping=True, connect_args={"connect_timeout": connect_timeout})
+        instrument_engine(self.engine, slow_query_ms=slow_query_ms)
+        self.session_factory = sessionmaker(autocommit=False, autoflush=False, bind=self.engine)
+        self.usable = True
+        self.lag: Optional[float] = None
+        self.next_check = 0.0
+        self._checking = threading.Lock()
+
+
+class ReplicaRouter:
+    """
+    Reparte las lecturas entre réplicas en round-robin. Cada réplica se comprueba como
+    mucho una vez cada `check_interval` segundos (conexión + retraso); si falla o va más
+    de `max_lag` segundos por detrás queda fuera hasta la siguiente comprobación.
+    Sin réplicas utilizables las lecturas van al primario.
+    """
+
+    def __init__(self, urls: List[str], max_lag: float, check_interval: float,
+                 slow_query_ms: float, connect_timeout: int = 2):
+        self.max_lag = max_lag
+        self.check_interval = check_interval
+        self.replicas = [Replica(url, slow_query_ms, connect_timeout) for url in urls]
+        self._next = itertools.count()
+
+    def pick(self) -> Optional[sessionmaker]:
+        if not self.replicas:
+            return None
+        start = next(self._next)
+        for offset in range(len(self.replicas)):
+            replica = self.replicas[(start + offset) % len(self.replicas)]
+            if self._is_usable(replica):
+                return replica.session_factory
+        return None
+
+    def _is_usable(self, replica: Replica) -> bool:
+        if time.monotonic() < replica.next_check:
+            return replica.usable
+        # Solo un hilo comprueba; el resto usa el último estado conocido sin esperar
+        if not replica._checking.acquire(blocking=False):
+            return replica.usable
+        try:
+            was_usable = replica.usable
+            try:
+                with replica.engine.connect() as connection:
+                    replica.lag = float(connection.execute(REPLICA_LAG_SQL).scalar())
+                replica.usable = replica.lag <= self.max_lag
+            except Exception as e:
+                replica.lag = None
+                replica.usable = False
+                if was_usable:
+                    logger.warning("Réplica %s no disponible: %s", replica.engine.url.host, e)
+            else:
+                if was_usable != replica.usable:
+                    logger.warning("Réplica %s %s (retraso %.1fs)", replica.engine.url.host,
+                                   "recuperada" if replica.usable else "retrasada", replica.lag)
+            replica.next_check = time.monotonic() + self.check_interval
+            return replica.usable
+        finally:
+            replica._checking.release()
+
+
+class PrimaryStickiness:
+    """
+    Ventana de lectura desde el primario tras una escritura, para que quien acaba de
+    reservar vea su reserva aunque las réplicas vayan por detrás. Se recuerda en el
+    worker (por cabecera Authorization) y en una cookie, que vale en cualquier worker.
+    """
+
+    def __init__(self, window: float):
+        self.window = window
+        self._until: Dict[str, float] = {}
+        self._lock = threading.Lock()
+
+    def mark(self, key: str) -> float:
+        until = time.time() + self.window
+        with self._lock:
+            if len(self._until) > 10_000:
+                now = time.time()
+                self._until = {k: v for k, v in self._until.items() if v > now}
+            self._until[key] = until
+        return until
+
+    def is_sticky(self, key: Optional[str], cookie: Optional[str]) -> bool:
+        now = time.time()
+        if cookie:
+            try:
+                # La cookie la controla el cliente: nunca vale más allá de una ventana desde ahora
+                if now < float(cookie) <= now + self.window:
+                    return True
+            except ValueError:
+                pass
+        if key:
+            with self._lock:
+                return self._until.get(key, 0) > now
+        return False
+
+
+class PrimaryStickinessMiddleware:
+    """
+    Tras una escritura con éxito de un usuario autenticado activa la ventana de lectura
+    desde el primario. Las peticiones sin credencial (login, contacto...) no la activan.
+    """
+
+    def __init__(self, app, stickiness: PrimaryStickiness):
+        self.app = app
+        self.stickiness = stickiness
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http" or scope["method"] in SAFE_METHODS or not self.stickiness.window:
+            await self.app(scope, receive, send)
+            return
+
+        authorization = None
+        for name, value in scope["headers"]:
+            if name == b"authorization":
+                authorization = value.decode("latin-1")
+                break
+        if not authorization:
+            await self.app(scope, receive, send)
+            return
+
+        async def send_wrapper(message):
+            if message["type"] == "http.response.start" and message["status"] < 400:
+                until = self.stickiness.mark(authorization)
+                cookie = f"{STICKY_COOKIE}={until:.3f}; Max-Age={int(self.stickiness.window) + 1}; Path=/; HttpOnly; SameSite=Lax"
+                message["headers"] = list(message.get("headers", [])) + [(b"set-cookie", cookie.encode("latin-1"))]
+            await send(message)
+
+        await self.app(scope, receive, send_wrapper)
@@ -1,10 +1,16 @@
+from fastapi import Request
 from sqlalchemy import create_engine
 from sqlalchemy.orm import sessionmaker
 from src.core.config import settings
+from src.db.instrumentation import instrument_engine
+from src.db.replicas import STICKY_COOKIE, PrimaryStickiness, ReplicaRouter
 
 # Creamos el motor de base de datos
 engine = create_engine(settings.DATABASE_URL)
 
+# Recuento de consultas por petición y log de consultas lentas
+instrument_engine(engine, slow_query_ms=settings.SLOW_QUERY_THRESHOLD_MS)
+
 # Creamos la fábrica de sesiones
 SessionLocal = sessionmaker(autocommit=False, autoflush=False, bind=engine)
 
@@ -14,4 +20,26 @@ def get_db():
     try:
         yield db
     finally:
-        db.close()
\ No newline at end of file
+        db.close()
+
+
+# Réplicas de lectura (opcionales) y ventana de lectura desde el primario tras escribir
+replica_router = ReplicaRouter(
+    [url.strip() for url in settings.READ_REPLICA_URLS.split(",") if url.strip()],
+    max_lag=settings.REPLICA_MAX_LAG_SECONDS,
+    check_interval=settings.REPLICA_CHECK_INTERVAL_SECONDS,
+    slow_query_ms=settings.SLOW_QUERY_THRESHOLD_MS,
+)
+primary_stickiness = PrimaryStickiness(settings.REPLICA_STICKY_SECONDS)
+
+
+# Dependencia para endpoints de solo lectura: réplica si hay una sana y el cliente no acaba de escribir
+def get_read_db(request: Request):
+    session_factory = None
+    if not primary_stickiness.is_sticky(request.headers.get("authorization"), request.cookies.get(STICKY_COOKIE)):
+        session_factory = replica_router.pick()
+    db = (session_factory or SessionLocal)()
+    try:
+        yield db
+    finally:
+        db.close()
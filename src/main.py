@@ -1,38 +1,99 @@
+import asyncio
+import logging
+import time
 from fastapi import FastAPI
 from fastapi.middleware.cors import CORSMiddleware
+from fastapi.responses import JSONResponse, Response
 from contextlib import asynccontextmanager
 from src.core.config import settings
-from src.services.firebase import initialize_firebase
-from src.routers import users, auth, reservations, support
-from src.services.storage import init_bucket
+from src.core.logging_config import RequestIdMiddleware, setup_logging
+from src.core.compression import CompressionMiddleware
+from src.core.profiling import ProfilingMiddleware
+from src.core.metrics import MetricsMiddleware, render_metrics, start_worker_metrics, stop_worker_metrics
+from src.db.instrumentation import QueryStatsMiddleware
+from src.core.readiness import Dependency, dependencies, readiness_report, register
+import src.services.firebase  # noqa: F401 (registra la dependencia)
+from src.routers import users, auth, reservations, support, profiling
+import src.services.storage  # noqa: F401 (registra la dependencia)
+from src.services.facility_registry import facility_registry
+from src.services.occupancy import OccupancyListener, occupancy_bus
+from src.services.booking_actor import booking_actors
+from src.services.idempotency import sweep_periodically
+from src.services.auth_tokens import sync_periodically as sync_revocations_periodically
+from src.services import rate_limit
+from src.services.user_import import shutdown_hash_pool
+from src.db.session import engine, primary_stickiness
+from src.db.replicas import PrimaryStickinessMiddleware
 from src.scripts.init_db import create_initial_data
 
+setup_logging(settings.LOG_LEVEL, settings.LOG_FORMAT)
+logger = logging.getLogger(__name__)
+
+
+def init_database() -> None:
+    create_initial_data()
+    # Tras sembrar, el registro de instalaciones arranca ya cargado
+    facility_registry.warm()
+
+
+# Crítica: sin tablas ni datos iniciales no servimos tráfico
+register("database", init_database, critical=True, timeout=settings.DB_INIT_TIMEOUT)
+
+
+async def start_dependency(dependency: Dependency) -> None:
+    """Inicializa una dependencia en un hilo aparte respetando su plazo máximo."""
+    try:
+        await asyncio.wait_for(asyncio.to_thread(dependency.ensure), timeout=dependency.timeout)
+    except asyncio.TimeoutError:
+        dependency.mark_failed(f"Tiempo de arranque agotado ({dependency.timeout}s)")
+        logger.warning("%s no respondió en %ss, se reintentará en el primer uso", dependency.name, dependency.timeout)
+
+
 @asynccontextmanager
 async def lifespan(app: FastAPI):
-    print("🚀 Arrancando sistema...")
+    logger.info("Arrancando sistema...")
+    started = time.monotonic()
+    start_worker_metrics()
 
-    # Inicializar Firebase (Auth)
-    try:
-        initialize_firebase()
-        print("Firebase inicializado correctamente")
-    except Exception as e:
-        print(f"Error al inicializar Firebase: {e}")
+    # Las no críticas (Firebase, MinIO) se calientan en segundo plano sin bloquear el arranque
+    warmups = [
+        asyncio.create_task(start_dependency(dep))
+        for dep in dependencies.values() if not dep.critical
+    ]
 
-    # Inicializar MinIO
-    try:
-        init_bucket()
-        print("MinIO (Bucket 'avatars') verificado/creado")
-    except Exception as e:
-        print(f"⚠Error al conectar con MinIO: {e}")
+    # Las críticas (BD + datos iniciales) en paralelo, cada una con su plazo
+    await asyncio.gather(*(
+        start_dependency(dep) for dep in dependencies.values() if dep.critical
+    ))
+    logger.info("Sistema listo en %.2fs", time.monotonic() - started)
 
-    # Crear Administrador Automático
-    try:
-        create_initial_data()
-    except Exception as e:
-        print(f"⚠Error creando superusuario: {e}")
+    # Cambios de ocupación de otros workers (NOTIFY) hacia las conexiones SSE de este
+    listener = None
+    if engine.dialect.name == "postgresql":
+        listener = OccupancyListener(engine, occupancy_bus)
+        listener.start()
+
+    # Purga de claves de idempotencia caducadas
+    sweeper = asyncio.create_task(sweep_periodically(settings.IDEMPOTENCY_SWEEP_SECONDS))
+    # Revocaciones de tokens hechas en otros workers (logout, cambio de contraseña)
+    revocation_sync = asyncio.create_task(sync_revocations_periodically(settings.REVOCATION_SYNC_SECONDS))
+    # Contadores de rate limit de ventanas ya pasadas
+    rate_limit_sweeper = asyncio.create_task(rate_limit.sweep_periodically())
 
     yield
-    print("Apagando sistema...")
+
+    sweeper.cancel()
+    revocation_sync.cancel()
+    rate_limit_sweeper.cancel()
+
+    for task in warmups:
+        task.cancel()
+    if listener is not None:
+        await asyncio.to_thread(listener.stop)
+    await booking_actors.stop()
+    await asyncio.to_thread(shutdown_hash_pool)
+    stop_worker_metrics()
+    logger.info("Apagando sistema...")
 
 
 app = FastAPI(title=settings.PROJECT_NAME, lifespan=lifespan)
@@ -51,13 +112,44 @@ app.add_middleware(
     allow_headers=["*"],
 )
 
+app.add_middleware(
+    CompressionMiddleware,
+    minimum_size=settings.COMPRESSION_MINIMUM_SIZE,
+    gzip_level=settings.GZIP_LEVEL,
+    brotli_quality=settings.BROTLI_QUALITY,
+)
+app.add_middleware(ProfilingMiddleware)
+
+app.add_middleware(QueryStatsMiddleware)
+app.add_middleware(PrimaryStickinessMiddleware, stickiness=primary_stickiness)
+app.add_middleware(RequestIdMiddleware)
+
+# Se añade el último para quedar por fuera y medir también el coste del resto de middlewares
+app.add_middleware(MetricsMiddleware)
+
 app.include_router(auth.router, tags=["Authentication"], prefix="/api/v1/auth")
 app.include_router(users.router, prefix="/api/v1/users", tags=["Users"])
 app.include_router(reservations.router, prefix="/api/v1/reservations", tags=["Reservations"])
 
 app.include_router(support.router, prefix="/api/v1/support", tags=["support"])
+app.include_router(profiling.router, prefix="/api/v1/admin/profiles", tags=["Admin"])
 
 
 @app.get("/")
 def root():
-    return {"message": "La app esta corriendo... OK"}
\ No newline at end of file
+    return {"message": "La app esta corriendo... OK"}
+
+
+@app.get("/health/ready")
+def health_ready():
+    """Estado de cada dependencia externa. 503 mientras alguna crítica no esté lista."""
+    report = readiness_report()
+    status_code = 200 if report["status"] == "ready" else 503
+    return JSONResponse(report, status_code=status_code)
+
+
+@app.get("/metrics", include_in_schema=False)
+def metrics():
+    """Métricas en formato Prometheus (latencias por ruta, peticiones en curso, threadpool)."""
+    body, content_type = render_metrics()
+    return Response(content=body, media_type=content_type)
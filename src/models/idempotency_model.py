@@ -0,0 +1,26 @@
+from sqlalchemy import Column, Integer, String, Text, DateTime, ForeignKey
+from sqlalchemy.sql import func
+from src.db.base import Base
+
+
+class IdempotencyKey(Base):
+    __tablename__ = "idempotency_keys"
+
+    # La clave la genera el cliente: solo es única dentro de cada usuario
+    user_id = Column(Integer, ForeignKey("users.id", ondelete="CASCADE"), primary_key=True)
+    key = Column(String(255), primary_key=True)
+
+    # Huella del cuerpo: la misma clave con otra petición es un error del cliente
+    request_hash = Column(String(64), nullable=False)
+
+    # Respuesta guardada para los reenvíos. Vacía solo mientras la primera petición está en
+    # curso, y eso no lo ve nadie más: la fila se inserta y se completa en la misma transacción
+    status_code = Column(Integer, nullable=True)
+    response_body = Column(Text, nullable=True)
+
+    created_at = Column(
+        DateTime(timezone=True),
+        server_default=func.now(),
+        nullable=False,
+    )
+    expires_at = Column(DateTime(timezone=True), nullable=False, index=True)
@@ -0,0 +1,22 @@
+from sqlalchemy import BigInteger, Column, DDL, DateTime, Integer, String, event
+from src.db.base import Base
+
+
+class RateLimitCounter(Base):
+    __tablename__ = "rate_limit_counters"
+
+    # Hash de "ruta:tipo:valor" (no se guardan IPs ni emails en claro)
+    key = Column(String(32), primary_key=True)
+    # Inicio de la ventana fija (epoch en segundos, múltiplo de su duración)
+    window_start = Column(BigInteger, primary_key=True)
+    hits = Column(Integer, nullable=False, default=1)
+    # Pasada la ventana siguiente el contador ya no pesa en ninguna estimación
+    expires_at = Column(DateTime(timezone=True), nullable=False, index=True)
+
+
+# Contadores efímeros: en Postgres sin WAL (UNLOGGED), perderlos en una caída no importa
+event.listen(
+    RateLimitCounter.__table__,
+    "after_create",
+    DDL("ALTER TABLE rate_limit_counters SET UNLOGGED").execute_if(dialect="postgresql"),
+)
@@ -1,4 +1,5 @@
-from sqlalchemy import Column, Integer, String, DateTime, ForeignKey, Float
+from sqlalchemy import Boolean, Column, Integer, String, DateTime, ForeignKey, Float, false, text
+from sqlalchemy.dialects.postgresql import ExcludeConstraint
 from sqlalchemy.orm import relationship
 from sqlalchemy.sql import func
 from src.db.base import Base
@@ -8,7 +9,7 @@ class Reservation(Base):
     __tablename__ = "reservations"
 
     id = Column(Integer, primary_key=True, index=True)
-    user_id = Column(Integer, ForeignKey("users.id"), nullable=False)
+    user_id = Column(Integer, ForeignKey("users.id", ondelete="CASCADE"), nullable=False)
 
     # Detalles de la reserva
     facility = Column(String, index=True, nullable=False)
@@ -20,6 +21,10 @@ class Reservation(Base):
 
     status = Column(String, default="confirmed")  # Opcional, útil para el dashboard
 
+    # Reserva de una instalación de aforo 1 (pistas de pádel): la BD impide solapes
+    # con la restricción de exclusión, sin bloqueos ni recuentos en la aplicación
+    is_exclusive = Column(Boolean, nullable=False, default=False, server_default=false())
+
     created_at = Column(
         DateTime(timezone=True),
         server_default=func.now(),
@@ -27,4 +32,14 @@ class Reservation(Base):
     )
 
     # Relación con Usuario
-    user = relationship("User", back_populates="reservations")
\ No newline at end of file
+    user = relationship("User", back_populates="reservations")
+
+    __table_args__ = (
+        ExcludeConstraint(
+            (facility, "="),
+            (func.tstzrange(start_time, end_time), "&&"),
+            name="reservations_exclusive_no_overlap",
+            using="gist",
+            where=text("is_exclusive"),
+        ).ddl_if(dialect="postgresql"),
+    )
\ No newline at end of file
@@ -0,0 +1,39 @@
+from sqlalchemy import Column, Integer, String, DateTime, ForeignKey
+from sqlalchemy.sql import func
+from src.db.base import Base
+
+
+class RefreshToken(Base):
+    __tablename__ = "refresh_tokens"
+
+    id = Column(Integer, primary_key=True, index=True)
+    user_id = Column(Integer, ForeignKey("users.id", ondelete="CASCADE"), nullable=False, index=True)
+
+    # Solo el hash (SHA-256): el token tiene entropía de sobra y se busca por igualdad
+    token_hash = Column(String(64), nullable=False, unique=True, index=True)
+
+    # Sesión (familia de rotaciones). Los tokens de acceso la llevan en el claim `sid`
+    session_id = Column(String(32), nullable=False, index=True)
+
+    created_at = Column(
+        DateTime(timezone=True),
+        server_default=func.now(),
+        nullable=False,
+    )
+    expires_at = Column(DateTime(timezone=True), nullable=False)
+    # Ya canjeado por otro: volver a presentarlo es una reutilización y revoca la sesión
+    rotated_at = Column(DateTime(timezone=True), nullable=True)
+
+
+class TokenRevocation(Base):
+    __tablename__ = "token_revocations"
+
+    id = Column(Integer, primary_key=True, index=True)
+    # Sin clave foránea: la revocación debe sobrevivir al borrado de la cuenta
+    user_id = Column(Integer, nullable=False)
+    # Con sesión: revoca solo esa sesión. Sin ella: todos los tokens del usuario emitidos antes de revoked_at
+    session_id = Column(String(32), nullable=True)
+
+    revoked_at = Column(DateTime(timezone=True), nullable=False)
+    # Pasado este momento ya no queda ningún token de acceso afectado y la fila sobra
+    expires_at = Column(DateTime(timezone=True), nullable=False, index=True)
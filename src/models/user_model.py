@@ -31,5 +31,6 @@ class User(Base):
     created_at = Column(DateTime(timezone=True), server_default=func.now())
     updated_at = Column(DateTime(timezone=True), onupdate=func.now())
 
-    # Cascade "all, delete" para que si se borra el usuario, se borren sus reservas
-    reservations = relationship("Reservation", back_populates="user", cascade="all, delete")
\ No newline at end of file
+    # Las reservas se borran en la propia BD (FK con ON DELETE CASCADE): passive_deletes evita
+    # que SQLAlchemy las cargue en sesión y lance un DELETE por fila antes de borrar el usuario
+    reservations = relationship("Reservation", back_populates="user", cascade="all, delete", passive_deletes=True)
\ No newline at end of file
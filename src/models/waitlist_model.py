@@ -0,0 +1,39 @@
+from sqlalchemy import Column, Integer, String, DateTime, ForeignKey, Index, text
+from sqlalchemy.sql import func
+from src.db.base import Base
+
+
+class WaitlistEntry(Base):
+    __tablename__ = "waitlist"
+
+    id = Column(Integer, primary_key=True, index=True)
+    user_id = Column(Integer, ForeignKey("users.id", ondelete="CASCADE"), nullable=False)
+
+    # Tramo que se espera (mismo formato que una reserva)
+    facility = Column(String, nullable=False)
+    start_time = Column(DateTime(timezone=True), nullable=False)
+    end_time = Column(DateTime(timezone=True), nullable=False)
+
+    # waiting -> promoted (se le creó la reserva) | expired (ya tenía plaza en ese horario)
+    status = Column(String, nullable=False, default="waiting", server_default="waiting")
+    reservation_id = Column(Integer, ForeignKey("reservations.id", ondelete="SET NULL"), nullable=True)
+
+    created_at = Column(
+        DateTime(timezone=True),
+        server_default=func.now(),
+        nullable=False,
+    )
+    promoted_at = Column(DateTime(timezone=True), nullable=True)
+
+    __table_args__ = (
+        # Cola de un tramo por orden de llegada; solo se indexan las entradas que esperan
+        Index(
+            "ix_waitlist_queue", "facility", "start_time", "end_time", "created_at",
+            postgresql_where=text("status = 'waiting'"), sqlite_where=text("status = 'waiting'"),
+        ),
+        # Una sola entrada en espera por usuario y tramo
+        Index(
+            "uq_waitlist_waiting_user_slot", "user_id", "facility", "start_time", "end_time", unique=True,
+            postgresql_where=text("status = 'waiting'"), sqlite_where=text("status = 'waiting'"),
+        ),
+    )
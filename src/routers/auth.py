@@ -1,15 +1,17 @@
 import random
 import string
-from fastapi import APIRouter, Depends, HTTPException, status, BackgroundTasks
+from fastapi import APIRouter, Depends, HTTPException, Request, status, BackgroundTasks
 from fastapi.security import OAuth2PasswordRequestForm
 from sqlalchemy.orm import Session
 from pydantic import BaseModel, EmailStr
 from datetime import timedelta, datetime, timezone
 from src.db.session import get_db
-from src.core.security import create_access_token, verify_password, get_password_hash
-from src.core.config import settings
+from src.core.security import verify_password, get_password_hash
+from src.core.deps import get_current_user
 from src.models.user_model import User
 from src.schemas.token_schema import Token
+from src.services import auth_tokens
+from src.services.rate_limit import RateLimiter, get_rate_limiter
 from src.services.firebase import verify_id_token
 from src.services.email import send_verification_email, send_reset_password_email
 
@@ -40,10 +42,17 @@ class ResetPasswordSchema(BaseModel):
     new_password: str
 
 
+class RefreshSchema(BaseModel):
+    refresh_token: str
+
+
 # --- ENDPOINTS ---
 
 @router.post("/login", response_model=Token)
-def login_for_access_token(form_data: OAuth2PasswordRequestForm = Depends(), db: Session = Depends(get_db)):
+def login_for_access_token(request: Request, form_data: OAuth2PasswordRequestForm = Depends(),
+                           db: Session = Depends(get_db), limiter: RateLimiter = Depends(get_rate_limiter)):
+    # Antes de bcrypt: cada intento fallido cuesta CPU
+    limiter.check(request, "login", email=form_data.username)
     user = db.query(User).filter(User.email == form_data.username).first()
     if not user or not verify_password(form_data.password, user.hashed_password):
         raise HTTPException(
@@ -55,12 +64,9 @@ def login_for_access_token(form_data: OAuth2PasswordRequestForm = Depends(), db:
     if not user.is_active:
         raise HTTPException(status_code=400, detail="Cuenta no verificada. Revisa tu correo.")
 
-    access_token_expires = timedelta(minutes=settings.ACCESS_TOKEN_EXPIRE_MINUTES)
-    access_token = create_access_token(
-        data={"sub": user.email, "role": user.role},
-        expires_delta=access_token_expires
-    )
-    return {"access_token": access_token, "token_type": "bearer"}
+    tokens = auth_tokens.issue_tokens(db, user)
+    db.commit()
+    return tokens
 
 
 @router.post("/login/social", response_model=Token)
@@ -91,11 +97,40 @@ def social_login(schema: SocialLoginSchema, db: Session = Depends(get_db)):
         db.refresh(new_user)
         user = new_user
 
-    # Generar token para el usuario (existente o nuevo)
-    access_token = create_access_token(
-        data={"sub": user.email, "role": user.role}
-    )
-    return {"access_token": access_token, "token_type": "bearer"}
+    # Generar tokens para el usuario (existente o nuevo)
+    tokens = auth_tokens.issue_tokens(db, user)
+    db.commit()
+    return tokens
+
+
+@router.post("/refresh", response_model=Token)
+def refresh_access_token(schema: RefreshSchema, db: Session = Depends(get_db)):
+    """
+    Canjea el token de refresco por un token de acceso nuevo y otro de refresco (rotación:
+    el anterior deja de valer). Así los tokens de acceso pueden durar minutos sin obligar
+    a reenviar la contraseña.
+    """
+    tokens = auth_tokens.rotate(db, schema.refresh_token)
+    db.commit()
+    return tokens
+
+
+@router.post("/logout", status_code=status.HTTP_204_NO_CONTENT)
+def logout(schema: RefreshSchema, db: Session = Depends(get_db)):
+    """Cierra la sesión del token de refresco: deja de valer y sus tokens de acceso también."""
+    session = auth_tokens.find_session(db, schema.refresh_token)
+    if session:
+        auth_tokens.revoke_session(db, session.user_id, session.session_id)
+        db.commit()
+    return None
+
+
+@router.post("/logout-all", status_code=status.HTTP_204_NO_CONTENT)
+def logout_all(db: Session = Depends(get_db), current_user: User = Depends(get_current_user)):
+    """Cierra todas las sesiones del usuario en todos sus dispositivos."""
+    auth_tokens.revoke_user(db, current_user.id)
+    db.commit()
+    return None
 
 
 @router.post("/verify-email")
@@ -122,10 +157,13 @@ def verify_email(schema: VerificationSchema, db: Session = Depends(get_db)):
 
 @router.post("/resend-verification")
 def resend_verification(
+        request: Request,
         schema: ResendSchema,
         background_tasks: BackgroundTasks,
-        db: Session = Depends(get_db)
+        db: Session = Depends(get_db),
+        limiter: RateLimiter = Depends(get_rate_limiter),
 ):
+    limiter.check(request, "resend-verification", email=schema.email)
     user = db.query(User).filter(User.email == schema.email).first()
     if not user:
         raise HTTPException(status_code=404, detail="Usuario no encontrado")
@@ -144,10 +182,12 @@ def resend_verification(
 
 
 @router.post("/forgot-password")
-def forgot_password(schema: ForgotPasswordSchema, background_tasks: BackgroundTasks, db: Session = Depends(get_db)):
+def forgot_password(request: Request, schema: ForgotPasswordSchema, background_tasks: BackgroundTasks,
+                    db: Session = Depends(get_db), limiter: RateLimiter = Depends(get_rate_limiter)):
     """
     Inicia el proceso de recuperación. Genera un código, lo guarda en la BD y lo envía por email.
     """
+    limiter.check(request, "forgot-password", email=schema.email)
     user = db.query(User).filter(User.email == schema.email).first()
 
     code = ''.join(random.choices(string.digits, k=6))
@@ -167,10 +207,13 @@ def forgot_password(schema: ForgotPasswordSchema, background_tasks: BackgroundTa
 
 
 @router.post("/reset-password")
-def reset_password(schema: ResetPasswordSchema, db: Session = Depends(get_db)):
+def reset_password(request: Request, schema: ResetPasswordSchema, db: Session = Depends(get_db),
+                   limiter: RateLimiter = Depends(get_rate_limiter)):
     """
     Verifica el código desde la BD y cambia la contraseña.
     """
+    # También frena probar los códigos de 6 dígitos por fuerza bruta
+    limiter.check(request, "reset-password", email=schema.email)
     user = db.query(User).filter(User.email == schema.email).first()
 
     # Verificar si el usuario existe y tiene un código activo
@@ -192,6 +235,9 @@ def reset_password(schema: ResetPasswordSchema, db: Session = Depends(get_db)):
     # Actualizar contraseña en BD
     user.hashed_password = get_password_hash(schema.new_password)
 
+    # Las sesiones abiertas con la contraseña anterior dejan de valer
+    auth_tokens.revoke_user(db, user.id)
+
     # Limpiar código usado para que no se pueda reusar
     user.reset_password_code = None
     user.reset_password_code_expires_at = None
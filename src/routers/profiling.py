@@ -0,0 +1,28 @@
+from fastapi import APIRouter, Depends, HTTPException
+from fastapi.responses import PlainTextResponse
+from src.core.deps import get_current_admin
+from src.core.profiling import profile_store
+from src.models.user_model import User
+
+router = APIRouter()
+
+
+@router.get("/")
+def list_profiles(admin: User = Depends(get_current_admin)):
+    """
+    Últimos perfiles capturados en este worker con la cabecera `X-Profile`.
+    """
+    return profile_store.list()
+
+
+@router.get("/{profile_id}", response_class=PlainTextResponse)
+def download_profile(profile_id: int, admin: User = Depends(get_current_admin)):
+    """Descarga el perfil en formato "folded" (abrir con speedscope.app o flamegraph.pl)"""
+    profile = profile_store.get(profile_id)
+    if not profile:
+        raise HTTPException(status_code=404, detail="Perfil no encontrado")
+
+    return PlainTextResponse(
+        profile["folded"],
+        headers={"Content-Disposition": f'attachment; filename="profile-{profile_id}.folded"'},
+    )
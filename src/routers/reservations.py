@@ -1,18 +1,39 @@
-from datetime import datetime
+import logging
+import anyio
+from datetime import date, datetime
 from typing import List, Optional
-from fastapi import APIRouter, Depends, HTTPException, status
+from fastapi import APIRouter, BackgroundTasks, Depends, Header, HTTPException, Request, Response, status
+from fastapi.concurrency import run_in_threadpool
+from fastapi.responses import StreamingResponse
 from sqlalchemy.orm import Session
-from sqlalchemy import func
-from src.db.session import get_db
+from src.db.session import get_db, get_read_db
 from src.core.deps import get_current_user, get_current_admin
+from src.core.config import settings
+from src.core.etag import is_not_modified, not_modified_response, set_etag, table_etag
+from src.core.fast_json import FAST_QUERY, FastJSONResponse, columns_for, rows_response
 from src.models.user_model import User
 from src.models.reservation_model import Reservation
 from src.models.facility_model import Facility
-from src.schemas.reservation_schema import ReservationCreate, ReservationResponse
+from src.models.waitlist_model import WaitlistEntry
+from src.schemas.reservation_schema import (
+    ReservationBatchCreate, ReservationBatchItem, ReservationBatchResult, ReservationCreate, ReservationResponse,
+    WaitlistResponse,
+)
+from src.services.booking import MAX_BATCH_WINDOWS, book_many, expand_recurrence, set_exclusive, uses_exclusion
+from src.services.booking_actor import booking_actors
+from src.services.facility_registry import facility_registry
+from src.services.email import send_waitlist_promotion_email
+from src.services.occupancy import notify_capacity, notify_slot, notify_slots, occupancy_bus
+from src.services.reservation_repository import ReservationRepository, get_read_repository, get_repository
+from src.services import idempotency, waitlist
 from pydantic import BaseModel
 
+logger = logging.getLogger(__name__)
+
 router = APIRouter()
 
+RESERVATION_COLUMNS = columns_for(Reservation, ReservationResponse)
+
 
 # Modelo para las estadísticas del admin
 class AdminStats(BaseModel):
@@ -24,12 +45,20 @@ class AdminStats(BaseModel):
 # Gestión de instalaciones 
 
 @router.get("/facilities")
-def get_facilities(db: Session = Depends(get_db)):
+def get_facilities(request: Request, response: Response, fast: bool = FAST_QUERY, db: Session = Depends(get_read_db)):
     """
     Devuelve la configuración actual (precios y aforo) de todas las instalaciones.
     El frontend usa esto para pintar la interfaz dinámicamente.
+    Se sirve desde el registro en memoria, con ETag derivada de su contenido.
     """
-    return db.query(Facility).all()
+    snapshot = facility_registry.snapshot(db)
+    if is_not_modified(request, snapshot.etag):
+        return not_modified_response(snapshot.etag)
+
+    if fast:
+        return set_etag(FastJSONResponse(snapshot.items), snapshot.etag)
+    set_etag(response, snapshot.etag)
+    return snapshot.items
 
 
 @router.put("/facilities/{facility_id}")
@@ -45,9 +74,14 @@ def update_facility(
     if not facility:
         raise HTTPException(status_code=404, detail="Instalación no encontrada")
 
+    if (facility.capacity == 1) != (capacity == 1):
+        set_exclusive(db, facility.name, capacity == 1)
     facility.price = price
     facility.capacity = capacity
+    notify_capacity(db, facility.name, capacity)
     db.commit()
+    # Este worker ve el cambio al instante; el resto al revalidar (FACILITY_CACHE_TTL)
+    facility_registry.load(db)
     return {"message": f"Instalación {facility.name} actualizada correctamente"}
 
 
@@ -57,72 +91,128 @@ def update_facility(
 def create_reservation(
         reservation: ReservationCreate,
         db: Session = Depends(get_db),
-        current_user: User = Depends(get_current_user)
+        repository: ReservationRepository = Depends(get_repository),
+        current_user: User = Depends(get_current_user),
+        idempotency_key: Optional[str] = Header(None, max_length=idempotency.MAX_KEY_LENGTH),
 ):
     # Validar fechas
     if reservation.start_time >= reservation.end_time:
         raise HTTPException(status_code=400, detail="La hora de inicio debe ser anterior a la de fin")
 
-    facility_conf = db.query(Facility)\
-        .filter(Facility.name == reservation.facility)\
-        .with_for_update()\
-        .first()
-
+    # Precio y aforo salen del registro en memoria
+    facility_conf = facility_registry.get(db, reservation.facility)
     if not facility_conf:
         raise HTTPException(status_code=404, detail="Instalación no encontrada o no disponible")
 
-    # Evitar duplicados 
-    already_booked = db.query(Reservation).filter(
-        Reservation.user_id == current_user.id,
-        Reservation.facility == reservation.facility,
-        Reservation.start_time < reservation.end_time,
-        Reservation.end_time > reservation.start_time
-    ).first()
-
-    if already_booked:
-        raise HTTPException(
-            status_code=400,
-            detail="Ya tienes una plaza reservada en este horario."
+    claim = None
+    if idempotency_key:
+        # Reenvío de una petición ya resuelta: su respuesta guardada, sin bloqueo ni nueva reserva.
+        # La clave se reclama en la transacción de la reserva, así que va por el camino con bloqueo
+        claim, replay = idempotency.claim(db, current_user.id, idempotency_key, reservation.model_dump(mode="json"))
+        if replay is not None:
+            return replay
+    elif settings.BOOKING_MODE == "actor" and not uses_exclusion(db, facility_conf):
+        # Modo actor: decide la cola de la instalación (en memoria y en lotes) y ya hace el commit
+        return anyio.from_thread.run(
+            booking_actors.submit, facility_conf, current_user.id, reservation.start_time, reservation.end_time
         )
 
-    # Control de aforo
-    existing_count = db.query(Reservation).filter(
-        Reservation.facility == reservation.facility,
-        Reservation.start_time < reservation.end_time,
-        Reservation.end_time > reservation.start_time
-    ).count()
-
-    if existing_count >= facility_conf.capacity:
-        raise HTTPException(
-            status_code=409,
-            detail=f"Aforo completo ({existing_count}/{facility_conf.capacity} plazas ocupadas)."
-        )
-
-    # Calcular precio (Precio base de BD + 21% IVA)
-    price_with_tax = facility_conf.price * 1.21
-
-    new_reservation = Reservation(
-        facility=reservation.facility,
-        start_time=reservation.start_time,
-        end_time=reservation.end_time,
-        user_id=current_user.id,
-        price=round(price_with_tax, 2)
-    )
+    if claim is None:
+        new_reservation = repository.book(current_user.id, facility_conf, reservation.start_time, reservation.end_time)
+    else:
+        try:
+            # Savepoint: un rechazo deshace solo la reserva y la clave reclamada guarda el error
+            with db.begin_nested():
+                new_reservation = repository.book(
+                    current_user.id, facility_conf, reservation.start_time, reservation.end_time
+                )
+        except HTTPException as e:
+            idempotency.store_error(db, claim, e)
+            raise
 
     try:
-        db.add(new_reservation)
+        notify_slot(db, new_reservation.facility, new_reservation.start_time,
+                    new_reservation.end_time, facility_conf.capacity)
+        body = None
+        if claim is not None:
+            body = ReservationResponse.model_validate(new_reservation).model_dump_json()
+            idempotency.complete(claim, status.HTTP_200_OK, body)
         db.commit()
+        if body is not None:
+            # Exactamente la misma respuesta que recibirán los reenvíos
+            return Response(content=body, media_type="application/json")
         db.refresh(new_reservation)
         return new_reservation
     except Exception as e:
         db.rollback()
-        print(f"Error creando reserva: {e}")
+        logger.exception("Error creando reserva para el usuario %s", current_user.id)
+        raise HTTPException(status_code=500, detail="Error interno al guardar reserva")
+
+
+@router.post("/batch", response_model=ReservationBatchResult)
+def create_reservations_batch(
+        batch: ReservationBatchCreate,
+        db: Session = Depends(get_db),
+        current_user: User = Depends(get_current_user)
+):
+    """
+    Reserva varios tramos de una instalación en una sola transacción: una lista explícita
+    (`windows`) o una repetición (`recurrence`, p. ej. de lunes a viernes hasta fin de mes).
+    Devuelve el resultado de cada tramo; los que chocan no impiden guardar el resto.
+    """
+    if (batch.windows is None) == (batch.recurrence is None):
+        raise HTTPException(status_code=400, detail="Indica 'windows' o 'recurrence' (solo uno)")
+    if batch.recurrence is not None:
+        windows = expand_recurrence(batch.recurrence)
+    else:
+        windows = [(window.start_time, window.end_time) for window in batch.windows]
+
+    if not windows:
+        raise HTTPException(status_code=400, detail="No hay tramos que reservar")
+    if len(windows) > MAX_BATCH_WINDOWS:
+        raise HTTPException(status_code=400, detail=f"Como máximo {MAX_BATCH_WINDOWS} tramos por petición")
+    if any(start >= end for start, end in windows):
+        raise HTTPException(status_code=400, detail="La hora de inicio debe ser anterior a la de fin")
+
+    facility_conf = facility_registry.get(db, batch.facility)
+    if not facility_conf:
+        raise HTTPException(status_code=404, detail="Instalación no encontrada o no disponible")
+
+    outcomes = book_many(db, current_user.id, facility_conf, windows)
+    # Los ids ya están tras el INSERT; leerlos antes del commit evita recargar cada reserva
+    results = [
+        ReservationBatchItem(
+            start_time=start_time,
+            end_time=end_time,
+            status=state,
+            detail=detail,
+            reservation_id=reservation.id if reservation is not None else None,
+        )
+        for (start_time, end_time), (state, detail, reservation) in zip(windows, outcomes)
+    ]
+
+    try:
+        notify_slots(db, facility_conf.name, {(r.start_time, r.end_time) for _, _, r in outcomes if r is not None},
+                     facility_conf.capacity)
+        db.commit()
+    except Exception:
+        db.rollback()
+        logger.exception("Error creando reservas múltiples para el usuario %s", current_user.id)
         raise HTTPException(status_code=500, detail="Error interno al guardar reserva")
 
+    return ReservationBatchResult(
+        facility=facility_conf.name,
+        created=sum(item.status == "created" for item in results),
+        results=results,
+    )
+
 
 @router.get("/", response_model=List[ReservationResponse])
 def read_all_reservations(
-        db: Session = Depends(get_db),
+        request: Request,
+        response: Response,
+        fast: bool = FAST_QUERY,
+        db: Session = Depends(get_read_db),
         current_user: User = Depends(get_current_user)
 ):
     """
@@ -130,88 +220,107 @@ def read_all_reservations(
     - Si es ADMIN: Devuelve TODAS las reservas (para el panel de control).
     - Si es USER: Devuelve solo las suyas.
     """
-    if current_user.role == "admin":
-        return db.query(Reservation).order_by(Reservation.start_time.desc()).all()
-    else:
-        return db.query(Reservation).filter(Reservation.user_id == current_user.id).order_by(
-            Reservation.start_time.desc()).all()
+    etag = table_etag(db, "reservations", "all" if current_user.role == "admin" else current_user.id)
+    if is_not_modified(request, etag):
+        return not_modified_response(etag)
+
+    query = db.query(*RESERVATION_COLUMNS) if fast else db.query(Reservation)
+    if current_user.role != "admin":
+        query = query.filter(Reservation.user_id == current_user.id)
+    query = query.order_by(Reservation.start_time.desc())
+
+    if fast:
+        return set_etag(rows_response(RESERVATION_COLUMNS, query.all()), etag)
+    set_etag(response, etag)
+    return query.all()
 
 
 @router.get("/me", response_model=List[ReservationResponse])
-def read_my_reservations(db: Session = Depends(get_db), current_user: User = Depends(get_current_user)):
+def read_my_reservations(request: Request, response: Response, fast: bool = FAST_QUERY,
+                         db: Session = Depends(get_read_db), current_user: User = Depends(get_current_user)):
     """Devuelve las reservas del usuario actual"""
-    return db.query(Reservation) \
+    etag = table_etag(db, "reservations", current_user.id)
+    if is_not_modified(request, etag):
+        return not_modified_response(etag)
+
+    query = db.query(*RESERVATION_COLUMNS) if fast else db.query(Reservation)
+    query = query \
         .filter(Reservation.user_id == current_user.id) \
-        .order_by(Reservation.start_time.desc()) \
-        .all()
+        .order_by(Reservation.start_time.desc())
+
+    if fast:
+        return set_etag(rows_response(RESERVATION_COLUMNS, query.all()), etag)
+    set_etag(response, etag)
+    return query.all()
 
 
 @router.get("/availability")
-def get_availability(facility: str, date_str: str, db: Session = Depends(get_db)):
+def get_availability(facility: str, date_str: str, db: Session = Depends(get_read_db),
+                     repository: ReservationRepository = Depends(get_read_repository)):
     """
     Devuelve ocupación real vs capacidad de la BD.
     Aquí NO hace falta bloqueo porque es solo lectura.
     """
-    try:
-        search_date = datetime.strptime(date_str, "%Y-%m-%d").date()
-    except ValueError:
-        raise HTTPException(status_code=400, detail="Formato fecha inválido (YYYY-MM-DD)")
+    search_date = _parse_day(date_str)
 
-    # Buscar configuración en BD
-    facility_conf = db.query(Facility).filter(Facility.name == facility).first()
+    # Configuración desde el registro en memoria
+    facility_conf = facility_registry.get(db, facility)
     if not facility_conf:
         return []
 
-    # Obtener reservas
-    reservations = db.query(Reservation).filter(
-        Reservation.facility == facility,
-        func.date(Reservation.start_time) == search_date
-    ).all()
+    return repository.day_slots(facility_conf, search_date)
 
-    # Agrupar
-    slots_data = {}
-    for res in reservations:
-        start_iso = res.start_time.isoformat()
 
-        if start_iso not in slots_data:
-            slots_data[start_iso] = {
-                "start": start_iso,
-                "end": res.end_time.isoformat(),
-                "count": 0,
-                "capacity": facility_conf.capacity  # Capacidad dinámica de la BD
-            }
+@router.get("/availability/stream")
+async def stream_availability(facility: str, date_str: str, db: Session = Depends(get_read_db),
+                              repository: ReservationRepository = Depends(get_read_repository)):
+    """
+    Ocupación en directo (Server-Sent Events) de una instalación y día, para no tener
+    que sondear /availability. Primero llega un evento `snapshot` (mismo formato que
+    /availability) y después `slot` (nuevo recuento de un tramo), `capacity` (cambio
+    de aforo) o `resync` (el cliente debe volver a pedir /availability).
+    """
+    search_date = _parse_day(date_str)
+    facility_conf = await run_in_threadpool(facility_registry.get, db, facility)
+    if not facility_conf:
+        raise HTTPException(status_code=404, detail="Instalación no encontrada")
+
+    # Suscribirse antes de leer la instantánea: ningún cambio se pierde entre medias
+    subscriber = occupancy_bus.subscribe(facility, search_date.isoformat())
+    try:
+        snapshot = await run_in_threadpool(repository.day_slots, facility_conf, search_date)
+    except Exception:
+        occupancy_bus.unsubscribe(subscriber)
+        raise
+
+    return StreamingResponse(
+        occupancy_bus.stream(subscriber, snapshot, settings.SSE_HEARTBEAT_SECONDS),
+        media_type="text/event-stream",
+        headers={"Cache-Control": "no-cache", "X-Accel-Buffering": "no"},
+    )
 
-        slots_data[start_iso]["count"] += 1
 
-    return list(slots_data.values())
+def _parse_day(date_str: str) -> date:
+    try:
+        return datetime.strptime(date_str, "%Y-%m-%d").date()
+    except ValueError:
+        raise HTTPException(status_code=400, detail="Formato fecha inválido (YYYY-MM-DD)")
 
 
 @router.get("/stats", response_model=AdminStats)
 def get_admin_stats(
-        db: Session = Depends(get_db),
+        repository: ReservationRepository = Depends(get_read_repository),
         admin: User = Depends(get_current_admin)
 ):
     """Estadísticas financieras y de uso"""
-    total_res = db.query(Reservation).count()
-    total_money = db.query(func.sum(Reservation.price)).scalar() or 0.0
-
-    popular = db.query(
-        Reservation.facility, func.count(Reservation.id)
-    ).group_by(Reservation.facility).order_by(func.count(Reservation.id).desc()).first()
-
-    popular_name = popular[0] if popular else "Sin datos"
-
-    return {
-        "total_reservations": total_res,
-        "total_earnings": round(total_money, 2),
-        "popular_facility": popular_name
-    }
+    return repository.stats()
 
 
 @router.delete("/{reservation_id}", status_code=status.HTTP_204_NO_CONTENT)
-def cancel_reservation(reservation_id: int, db: Session = Depends(get_db),
+def cancel_reservation(reservation_id: int, background_tasks: BackgroundTasks, db: Session = Depends(get_db),
+                       repository: ReservationRepository = Depends(get_repository),
                        current_user: User = Depends(get_current_user)):
-    res = db.query(Reservation).filter(Reservation.id == reservation_id).first()
+    res = repository.get(reservation_id)
 
     if not res:
         raise HTTPException(status_code=404, detail="Reserva no encontrada")
@@ -220,6 +329,63 @@ def cancel_reservation(reservation_id: int, db: Session = Depends(get_db),
     if res.user_id != current_user.id and current_user.role != 'admin':
         raise HTTPException(status_code=403, detail="No tienes permiso")
 
-    db.delete(res)
+    repository.cancel(res)
+    facility_conf = facility_registry.get(db, res.facility)
+    promoted = []
+    if facility_conf:
+        # La plaza liberada pasa al primero de la lista de espera en esta misma transacción
+        promoted = waitlist.promote(db, facility_conf, res.start_time, res.end_time)
+        notify_slot(db, res.facility, res.start_time, res.end_time, facility_conf.capacity)
+    db.commit()
+    for email, reservation in promoted:
+        background_tasks.add_task(send_waitlist_promotion_email, email, reservation.facility, reservation.start_time)
+    return None
+
+
+# Lista de espera
+
+@router.post("/waitlist", response_model=WaitlistResponse, status_code=status.HTTP_201_CREATED)
+def join_waitlist(
+        reservation: ReservationCreate,
+        db: Session = Depends(get_db),
+        current_user: User = Depends(get_current_user)
+):
+    """
+    Apunta al usuario en la cola de un tramo completo. Cuando alguien cancela, la plaza
+    se le asigna automáticamente por orden de llegada y se le avisa por email.
+    """
+    if reservation.start_time >= reservation.end_time:
+        raise HTTPException(status_code=400, detail="La hora de inicio debe ser anterior a la de fin")
+
+    facility_conf = facility_registry.get(db, reservation.facility)
+    if not facility_conf:
+        raise HTTPException(status_code=404, detail="Instalación no encontrada o no disponible")
+
+    entry = waitlist.enqueue(db, current_user.id, facility_conf, reservation.start_time, reservation.end_time)
+    db.commit()
+    db.refresh(entry)
+    return entry
+
+
+@router.get("/waitlist/me", response_model=List[WaitlistResponse])
+def read_my_waitlist(db: Session = Depends(get_read_db), current_user: User = Depends(get_current_user)):
+    """Entradas de lista de espera del usuario actual (en espera y ya promocionadas)"""
+    return db.query(WaitlistEntry)\
+        .filter(WaitlistEntry.user_id == current_user.id)\
+        .order_by(WaitlistEntry.start_time.desc())\
+        .all()
+
+
+@router.delete("/waitlist/{entry_id}", status_code=status.HTTP_204_NO_CONTENT)
+def leave_waitlist(entry_id: int, db: Session = Depends(get_db), current_user: User = Depends(get_current_user)):
+    entry = db.query(WaitlistEntry)\
+        .filter(WaitlistEntry.id == entry_id, WaitlistEntry.status == "waiting")\
+        .first()
+    if not entry:
+        raise HTTPException(status_code=404, detail="No estás en esa lista de espera")
+    if entry.user_id != current_user.id and current_user.role != 'admin':
+        raise HTTPException(status_code=403, detail="No tienes permiso")
+
+    db.delete(entry)
     db.commit()
     return None
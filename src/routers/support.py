@@ -1,9 +1,9 @@
 import logging
-from fastapi import APIRouter, HTTPException, BackgroundTasks
+from fastapi import APIRouter, BackgroundTasks, Depends, HTTPException, Request
 from pydantic import BaseModel, EmailStr
 from src.services.email import send_support_email
+from src.services.rate_limit import RateLimiter, get_rate_limiter
 
-logging.basicConfig(level=logging.INFO)
 logger = logging.getLogger(__name__)
 
 router = APIRouter()
@@ -17,13 +17,13 @@ class SupportSchema(BaseModel):
 
 
 @router.post("/contact")
-def contact_support(form: SupportSchema, background_tasks: BackgroundTasks):
+def contact_support(request: Request, form: SupportSchema, background_tasks: BackgroundTasks,
+                    limiter: RateLimiter = Depends(get_rate_limiter)):
     """
     Recibe el formulario de contacto del frontend y envía un email al administrador.
     """
-    logger.info(f"📨 [SOPORTE] Recibida solicitud de contacto.")
-    logger.info(f"    - De: {form.name} <{form.email}>")
-    logger.info(f"    - Asunto: {form.subject}")
+    limiter.check(request, "support", email=form.email)
+    logger.info("[SOPORTE] Solicitud de contacto de %s <%s>: %s", form.name, form.email, form.subject)
 
     background_tasks.add_task(send_support_email, form.dict())
 
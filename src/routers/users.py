@@ -1,4 +1,5 @@
-from typing import List
+from collections import defaultdict
+from typing import List, Optional
 from datetime import datetime, timedelta, timezone
 import random
 import uuid
@@ -11,30 +12,60 @@ from fastapi import (
     BackgroundTasks,
     UploadFile,
     File,
+    Query,
+    Request,
+    Response,
     status,
 )
+from sqlalchemy import delete, or_
 from sqlalchemy.orm import Session
 from dotenv import load_dotenv
 
-from src.db.session import get_db
+from src.db.session import get_db, get_read_db
+from src.models.reservation_model import Reservation
 from src.models.user_model import User
-from src.schemas.user_schema import UserCreate, UserResponse, UserUpdate
-from src.services.email import send_verification_email
-from src.services.storage import upload_file
+from src.schemas.user_schema import (
+    UserCreate,
+    UserImportReport,
+    UserListItem,
+    UserPage,
+    UserResponse,
+    UserUpdate,
+)
+from src.services.email import send_verification_email, send_verification_emails, send_waitlist_promotion_email
+from src.services.facility_registry import facility_registry
+from src.services.occupancy import notify_slots
+from src.services.storage import delete_file, upload_file
+from src.services.user_import import IMPORT_CODE_EXPIRES_TEXT, import_users
+from src.services.auth_tokens import revoke_user
+from src.services.rate_limit import RateLimiter, get_rate_limiter
+from src.services import waitlist
 from src.core.security import get_password_hash
-from src.core.deps import get_current_user, get_current_admin
+from src.core.deps import get_current_user_record, get_current_admin
+from src.core.etag import is_not_modified, not_modified_response, set_etag, table_etag
+from src.core.fast_json import FAST_QUERY, columns_for, rows_response
 
 load_dotenv()
 
 router = APIRouter()
 
+USER_COLUMNS = columns_for(User, UserResponse)
+USER_LIST_COLUMNS = columns_for(User, UserListItem)
+
+# Con menos caracteres los trigramas no filtran: se busca por prefijo
+MIN_TRIGRAM_QUERY = 3
+
 
 @router.post("/", response_model=UserResponse, status_code=status.HTTP_201_CREATED)
 def create_user(
+        request: Request,
         user_in: UserCreate,
         background_tasks: BackgroundTasks,
         db: Session = Depends(get_db),
+        limiter: RateLimiter = Depends(get_rate_limiter),
 ):
+    limiter.check(request, "register", email=user_in.email)
+
     # Verificar si el email ya existe
     user = db.query(User).filter(User.email == user_in.email).first()
     if user:
@@ -80,11 +111,41 @@ def create_user(
     return new_user
 
 
+@router.post("/import", response_model=UserImportReport)
+def import_users_csv(
+        background_tasks: BackgroundTasks,
+        file: UploadFile = File(...),
+        db: Session = Depends(get_db),
+        admin: User = Depends(get_current_admin),
+):
+    """
+    Alta masiva de residentes desde CSV (columnas: email, password y opcionalmente
+    full_name, apartment, phone, address, postal_code). Las filas inválidas se
+    informan una a una y los emails ya registrados se omiten.
+    """
+    try:
+        content = file.file.read().decode("utf-8-sig")  # utf-8-sig: CSV exportados desde Excel
+        report, invitations = import_users(db, content)
+    except UnicodeDecodeError:
+        raise HTTPException(
+            status_code=status.HTTP_400_BAD_REQUEST,
+            detail="El CSV debe estar codificado en UTF-8",
+        )
+    except ValueError as e:
+        raise HTTPException(status_code=status.HTTP_400_BAD_REQUEST, detail=str(e))
+
+    # Verificaciones en lotes SMTP, después de responder
+    if invitations:
+        background_tasks.add_task(send_verification_emails, invitations, IMPORT_CODE_EXPIRES_TEXT)
+
+    return report
+
+
 # -------------------------------------------------------------------
 # Perfil del usuario autenticado
 # -------------------------------------------------------------------
 @router.get("/me", response_model=UserResponse)
-def read_users_me(current_user: User = Depends(get_current_user)):
+def read_users_me(current_user: User = Depends(get_current_user_record)):
     return current_user
 
 
@@ -95,7 +156,7 @@ def read_users_me(current_user: User = Depends(get_current_user)):
 def update_user_me(
         user_update: UserUpdate,
         db: Session = Depends(get_db),
-        current_user: User = Depends(get_current_user),
+        current_user: User = Depends(get_current_user_record),
 ):
     if user_update.phone is not None:
         current_user.phone = user_update.phone
@@ -118,7 +179,7 @@ def update_user_me(
 def upload_avatar(
         file: UploadFile = File(...),
         db: Session = Depends(get_db),
-        current_user: User = Depends(get_current_user),
+        current_user: User = Depends(get_current_user_record),
 ):
     if not file.content_type.startswith("image/"):
         raise HTTPException(
@@ -146,24 +207,99 @@ def upload_avatar(
 
 @router.get("/", response_model=List[UserResponse])
 def read_users(
-        db: Session = Depends(get_db),
+        request: Request,
+        response: Response,
+        fast: bool = FAST_QUERY,
+        db: Session = Depends(get_read_db),
         admin: User = Depends(get_current_admin),
 ):
+    etag = table_etag(db, "users")
+    if is_not_modified(request, etag):
+        return not_modified_response(etag)
+
+    if fast:
+        return set_etag(rows_response(USER_COLUMNS, db.query(*USER_COLUMNS).all()), etag)
+    set_etag(response, etag)
     return db.query(User).all()
 
 
+@router.get("/search", response_model=UserPage)
+def search_users(
+        q: Optional[str] = Query(None, description="Texto a buscar en nombre, email o apartamento"),
+        cursor: Optional[int] = Query(None, description="next_cursor de la página anterior"),
+        limit: int = Query(50, ge=1, le=200),
+        db: Session = Depends(get_read_db),
+        admin: User = Depends(get_current_admin),
+):
+    """
+    Buscador paginado de residentes para el panel de admin.
+    Usa los índices GIN de trigramas (pg_trgm) y paginación por keyset sobre el id,
+    así el coste no crece con el número de página.
+    """
+    query = db.query(*USER_LIST_COLUMNS)
+
+    if q and q.strip():
+        term = q.strip().replace("\\", "\\\\").replace("%", "\\%").replace("_", "\\_")
+        pattern = f"{term}%" if len(term) < MIN_TRIGRAM_QUERY else f"%{term}%"
+        query = query.filter(or_(
+            User.full_name.ilike(pattern, escape="\\"),
+            User.email.ilike(pattern, escape="\\"),
+            User.apartment.ilike(pattern, escape="\\"),
+        ))
+
+    if cursor is not None:
+        query = query.filter(User.id > cursor)
+
+    # Se pide una fila de más para saber si existe página siguiente
+    rows = query.order_by(User.id).limit(limit + 1).all()
+    keys = [column.key for column in USER_LIST_COLUMNS]
+    items = [dict(zip(keys, row)) for row in rows[:limit]]
+    next_cursor = items[-1]["id"] if len(rows) > limit else None
+
+    return {"items": items, "next_cursor": next_cursor}
+
+
 @router.delete("/me", status_code=status.HTTP_204_NO_CONTENT)
 def delete_my_account(
+        background_tasks: BackgroundTasks,
         db: Session = Depends(get_db),
-        current_user: User = Depends(get_current_user),
+        current_user: User = Depends(get_current_user_record),
 ):
+    avatar_url = current_user.avatar_url
+    promoted = []
     try:
-        db.delete(current_user)  # cascade eliminará relaciones
+        # Plazas futuras que libera la baja, para la lista de espera y los streams de ocupación
+        freed = defaultdict(dict)
+        for facility, start_time, end_time in db.query(
+                Reservation.facility, Reservation.start_time, Reservation.end_time
+        ).filter(Reservation.user_id == current_user.id, Reservation.start_time > datetime.now(timezone.utc)):
+            freed[facility][start_time] = end_time
+
+        # Los tokens de acceso ya emitidos dejan de valer (los de refresco caen con la cuenta)
+        revoke_user(db, current_user.id, refresh_tokens=False)
+        # Una sola sentencia: las reservas las borra la BD por ON DELETE CASCADE
+        # (y los triggers de table_versions invalidan las ETags de ambos listados)
+        db.execute(delete(User).where(User.id == current_user.id))
+
+        # Como al cancelar: las plazas liberadas pasan a la lista de espera en esta transacción
+        for facility, slots in freed.items():
+            facility_conf = facility_registry.get(db, facility)
+            if not facility_conf:
+                continue
+            for start_time, end_time in slots.items():
+                promoted += waitlist.promote(db, facility_conf, start_time, end_time)
+            notify_slots(db, facility, slots.items(), facility_conf.capacity)
         db.commit()
-        return None
     except Exception as e:
         db.rollback()
         raise HTTPException(
             status_code=status.HTTP_500_INTERNAL_SERVER_ERROR,
             detail="Error al eliminar la cuenta",
         )
+
+    # Limpieza del avatar y avisos de promoción fuera de la transacción y después de responder
+    if avatar_url:
+        background_tasks.add_task(delete_file, avatar_url)
+    for email, reservation in promoted:
+        background_tasks.add_task(send_waitlist_promotion_email, email, reservation.facility, reservation.start_time)
+    return None
@@ -1,6 +1,6 @@
-from pydantic import BaseModel
-from datetime import datetime
-from typing import Optional
+from pydantic import BaseModel, conint
+from datetime import date, datetime
+from typing import List, Literal, Optional
 
 class ReservationBase(BaseModel):
     facility: str     
@@ -16,4 +16,56 @@ class ReservationResponse(ReservationBase):
     created_at: datetime
 
     class Config:
-        from_attributes = True
\ No newline at end of file
+        from_attributes = True
+
+class ReservationWindow(BaseModel):
+    start_time: datetime
+    end_time: datetime
+
+
+class ReservationRecurrence(BaseModel):
+    """
+    Repetición estilo RRULE a partir del primer tramo (start_time/end_time).
+    - freq "daily": cada día, limitado a `weekdays` si se indican (0 = lunes ... 6 = domingo)
+    - freq "weekly": cada 7 días (si se indican `weekdays`, deben incluir el día del primer tramo)
+    Termina en `until` (inclusive) o tras `count` repeticiones, lo que ocurra antes, y
+    nunca más allá de un año desde el primer tramo.
+    """
+    start_time: datetime
+    end_time: datetime
+    freq: Literal["daily", "weekly"] = "weekly"
+    weekdays: Optional[List[conint(ge=0, le=6)]] = None
+    until: Optional[date] = None
+    count: Optional[int] = None
+
+
+class ReservationBatchCreate(BaseModel):
+    facility: str
+    windows: Optional[List[ReservationWindow]] = None
+    recurrence: Optional[ReservationRecurrence] = None
+
+
+class ReservationBatchItem(BaseModel):
+    start_time: datetime
+    end_time: datetime
+    status: Literal["created", "duplicate", "full"]
+    detail: Optional[str] = None
+    reservation_id: Optional[int] = None
+
+
+class ReservationBatchResult(BaseModel):
+    facility: str
+    created: int
+    results: List[ReservationBatchItem]
+
+
+class WaitlistResponse(ReservationBase):
+    id: int
+    user_id: int
+    status: str
+    reservation_id: Optional[int] = None
+    created_at: datetime
+    promoted_at: Optional[datetime] = None
+
+    class Config:
+        from_attributes = True
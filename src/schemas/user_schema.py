@@ -1,5 +1,5 @@
 from pydantic import BaseModel, EmailStr, Field, field_validator
-from typing import Optional
+from typing import List, Optional
 from datetime import datetime
 import re
 
@@ -75,4 +75,39 @@ class UserResponse(UserBase):
     avatar_url: Optional[str] = None
 
     class Config:
-        from_attributes = True
\ No newline at end of file
+        from_attributes = True
+
+
+# Proyección ligera para el listado/buscador del admin (sin hash ni códigos)
+class UserListItem(BaseModel):
+    id: int
+    email: str
+    full_name: Optional[str] = None
+    apartment: Optional[str] = None
+    phone: Optional[str] = None
+    role: Optional[str] = None
+    is_active: Optional[bool] = None
+    avatar_url: Optional[str] = None
+
+    class Config:
+        from_attributes = True
+
+
+class UserPage(BaseModel):
+    items: List[UserListItem]
+    # Id a pasar como `cursor` para pedir la siguiente página (None si no hay más)
+    next_cursor: Optional[int] = None
+
+
+# Informe de la importación masiva de residentes (CSV)
+class UserImportError(BaseModel):
+    row: int
+    email: Optional[str] = None
+    error: str
+
+
+class UserImportReport(BaseModel):
+    created: int
+    # Emails que ya estaban registrados (no se modifican)
+    skipped: List[str]
+    errors: List[UserImportError]
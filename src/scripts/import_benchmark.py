@@ -0,0 +1,61 @@
+"""
+Mide el coste de importar la aplicación con `python -X importtime`.
+
+Uso: python -m src.scripts.import_benchmark [modulo] [--top N]
+"""
+import argparse
+import subprocess
+import sys
+from typing import Dict
+
+# Librerías pesadas que NO deben cargarse al arrancar (se importan en el primer uso)
+LAZY_MODULES = (
+    "firebase_admin",
+    "google.auth",
+    "minio",
+    "smtplib",
+    "email.mime.multipart",
+    "jose",
+    "passlib",
+)
+
+
+def measure_import(module: str = "src.main") -> Dict[str, int]:
+    """
+    Importa `module` en un proceso limpio y devuelve {modulo: tiempo acumulado en µs}
+    para todos los módulos cargados durante la importación.
+    """
+    result = subprocess.run(
+        [sys.executable, "-X", "importtime", "-c", f"import {module}"],
+        capture_output=True,
+        text=True,
+        check=True,
+    )
+
+    timings = {}
+    for line in result.stderr.splitlines():
+        if not line.startswith("import time:") or "cumulative" in line:
+            continue
+        _, self_us, cumulative_us, name = (part.strip() for part in line.replace("import time:", "|").split("|"))
+        timings[name.strip()] = int(cumulative_us)
+    return timings
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("module", nargs="?", default="src.main")
+    parser.add_argument("--top", type=int, default=15)
+    args = parser.parse_args()
+
+    timings = measure_import(args.module)
+    print(f"Importar {args.module}: {timings[args.module] / 1000:.1f} ms")
+    print(f"\nTop {args.top} módulos por tiempo acumulado:")
+    for name, cumulative in sorted(timings.items(), key=lambda item: item[1], reverse=True)[:args.top]:
+        print(f"  {cumulative / 1000:8.1f} ms  {name}")
+
+    loaded = [name for name in LAZY_MODULES if name in timings]
+    print(f"\nMódulos perezosos cargados al arrancar: {loaded or 'ninguno'}")
+
+
+if __name__ == "__main__":
+    main()
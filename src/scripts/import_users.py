@@ -0,0 +1,43 @@
+"""
+Alta masiva de residentes desde un CSV (mismo proceso que POST /api/v1/users/import).
+
+Uso:
+    python -m src.scripts.import_users residentes.csv
+    python -m src.scripts.import_users residentes.csv --no-email
+"""
+import argparse
+import logging
+
+from src.db.session import SessionLocal
+from src.services.email import send_verification_emails
+from src.services.user_import import IMPORT_CODE_EXPIRES_TEXT, import_users, shutdown_hash_pool
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("csv_path")
+    parser.add_argument("--no-email", action="store_true", help="No enviar los correos de verificación")
+    args = parser.parse_args()
+
+    with open(args.csv_path, encoding="utf-8-sig") as f:
+        content = f.read()
+
+    db = SessionLocal()
+    try:
+        report, invitations = import_users(db, content)
+    finally:
+        db.close()
+        shutdown_hash_pool()
+
+    print(f"Creados: {report['created']}  Ya existían: {len(report['skipped'])}  Errores: {len(report['errors'])}")
+    for error in report["errors"]:
+        print(f"  fila {error['row']} ({error['email'] or '-'}): {error['error']}")
+
+    if invitations and not args.no_email:
+        delivered = send_verification_emails(invitations, IMPORT_CODE_EXPIRES_TEXT)
+        print(f"Correos de verificación entregados: {delivered}/{len(invitations)}")
+
+
+if __name__ == "__main__":
+    logging.basicConfig(level=logging.INFO)
+    main()
@@ -1,4 +1,7 @@
 import logging
+from pathlib import Path
+from sqlalchemy import select, text
+from sqlalchemy.dialects.postgresql import insert
 from sqlalchemy.orm import Session
 from src.db.session import SessionLocal
 from src.core.config import settings
@@ -6,9 +9,7 @@ from src.core.security import get_password_hash
 from src.models.user_model import User
 from src.models.facility_model import Facility
 from src.db.base import Base
-from src.db.session import engine
 
-logging.basicConfig(level=logging.INFO)
 logger = logging.getLogger(__name__)
 
 # Configuración inicial (Datos por defecto)
@@ -20,49 +21,73 @@ DEFAULT_FACILITIES = [
     {"name": "Sauna", "price": 10.00, "capacity": 10, "icon": "🔥", "color": "from-orange-500 to-red-500"},
 ]
 
+# Clave fija del advisory lock de Postgres que serializa la siembra entre workers
+SEED_LOCK_KEY = 20252026
+
+ALEMBIC_INI = Path(__file__).resolve().parents[2] / "alembic.ini"
+
+
+def alembic_at_head(connection) -> bool:
+    """Comprueba si la BD ya tiene aplicadas todas las migraciones de Alembic."""
+    from alembic.config import Config
+    from alembic.runtime.migration import MigrationContext
+    from alembic.script import ScriptDirectory
+
+    config = Config(str(ALEMBIC_INI))
+    config.set_main_option("script_location", str(ALEMBIC_INI.parent / "alembic"))
+    heads = set(ScriptDirectory.from_config(config).get_heads())
+    current = set(MigrationContext.configure(connection).get_current_heads())
+    return current == heads
+
 
 def init_db(db: Session) -> None:
-    # 1. Crear tablas si no existen (IMPORTANTE para que funcione el nuevo modelo)
-    Base.metadata.create_all(bind=engine)
-
-    # Crear Superusuario (Tu código actual...)
-    user = db.query(User).filter(User.email == settings.ADMIN_EMAIL).first()
-    if not user:
-        logger.info(f"--- CREANDO SUPERUSUARIO: {settings.ADMIN_EMAIL} ---")
-        user = User(
-            email=settings.ADMIN_EMAIL,
-            full_name="Administrador",
-            hashed_password=get_password_hash(settings.ADMIN_PASSWORD),
-            role="admin",
-            is_active=True,
-            is_superuser=True,
+    # 1. Solo un worker siembra: el resto espera a que termine y no repite el trabajo
+    acquired = db.execute(text("SELECT pg_try_advisory_xact_lock(:key)"), {"key": SEED_LOCK_KEY}).scalar()
+    if not acquired:
+        logger.info("Otro worker está inicializando la BD. Esperando a que termine...")
+        db.execute(text("SELECT pg_advisory_xact_lock(:key)"), {"key": SEED_LOCK_KEY})
+        db.rollback()
+        return
+
+    # 2. Crear tablas solo si Alembic no las ha creado ya (docker-compose ejecuta `alembic upgrade head`)
+    if not alembic_at_head(db.connection()):
+        # La restricción de exclusión de las reservas de aforo 1 necesita btree_gist
+        db.execute(text("CREATE EXTENSION IF NOT EXISTS btree_gist"))
+        Base.metadata.create_all(bind=db.connection())
+
+    # 3. Superusuario: el hash bcrypt solo se calcula si de verdad falta
+    admin_exists = db.execute(select(User.id).where(User.email == settings.ADMIN_EMAIL)).first()
+    if not admin_exists:
+        logger.info("--- CREANDO SUPERUSUARIO: %s ---", settings.ADMIN_EMAIL)
+        db.execute(
+            insert(User).values(
+                email=settings.ADMIN_EMAIL,
+                full_name="Administrador",
+                hashed_password=get_password_hash(settings.ADMIN_PASSWORD),
+                role="admin",
+                is_active=True,
+                is_superuser=True,
+            ).on_conflict_do_nothing(index_elements=[User.email])
         )
-        db.add(user)
-        db.commit()
-        db.refresh(user)
-        logger.info("Superusuario creado correctamente")
-    else:
-        logger.info("El superusuario ya existe. Omitiendo creación.")
-
-    # 3. CREAR INSTALACIONES POR DEFECTO (Nuevo)
-    for fac_data in DEFAULT_FACILITIES:
-        facility = db.query(Facility).filter(Facility.name == fac_data["name"]).first()
-        if not facility:
-            logger.info(f"Creando instalación: {fac_data['name']}")
-            new_fac = Facility(**fac_data)
-            db.add(new_fac)
 
-    db.commit()
-    logger.info("Instalaciones inicializadas.")
+    # 4. Instalaciones por defecto en una única sentencia idempotente
+    db.execute(
+        insert(Facility).values(DEFAULT_FACILITIES).on_conflict_do_nothing(index_elements=[Facility.name])
+    )
 
+    # El commit libera también el advisory lock
+    db.commit()
+    logger.info("Datos iniciales verificados.")
 
-if __name__ == "__main__":
-    db = SessionLocal()
-    init_db(db)
 
 def create_initial_data() -> None:
     db = SessionLocal()
     try:
         init_db(db)
     finally:
-        db.close()
\ No newline at end of file
+        db.close()
+
+
+if __name__ == "__main__":
+    logging.basicConfig(level=logging.INFO)
+    create_initial_data()
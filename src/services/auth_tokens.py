@@ -0,0 +1,240 @@
+import asyncio
+import hashlib
+import logging
+import secrets
+import threading
+import time
+from datetime import datetime, timedelta, timezone
+from typing import Dict, Optional, Tuple
+
+from fastapi import HTTPException, status
+from sqlalchemy import delete, event
+from sqlalchemy.orm import Session
+
+from src.core.config import settings
+from src.core.security import create_access_token
+from src.db.session import SessionLocal
+from src.models.token_model import RefreshToken, TokenRevocation
+from src.models.user_model import User
+from src.services.occupancy import as_utc
+
+logger = logging.getLogger(__name__)
+
+# Cada cuánto se borran de la BD los tokens de refresco y las revocaciones caducadas
+SWEEP_SECONDS = 3600.0
+
+
+def hash_token(token: str) -> str:
+    return hashlib.sha256(token.encode()).hexdigest()
+
+
+def access_token_for(user_id: int, email: str, role: str, session_id: Optional[str] = None,
+                     expires_delta: Optional[timedelta] = None) -> str:
+    """Token de acceso con todo lo que necesita get_current_user para no ir a la BD."""
+    data = {"sub": email, "uid": user_id, "role": role}
+    if session_id is not None:
+        data["sid"] = session_id
+    return create_access_token(data, expires_delta)
+
+
+def _invalid_refresh_token() -> HTTPException:
+    return HTTPException(
+        status_code=status.HTTP_401_UNAUTHORIZED,
+        detail="Token de refresco inválido o caducado",
+        headers={"WWW-Authenticate": "Bearer"},
+    )
+
+
+def _add_refresh_token(db: Session, user_id: int, session_id: str) -> str:
+    token = secrets.token_urlsafe(32)
+    db.add(RefreshToken(
+        user_id=user_id,
+        token_hash=hash_token(token),
+        session_id=session_id,
+        expires_at=datetime.now(timezone.utc) + timedelta(days=settings.REFRESH_TOKEN_EXPIRE_DAYS),
+    ))
+    return token
+
+
+def issue_tokens(db: Session, user: User) -> dict:
+    """Abre una sesión nueva: token de acceso corto + token de refresco. No hace commit."""
+    session_id = secrets.token_hex(16)
+    refresh_token = _add_refresh_token(db, user.id, session_id)
+    return {
+        "access_token": access_token_for(user.id, user.email, user.role, session_id),
+        "refresh_token": refresh_token,
+        "token_type": "bearer",
+    }
+
+
+def rotate(db: Session, refresh_token: str) -> dict:
+    """
+    Canjea un token de refresco por un par nuevo de la misma sesión (el rol se relee de la BD).
+    Presentar uno ya canjeado significa que hay una copia en otras manos: se revoca la sesión
+    entera, también para el cliente legítimo, que tendrá que volver a iniciar sesión.
+    """
+    now = datetime.now(timezone.utc)
+    row = db.query(RefreshToken, User.email, User.role) \
+        .join(User, User.id == RefreshToken.user_id) \
+        .filter(RefreshToken.token_hash == hash_token(refresh_token)) \
+        .with_for_update(of=RefreshToken) \
+        .first()
+    if row is None or as_utc(row.RefreshToken.expires_at) <= now:
+        raise _invalid_refresh_token()
+
+    record = row.RefreshToken
+    if record.rotated_at is not None:
+        logger.warning("Token de refresco reutilizado: se revoca la sesión %s del usuario %s",
+                       record.session_id, record.user_id)
+        revoke_session(db, record.user_id, record.session_id)
+        db.commit()
+        raise _invalid_refresh_token()
+
+    record.rotated_at = now
+    new_token = _add_refresh_token(db, record.user_id, record.session_id)
+    return {
+        "access_token": access_token_for(record.user_id, row.email, row.role, record.session_id),
+        "refresh_token": new_token,
+        "token_type": "bearer",
+    }
+
+
+def find_session(db: Session, refresh_token: str) -> Optional[Tuple[int, str]]:
+    """(usuario, sesión) de un token de refresco, canjeado o no."""
+    return db.query(RefreshToken.user_id, RefreshToken.session_id) \
+        .filter(RefreshToken.token_hash == hash_token(refresh_token)) \
+        .first()
+
+
+def _record_revocation(db: Session, user_id: int, session_id: Optional[str]) -> None:
+    now = datetime.now(timezone.utc)
+    # Ningún token de acceso emitido antes de ahora sigue vivo pasado su plazo
+    expires_at = now + timedelta(minutes=settings.ACCESS_TOKEN_EXPIRE_MINUTES)
+    db.add(TokenRevocation(user_id=user_id, session_id=session_id, revoked_at=now, expires_at=expires_at))
+    # En este worker se aplica al hacer commit; el resto la recoge en su próxima sincronización
+    db.info.setdefault("token_revocations", []).append(
+        (user_id, session_id, now.timestamp(), expires_at.timestamp())
+    )
+
+
+def revoke_session(db: Session, user_id: int, session_id: str) -> None:
+    """Cierra una sesión: borra sus tokens de refresco e invalida sus tokens de acceso. No hace commit."""
+    db.execute(delete(RefreshToken).where(RefreshToken.session_id == session_id))
+    _record_revocation(db, user_id, session_id)
+
+
+def revoke_user(db: Session, user_id: int, refresh_tokens: bool = True) -> None:
+    """
+    Invalida todos los tokens emitidos hasta ahora al usuario (cambio de contraseña, baja...).
+    refresh_tokens=False cuando sus tokens de refresco ya caen por otro lado (ON DELETE CASCADE).
+    No hace commit.
+    """
+    if refresh_tokens:
+        db.execute(delete(RefreshToken).where(RefreshToken.user_id == user_id))
+    _record_revocation(db, user_id, None)
+
+
+# --- Revocaciones en memoria ---
+
+class RevocationSet:
+    """
+    Revocaciones vigentes en memoria del worker: sesiones cerradas y usuarios con todos sus
+    tokens anteriores invalidados. Solo se recuerdan mientras pueda quedar vivo algún token
+    de acceso afectado (su duración), así que el conjunto es pequeño y la comprobación en
+    cada petición son un par de búsquedas en diccionarios. Se actualiza:
+      - al instante en el worker que revoca, al hacer commit;
+      - en el resto de workers, como mucho `REVOCATION_SYNC_SECONDS` después, releyendo las
+        filas vigentes de `token_revocations` (una consulta por intervalo, no por petición).
+    """
+
+    def __init__(self):
+        # sesión -> caducidad (epoch)
+        self._sessions: Dict[str, float] = {}
+        # usuario -> (revocado en, caducidad) (epoch)
+        self._users: Dict[int, Tuple[float, float]] = {}
+        self._lock = threading.Lock()
+
+    def add(self, user_id: int, session_id: Optional[str], revoked_at: float, expires_at: float) -> None:
+        with self._lock:
+            if session_id is not None:
+                self._sessions[session_id] = max(self._sessions.get(session_id, 0.0), expires_at)
+                return
+            current = self._users.get(user_id)
+            if current is None or revoked_at > current[0]:
+                self._users[user_id] = (revoked_at, max(expires_at, current[1] if current else 0.0))
+
+    def is_revoked(self, user_id: int, session_id: Optional[str], issued_at: float) -> bool:
+        # Sin cerrojo: con el GIL cada búsqueda en el diccionario es atómica
+        if session_id is not None and session_id in self._sessions:
+            return True
+        revoked = self._users.get(user_id)
+        return revoked is not None and issued_at < revoked[0]
+
+    def prune(self, now: float) -> None:
+        with self._lock:
+            self._sessions = {sid: exp for sid, exp in self._sessions.items() if exp > now}
+            self._users = {uid: entry for uid, entry in self._users.items() if entry[1] > now}
+
+    def sync(self, db: Session) -> None:
+        now = datetime.now(timezone.utc)
+        rows = db.query(
+            TokenRevocation.user_id, TokenRevocation.session_id, TokenRevocation.revoked_at, TokenRevocation.expires_at
+        ).filter(TokenRevocation.expires_at > now).all()
+        # Solo se añade: una revocación nunca se deshace, y así no se pierden las locales recientes
+        for user_id, session_id, revoked_at, expires_at in rows:
+            self.add(user_id, session_id, as_utc(revoked_at).timestamp(), as_utc(expires_at).timestamp())
+        self.prune(now.timestamp())
+
+    def __len__(self) -> int:
+        return len(self._sessions) + len(self._users)
+
+
+revocations = RevocationSet()
+
+
+@event.listens_for(Session, "after_commit")
+def _apply_local_revocations(session: Session) -> None:
+    for revocation in session.info.pop("token_revocations", ()):
+        revocations.add(*revocation)
+
+
+@event.listens_for(Session, "after_rollback")
+def _discard_local_revocations(session: Session) -> None:
+    session.info.pop("token_revocations", None)
+
+
+def sync_revocations() -> None:
+    db = SessionLocal()
+    try:
+        revocations.sync(db)
+    finally:
+        db.close()
+
+
+def sweep_expired() -> int:
+    """Borra tokens de refresco y revocaciones caducados. Devuelve cuántas filas se borraron."""
+    now = datetime.now(timezone.utc)
+    db = SessionLocal()
+    try:
+        deleted = db.execute(delete(RefreshToken).where(RefreshToken.expires_at <= now)).rowcount
+        deleted += db.execute(delete(TokenRevocation).where(TokenRevocation.expires_at <= now)).rowcount
+        db.commit()
+        return deleted
+    finally:
+        db.close()
+
+
+async def sync_periodically(interval: float) -> None:
+    """Sincroniza las revocaciones de otros workers (la primera al arrancar) y purga lo caducado."""
+    last_sweep = time.monotonic()
+    while True:
+        try:
+            await asyncio.to_thread(sync_revocations)
+            if time.monotonic() - last_sweep >= SWEEP_SECONDS:
+                last_sweep = time.monotonic()
+                deleted = await asyncio.to_thread(sweep_expired)
+                if deleted:
+                    logger.info("Tokens de refresco y revocaciones caducados purgados: %d", deleted)
+        except Exception:
+            logger.exception("Error sincronizando revocaciones de tokens")
+        await asyncio.sleep(interval)
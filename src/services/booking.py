@@ -0,0 +1,274 @@
+from datetime import datetime, timedelta
+from typing import List, Optional, Tuple
+
+from fastapi import HTTPException
+from sqlalchemy import DateTime, Integer, and_, case, column, func, literal, select, union_all, values
+from sqlalchemy.exc import IntegrityError
+from sqlalchemy.orm import Session
+
+from src.models.facility_model import Facility
+from src.models.reservation_model import Reservation
+from src.schemas.reservation_schema import ReservationRecurrence
+from src.services.facility_registry import FacilityInfo
+from src.services.occupancy import as_utc
+
+# SQLSTATE de Postgres para una violación de restricción de exclusión
+EXCLUSION_VIOLATION = "23P01"
+
+IVA = 1.21
+
+# Tramos como máximo por petición de reserva múltiple (un mes de lunes a viernes son ~23)
+MAX_BATCH_WINDOWS = 100
+# Hasta dónde se expande una repetición, aunque `until`/`count` pidan más o ningún día encaje
+MAX_RECURRENCE_HORIZON = timedelta(days=366)
+
+Window = Tuple[datetime, datetime]
+
+
+def price_with_tax(facility_conf: FacilityInfo) -> float:
+    # Precio base + 21% IVA
+    return round(facility_conf.price * IVA, 2)
+
+
+def uses_exclusion(db: Session, facility_conf: FacilityInfo) -> bool:
+    """Las instalaciones de aforo 1 las protege la restricción de exclusión (solo en Postgres)."""
+    return facility_conf.capacity == 1 and db.get_bind().dialect.name == "postgresql"
+
+
+def overlapping(query, facility: str, start_time: datetime, end_time: datetime, *criteria):
+    return query.filter(
+        Reservation.facility == facility,
+        Reservation.start_time < end_time,
+        Reservation.end_time > start_time,
+        *criteria,
+    )
+
+
+def duplicate_error() -> HTTPException:
+    return HTTPException(status_code=400, detail="Ya tienes una plaza reservada en este horario.")
+
+
+def full_error(occupied: int, capacity: int) -> HTTPException:
+    return HTTPException(status_code=409, detail=f"Aforo completo ({occupied}/{capacity} plazas ocupadas).")
+
+
+def book_with_lock(db: Session, user_id: int, facility_conf: FacilityInfo,
+                   start_time: datetime, end_time: datetime) -> Reservation:
+    """
+    Reserva con bloqueo de la fila de la instalación: serializa las reservas concurrentes
+    de la misma instalación hasta el commit, y dentro del bloqueo comprueba duplicados y aforo.
+    """
+    # Única lectura de `facilities` en la transacción (precio y aforo vienen del registro)
+    locked = db.query(Facility.id)\
+        .filter(Facility.id == facility_conf.id)\
+        .with_for_update()\
+        .first()
+    if not locked:
+        raise HTTPException(status_code=404, detail="Instalación no encontrada o no disponible")
+
+    # Evitar duplicados
+    already_booked = overlapping(db.query(Reservation), facility_conf.name, start_time, end_time,
+                                  Reservation.user_id == user_id).first()
+    if already_booked:
+        raise duplicate_error()
+
+    # Control de aforo
+    existing_count = overlapping(db.query(Reservation), facility_conf.name, start_time, end_time).count()
+    if existing_count >= facility_conf.capacity:
+        raise full_error(existing_count, facility_conf.capacity)
+
+    reservation = Reservation(
+        facility=facility_conf.name,
+        start_time=start_time,
+        end_time=end_time,
+        user_id=user_id,
+        price=price_with_tax(facility_conf),
+    )
+    db.add(reservation)
+    db.flush()
+    return reservation
+
+
+def book_exclusive(db: Session, user_id: int, facility_conf: FacilityInfo,
+                   start_time: datetime, end_time: datetime) -> Reservation:
+    """
+    Reserva de una instalación de aforo 1: un INSERT sin bloqueos ni consultas previas.
+    Si otra reserva solapa, Postgres rechaza la fila (restricción de exclusión) y solo
+    entonces se consulta si el solape es del propio usuario para dar el mismo error de siempre.
+    """
+    reservation = Reservation(
+        facility=facility_conf.name,
+        start_time=start_time,
+        end_time=end_time,
+        user_id=user_id,
+        price=price_with_tax(facility_conf),
+        is_exclusive=True,
+    )
+    try:
+        # Savepoint: el rechazo solo deshace este INSERT, no la transacción de la petición
+        with db.begin_nested():
+            db.add(reservation)
+    except IntegrityError as e:
+        if getattr(e.orig, "pgcode", None) != EXCLUSION_VIOLATION:
+            raise
+        own = overlapping(db.query(Reservation.id), facility_conf.name, start_time, end_time,
+                           Reservation.user_id == user_id).first()
+        if own:
+            raise duplicate_error()
+        raise full_error(1, 1)
+    return reservation
+
+
+def book(db: Session, user_id: int, facility_conf: FacilityInfo,
+         start_time: datetime, end_time: datetime) -> Reservation:
+    """Crea la reserva (sin commit) por el camino que corresponde a la instalación."""
+    if uses_exclusion(db, facility_conf):
+        return book_exclusive(db, user_id, facility_conf, start_time, end_time)
+    return book_with_lock(db, user_id, facility_conf, start_time, end_time)
+
+
+def set_exclusive(db: Session, facility: str, exclusive: bool) -> None:
+    """
+    Al pasar una instalación a aforo 1 (o dejar de serlo) se marcan sus reservas futuras
+    para que la restricción de exclusión las cubra. Si ya hay solapes, no se permite.
+    """
+    if db.get_bind().dialect.name != "postgresql":
+        return
+    try:
+        # Savepoint: si hay solapes se deshace solo el marcado, no lo pendiente de la petición
+        with db.begin_nested():
+            db.query(Reservation)\
+                .filter(Reservation.facility == facility, Reservation.end_time > func.now())\
+                .update({Reservation.is_exclusive: exclusive}, synchronize_session=False)
+    except IntegrityError as e:
+        if getattr(e.orig, "pgcode", None) != EXCLUSION_VIOLATION:
+            raise
+        raise HTTPException(
+            status_code=409,
+            detail="Hay reservas futuras solapadas: no se puede reducir el aforo a 1 plaza.",
+        )
+
+
+def expand_recurrence(rule: ReservationRecurrence) -> List[Window]:
+    """Tramos de una repetición, con la misma hora y duración que el primero."""
+    if rule.until is None and rule.count is None:
+        raise HTTPException(status_code=400, detail="La repetición necesita 'until' o 'count'")
+    weekdays = set(rule.weekdays) if rule.weekdays else None
+    if rule.freq == "weekly" and weekdays is not None and rule.start_time.weekday() not in weekdays:
+        raise HTTPException(
+            status_code=400,
+            detail="En la repetición semanal los días deben incluir el del primer tramo",
+        )
+    step = timedelta(days=7 if rule.freq == "weekly" else 1)
+    duration = rule.end_time - rule.start_time
+    horizon = rule.start_time + MAX_RECURRENCE_HORIZON
+
+    windows: List[Window] = []
+    start = rule.start_time
+    while (start <= horizon and (rule.until is None or start.date() <= rule.until)
+           and (rule.count is None or len(windows) < rule.count)):
+        if weekdays is None or start.weekday() in weekdays:
+            windows.append((start, start + duration))
+            if len(windows) > MAX_BATCH_WINDOWS:
+                break
+        start += step
+    return windows
+
+
+def _windows_table(db: Session, windows: List[Window]):
+    """Los tramos pedidos como tabla (idx, start_time, end_time) para cruzarlos con las reservas."""
+    rows = [(idx, start, end) for idx, (start, end) in enumerate(windows)]
+    if db.get_bind().dialect.name == "postgresql":
+        return values(
+            column("idx", Integer),
+            column("start_time", DateTime(timezone=True)),
+            column("end_time", DateTime(timezone=True)),
+            name="windows",
+        ).data(rows)
+    # SQLite no admite alias de columnas en VALUES: mismo conjunto con UNION ALL
+    return union_all(*(
+        select(
+            literal(idx, Integer).label("idx"),
+            literal(start, DateTime(timezone=True)).label("start_time"),
+            literal(end, DateTime(timezone=True)).label("end_time"),
+        )
+        for idx, start, end in rows
+    )).subquery("windows")
+
+
+def book_many(db: Session, user_id: int, facility_conf: FacilityInfo,
+              windows: List[Window]) -> List[Tuple[str, Optional[str], Optional[Reservation]]]:
+    """
+    Reserva varios tramos (sin commit) con un único bloqueo de la instalación, una sola
+    consulta de ocupación para todos ellos (tramos cruzados con las reservas que solapan)
+    y un INSERT multi-fila con las aceptadas (en aforo 1, un INSERT con savepoint por tramo).
+    Devuelve (estado, detalle, reserva) por tramo.
+    """
+    locked = db.query(Facility.id)\
+        .filter(Facility.id == facility_conf.id)\
+        .with_for_update()\
+        .first()
+    if not locked:
+        raise HTTPException(status_code=404, detail="Instalación no encontrada o no disponible")
+
+    requested = _windows_table(db, windows)
+    occupancy = {
+        idx: (occupied, bool(own))
+        for idx, occupied, own in db.query(
+            requested.c.idx,
+            func.count(Reservation.id),
+            func.max(case((Reservation.user_id == user_id, 1), else_=0)),
+        ).select_from(requested).outerjoin(
+            Reservation,
+            and_(
+                Reservation.facility == facility_conf.name,
+                Reservation.start_time < requested.c.end_time,
+                Reservation.end_time > requested.c.start_time,
+            ),
+        ).group_by(requested.c.idx)
+    }
+
+    exclusive = uses_exclusion(db, facility_conf)
+    outcomes = []
+    accepted: List[Reservation] = []
+    for idx, (start_time, end_time) in enumerate(windows):
+        occupied, own = occupancy.get(idx, (0, False))
+        # Los tramos aceptados en esta misma petición son del usuario: solapar con uno es duplicado
+        own = own or any(as_utc(r.start_time) < as_utc(end_time) and as_utc(r.end_time) > as_utc(start_time)
+                         for r in accepted)
+        if own:
+            outcomes.append(("duplicate", duplicate_error().detail, None))
+            continue
+        if occupied >= facility_conf.capacity:
+            outcomes.append(("full", full_error(occupied, facility_conf.capacity).detail, None))
+            continue
+        reservation = Reservation(
+            facility=facility_conf.name,
+            start_time=start_time,
+            end_time=end_time,
+            user_id=user_id,
+            price=price_with_tax(facility_conf),
+            is_exclusive=exclusive,
+        )
+        if exclusive:
+            # Aforo 1: una reserva individual (sin bloqueo) puede ganar el tramo entre la consulta
+            # y el INSERT. Cada tramo va en su savepoint para que solo ese quede como ocupado
+            try:
+                with db.begin_nested():
+                    db.add(reservation)
+            except IntegrityError as e:
+                if getattr(e.orig, "pgcode", None) != EXCLUSION_VIOLATION:
+                    raise
+                if overlapping(db.query(Reservation.id), facility_conf.name, start_time, end_time,
+                               Reservation.user_id == user_id).first():
+                    outcomes.append(("duplicate", duplicate_error().detail, None))
+                else:
+                    outcomes.append(("full", full_error(1, 1).detail, None))
+                continue
+        accepted.append(reservation)
+        outcomes.append(("created", None, reservation))
+
+    if accepted and not exclusive:
+        db.add_all(accepted)
+        db.flush()
+    return outcomes
@@ -0,0 +1,151 @@
+import asyncio
+import logging
+import weakref
+from datetime import datetime
+from typing import Dict, List, Union
+
+from fastapi import HTTPException
+from sqlalchemy.orm import sessionmaker
+
+from src.core.config import settings
+from src.db.session import SessionLocal
+from src.models.facility_model import Facility
+from src.models.reservation_model import Reservation
+from src.services.booking import duplicate_error, full_error, price_with_tax
+from src.services.facility_registry import FacilityInfo
+from src.services.occupancy import as_utc, notify_slots
+
+logger = logging.getLogger(__name__)
+
+
+class _BookingRequest:
+    __slots__ = ("facility_conf", "user_id", "start_time", "end_time", "future")
+
+    def __init__(self, facility_conf: FacilityInfo, user_id: int, start_time: datetime, end_time: datetime,
+                 future: asyncio.Future):
+        self.facility_conf = facility_conf
+        self.user_id = user_id
+        self.start_time = start_time
+        self.end_time = end_time
+        self.future = future
+
+
+class FacilityActor:
+    """
+    Único escritor de reservas de una instalación en este worker. Las peticiones se
+    encolan y se deciden en orden y en lotes: por lote, un bloqueo de la instalación
+    (la "concesión" que excluye a otros workers y al modo lock), una lectura de la
+    ocupación de la ventana afectada, las decisiones en memoria y un único INSERT
+    multi-fila. En un pico, mientras un lote se guarda, el siguiente se va llenando.
+    """
+
+    def __init__(self, name: str, session_factory: sessionmaker, max_batch: int):
+        self.name = name
+        self.session_factory = session_factory
+        self.max_batch = max_batch
+        self.queue: asyncio.Queue = asyncio.Queue()
+        self.task = asyncio.create_task(self._run(), name=f"booking-actor-{name}")
+
+    async def _run(self) -> None:
+        while True:
+            batch = [await self.queue.get()]
+            while len(batch) < self.max_batch and not self.queue.empty():
+                batch.append(self.queue.get_nowait())
+            try:
+                outcomes = await asyncio.to_thread(self._commit_batch, batch)
+            except Exception:
+                logger.exception("Error guardando un lote de %d reservas en %s", len(batch), self.name)
+                outcomes = [HTTPException(status_code=500, detail="Error interno al guardar reserva")] * len(batch)
+            for request, outcome in zip(batch, outcomes):
+                if request.future.done():  # El cliente se fue
+                    continue
+                if isinstance(outcome, Exception):
+                    request.future.set_exception(outcome)
+                else:
+                    request.future.set_result(outcome)
+
+    def _commit_batch(self, batch: List[_BookingRequest]) -> List[Union[Reservation, Exception]]:
+        facility_conf = batch[-1].facility_conf
+        # expire_on_commit=False: las reservas se devuelven ya cargadas, sin un SELECT por fila
+        db = self.session_factory(expire_on_commit=False)
+        try:
+            locked = db.query(Facility.id).filter(Facility.id == facility_conf.id).with_for_update().first()
+            if not locked:
+                return [HTTPException(status_code=404, detail="Instalación no encontrada o no disponible")] * len(batch)
+
+            window_start = min(request.start_time for request in batch)
+            window_end = max(request.end_time for request in batch)
+            occupancy = [
+                (user_id, as_utc(start), as_utc(end))
+                for user_id, start, end in db.query(
+                    Reservation.user_id, Reservation.start_time, Reservation.end_time
+                ).filter(
+                    Reservation.facility == self.name,
+                    Reservation.start_time < window_end,
+                    Reservation.end_time > window_start,
+                )
+            ]
+
+            outcomes: List[Union[Reservation, Exception]] = []
+            accepted: List[Reservation] = []
+            for request in batch:
+                start, end = as_utc(request.start_time), as_utc(request.end_time)
+                overlapping = [entry for entry in occupancy if entry[1] < end and entry[2] > start]
+                if any(user_id == request.user_id for user_id, _, _ in overlapping):
+                    outcomes.append(duplicate_error())
+                    continue
+                if len(overlapping) >= request.facility_conf.capacity:
+                    outcomes.append(full_error(len(overlapping), request.facility_conf.capacity))
+                    continue
+                reservation = Reservation(
+                    facility=self.name,
+                    start_time=request.start_time,
+                    end_time=request.end_time,
+                    user_id=request.user_id,
+                    price=price_with_tax(request.facility_conf),
+                )
+                occupancy.append((request.user_id, start, end))
+                accepted.append(reservation)
+                outcomes.append(reservation)
+
+            if accepted:
+                db.add_all(accepted)
+                db.flush()
+                notify_slots(db, self.name, {(r.start_time, r.end_time) for r in accepted}, facility_conf.capacity)
+            db.commit()
+            return outcomes
+        except Exception:
+            db.rollback()
+            raise
+        finally:
+            db.close()
+
+
+class BookingActors:
+    """Un actor por instalación y event loop, creado al recibir su primera reserva."""
+
+    def __init__(self, session_factory: sessionmaker, max_batch: int):
+        self.session_factory = session_factory
+        self.max_batch = max_batch
+        self._actors: "weakref.WeakKeyDictionary[asyncio.AbstractEventLoop, Dict[str, FacilityActor]]" = \
+            weakref.WeakKeyDictionary()
+
+    async def submit(self, facility_conf: FacilityInfo, user_id: int,
+                     start_time: datetime, end_time: datetime) -> Reservation:
+        loop = asyncio.get_running_loop()
+        actors = self._actors.setdefault(loop, {})
+        actor = actors.get(facility_conf.name)
+        if actor is None:
+            actor = actors[facility_conf.name] = FacilityActor(facility_conf.name, self.session_factory, self.max_batch)
+        future = loop.create_future()
+        actor.queue.put_nowait(_BookingRequest(facility_conf, user_id, start_time, end_time, future))
+        return await future
+
+    async def stop(self) -> None:
+        actors = self._actors.pop(asyncio.get_running_loop(), {})
+        for actor in actors.values():
+            actor.task.cancel()
+        await asyncio.gather(*(actor.task for actor in actors.values()), return_exceptions=True)
+
+
+booking_actors = BookingActors(SessionLocal, settings.BOOKING_BATCH_SIZE)
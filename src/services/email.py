@@ -1,70 +1,116 @@
-import smtplib
 import logging
-from email.mime.text import MIMEText
-from email.mime.multipart import MIMEMultipart
+from datetime import datetime
+from typing import Iterable, List, Tuple
 from src.core.config import settings
 
-# --- CONFIGURACIÓN DE LOGS ---
-logging.basicConfig(level=logging.INFO)
 logger = logging.getLogger(__name__)
 
+# Correos por sesión SMTP en los envíos masivos (muchos servidores cortan sesiones muy largas)
+EMAIL_BATCH_SIZE = 50
 
-def _send_email(to_email: str, subject: str, html_content: str):
-    """
-    Función interna para manejar la conexión SMTP y el envío con LOGS detallados.
-    """
-    logger.info(f"🚀 [EMAIL] Iniciando proceso de envío a: {to_email}")
-
-    if not settings.MAIL_USERNAME or not settings.MAIL_PASSWORD:
-        logger.error("❌ [EMAIL] ERROR CRÍTICO: Faltan credenciales SMTP en el archivo .env")
-        return False
 
+def _target_email(to_email: str) -> str:
     # Lógica de desvío para Admin (Evitar spam al correo real durante pruebas)
-    target_email = to_email
     if to_email == settings.ADMIN_EMAIL and settings.DEVIATION_EMAIL:
-        logger.warning(f"🔒 [EMAIL] MODO ADMIN: Desviando correo de {to_email} a {settings.DEVIATION_EMAIL}")
-        target_email = settings.DEVIATION_EMAIL
+        logger.warning("[EMAIL] MODO ADMIN: Desviando correo de %s a %s", to_email, settings.DEVIATION_EMAIL)
+        return settings.DEVIATION_EMAIL
+    return to_email
+
+
+def _build_message(target_email: str, subject: str, html_content: str) -> str:
+    from email.mime.text import MIMEText
+    from email.mime.multipart import MIMEMultipart
 
     msg = MIMEMultipart("alternative")
     msg["From"] = f"{settings.MAIL_FROM_NAME} <{settings.MAIL_USERNAME}>"
     msg["To"] = target_email
     msg["Subject"] = subject
     msg.attach(MIMEText(html_content, "html"))
+    return msg.as_string()
+
+
+def _send_email(to_email: str, subject: str, html_content: str):
+    """
+    Función interna para manejar la conexión SMTP y el envío con LOGS detallados.
+    """
+    # Import perezoso: smtplib solo se carga cuando se envía el primer correo
+    import smtplib
+
+    logger.debug("[EMAIL] Iniciando proceso de envío a: %s", to_email)
+
+    if not settings.MAIL_USERNAME or not settings.MAIL_PASSWORD:
+        logger.error("[EMAIL] ERROR CRÍTICO: Faltan credenciales SMTP en el archivo .env")
+        return False
+
+    target_email = _target_email(to_email)
+    message = _build_message(target_email, subject, html_content)
 
     try:
-        logger.info(f"🔌 [EMAIL] Conectando al servidor SMTP: {settings.MAIL_SERVER}:{settings.MAIL_PORT}...")
+        logger.debug("[EMAIL] Conectando al servidor SMTP: %s:%s", settings.MAIL_SERVER, settings.MAIL_PORT)
 
         with smtplib.SMTP(settings.MAIL_SERVER, settings.MAIL_PORT) as server:
             server.starttls()  # Seguridad TLS
 
-            logger.info(f"🔑 [EMAIL] Autenticando usuario: {settings.MAIL_USERNAME}")
             server.login(settings.MAIL_USERNAME, settings.MAIL_PASSWORD)
 
-            logger.info(f"📤 [EMAIL] Enviando paquete de datos...")
-            server.sendmail(settings.MAIL_USERNAME, target_email, msg.as_string())
+            server.sendmail(settings.MAIL_USERNAME, target_email, message)
 
-            logger.info(f"✅ [EMAIL] ¡ÉXITO! Correo entregado al servidor para: {target_email}")
+            logger.info("[EMAIL] Correo entregado al servidor para: %s", target_email)
             return True
 
     except smtplib.SMTPAuthenticationError as e:
-        logger.error(f"❌ [EMAIL] ERROR DE AUTENTICACIÓN: Usuario o contraseña incorrectos.")
-        logger.error(f"    - Detalle técnico: {e}")
+        logger.error("[EMAIL] ERROR DE AUTENTICACIÓN: Usuario o contraseña incorrectos (%s)", e)
         return False
     except smtplib.SMTPConnectError as e:
-        logger.error(f"❌ [EMAIL] ERROR DE CONEXIÓN: No se pudo conectar al servidor SMTP.")
-        logger.error(f"    - Detalle técnico: {e}")
+        logger.error("[EMAIL] ERROR DE CONEXIÓN: No se pudo conectar al servidor SMTP (%s)", e)
         return False
     except Exception as e:
-        logger.error(f"❌ [EMAIL] ERROR DESCONOCIDO: {e}")
+        logger.exception("[EMAIL] ERROR DESCONOCIDO: %s", e)
         return False
 
 
+def _send_email_batch(messages: Iterable[Tuple[str, str, str]]) -> int:
+    """
+    Envía varios correos (destinatario, asunto, html) reutilizando una sesión SMTP
+    por cada EMAIL_BATCH_SIZE mensajes, en vez de conectar + TLS + login por correo.
+    Un destinatario rechazado no aborta el resto. Devuelve cuántos se entregaron.
+    """
+    import smtplib
+
+    if not settings.MAIL_USERNAME or not settings.MAIL_PASSWORD:
+        logger.error("[EMAIL] ERROR CRÍTICO: Faltan credenciales SMTP en el archivo .env")
+        return 0
+
+    pending: List[Tuple[str, str, str]] = list(messages)
+    delivered = 0
+    for start in range(0, len(pending), EMAIL_BATCH_SIZE):
+        batch = pending[start:start + EMAIL_BATCH_SIZE]
+        try:
+            with smtplib.SMTP(settings.MAIL_SERVER, settings.MAIL_PORT) as server:
+                server.starttls()
+                server.login(settings.MAIL_USERNAME, settings.MAIL_PASSWORD)
+                for to_email, subject, html_content in batch:
+                    target_email = _target_email(to_email)
+                    try:
+                        server.sendmail(settings.MAIL_USERNAME, target_email,
+                                        _build_message(target_email, subject, html_content))
+                        delivered += 1
+                    except smtplib.SMTPRecipientsRefused as e:
+                        logger.error("[EMAIL] Destinatario rechazado %s (%s)", target_email, e)
+        except Exception as e:
+            logger.exception("[EMAIL] ERROR en el lote de %d correos: %s", len(batch), e)
+
+    logger.info("[EMAIL] Envío masivo: %d/%d correos entregados al servidor", delivered, len(pending))
+    return delivered
+
+
 # --- FUNCIONES PÚBLICAS ---
 
-def send_verification_email(to_email: str, code: str):
-    logger.info(f"📝 [EMAIL] Preparando email de VERIFICACIÓN para {to_email}")
-    subject = "Código de verificación · Residencial"
-    html_content = f"""
+VERIFICATION_SUBJECT = "Código de verificación · Residencial"
+
+
+def _verification_html(code: str, expires_text: str = "Expira en 15 minutos") -> str:
+    return f"""
 <!DOCTYPE html>
 <html lang="es">
 <body style="margin:0; padding:0; background-color:#0a0a0a; font-family:sans-serif; color:#ffffff;">
@@ -74,16 +120,29 @@ def send_verification_email(to_email: str, code: str):
     <div style="background:#1a1a1a; border:1px solid #333; border-radius:10px; padding:20px; font-size:32px; letter-spacing:5px; display:inline-block; margin:20px 0;">
       {code}
     </div>
-    <p style="font-size:12px; color:#666;">Expira en 15 minutos</p>
+    <p style="font-size:12px; color:#666;">{expires_text}</p>
   </div>
 </body>
 </html>
 """
-    return _send_email(to_email, subject, html_content)
+
+
+def send_verification_email(to_email: str, code: str):
+    logger.debug("[EMAIL] Preparando email de VERIFICACIÓN para %s", to_email)
+    return _send_email(to_email, VERIFICATION_SUBJECT, _verification_html(code))
+
+
+def send_verification_emails(recipients: List[Tuple[str, str]], expires_text: str) -> int:
+    """Verificación masiva (altas importadas): lista de (email, código) en lotes SMTP."""
+    logger.debug("[EMAIL] Preparando %d emails de VERIFICACIÓN", len(recipients))
+    return _send_email_batch(
+        (to_email, VERIFICATION_SUBJECT, _verification_html(code, expires_text))
+        for to_email, code in recipients
+    )
 
 
 def send_welcome_email(to_email: str, name: str):
-    logger.info(f"📝 [EMAIL] Preparando email de BIENVENIDA para {to_email}")
+    logger.debug("[EMAIL] Preparando email de BIENVENIDA para %s", to_email)
     subject = "¡Bienvenido a casa! · Residencial"
     html_content = f"""
 <!DOCTYPE html>
@@ -99,8 +158,26 @@ def send_welcome_email(to_email: str, name: str):
     return _send_email(to_email, subject, html_content)
 
 
+def send_waitlist_promotion_email(to_email: str, facility: str, start_time: datetime):
+    logger.debug("[EMAIL] Preparando email de LISTA DE ESPERA para %s", to_email)
+    subject = "¡Tienes plaza! · Residencial"
+    html_content = f"""
+<!DOCTYPE html>
+<html lang="es">
+<body style="margin:0; padding:0; background-color:#0a0a0a; font-family:sans-serif; color:#ffffff;">
+  <div style="text-align:center; padding: 40px;">
+    <h1 style="color:#4ade80;">Se ha liberado una plaza</h1>
+    <p style="color:#d1d5db;">Estabas en la lista de espera de <strong>{facility}</strong> el {start_time:%d/%m/%Y a las %H:%M}.</p>
+    <p style="color:#d1d5db;">Ya tienes la reserva confirmada. Si no puedes ir, cancélala desde la app.</p>
+  </div>
+</body>
+</html>
+"""
+    return _send_email(to_email, subject, html_content)
+
+
 def send_reset_password_email(to_email: str, code: str):
-    logger.info(f"📝 [EMAIL] Preparando email de RESET PASSWORD para {to_email}")
+    logger.debug("[EMAIL] Preparando email de RESET PASSWORD para %s", to_email)
     subject = "Recuperación de Contraseña · Residencial"
     html_content = f"""
 <!DOCTYPE html>
@@ -122,9 +199,7 @@ def send_reset_password_email(to_email: str, code: str):
 def send_support_email(data: dict):
     # CORREGIDO: Usamos MAIL_USERNAME para que llegue al correo del sistema
     destinatario = settings.MAIL_USERNAME
-    logger.info(f"📝 [EMAIL] Preparando email de SOPORTE.")
-    logger.info(f"    - Origen: {data['email']}")
-    logger.info(f"    - Destino: {destinatario} (Admin/Sistema)")
+    logger.debug("[EMAIL] Preparando email de SOPORTE de %s para %s", data['email'], destinatario)
 
     subject = f"Soporte: {data['subject']} - {data['name']}"
 
@@ -0,0 +1,113 @@
+import hashlib
+import logging
+import threading
+import time
+from dataclasses import asdict, dataclass, replace
+from typing import Dict, Iterable, List, Optional
+
+import orjson
+from sqlalchemy.orm import Session
+
+from src.core.config import settings
+from src.core.etag import table_version
+from src.models.facility_model import Facility
+
+logger = logging.getLogger(__name__)
+
+FACILITY_COLUMNS = list(Facility.__table__.columns)
+
+
+@dataclass(frozen=True)
+class FacilityInfo:
+    id: int
+    name: str
+    price: float
+    capacity: int
+    icon: Optional[str] = None
+    color: Optional[str] = None
+    description: Optional[str] = None
+
+
+@dataclass(frozen=True)
+class FacilitySnapshot:
+    by_name: Dict[str, FacilityInfo]
+    # Lista ya lista para JSON (orden por id), igual que devolvía GET /facilities
+    items: List[dict]
+    # Derivada del contenido: todos los workers con los mismos datos dan la misma ETag
+    etag: str
+    # Versión de `table_versions` al cargar (None fuera de Postgres)
+    db_version: Optional[int]
+    checked_at: float
+
+
+class FacilityRegistry:
+    """
+    Configuración de instalaciones (precio, aforo...) en memoria del worker.
+    Las instalaciones casi nunca cambian, así que en vez de consultar la tabla en cada
+    petición se sirve una instantánea inmutable que se renueva:
+      - al instante en el worker que ejecuta update_facility;
+      - en el resto de workers, como mucho `ttl` segundos después: pasado el TTL se
+        compara la versión de la tabla (una consulta mínima) y solo se recarga si cambió.
+    """
+
+    def __init__(self, ttl: float):
+        self.ttl = ttl
+        self._snapshot: Optional[FacilitySnapshot] = None
+        self._lock = threading.Lock()
+
+    def publish(self, facilities: Iterable[FacilityInfo], db_version: Optional[int] = None) -> FacilitySnapshot:
+        ordered = sorted(facilities, key=lambda facility: facility.id)
+        items = [asdict(facility) for facility in ordered]
+        digest = hashlib.blake2s(orjson.dumps(items), digest_size=8).hexdigest()
+        snapshot = FacilitySnapshot(
+            by_name={facility.name: facility for facility in ordered},
+            items=items,
+            etag=f'W/"facilities-{digest}"',
+            db_version=db_version,
+            checked_at=time.monotonic(),
+        )
+        self._snapshot = snapshot
+        return snapshot
+
+    def load(self, db: Session, db_version: Optional[int] = None) -> FacilitySnapshot:
+        if db_version is None:
+            db_version = table_version(db, "facilities")
+        rows = db.query(*FACILITY_COLUMNS).all()
+        return self.publish((FacilityInfo(**row._mapping) for row in rows), db_version)
+
+    def snapshot(self, db: Session) -> FacilitySnapshot:
+        snapshot = self._snapshot
+        if snapshot is not None and time.monotonic() - snapshot.checked_at < self.ttl:
+            return snapshot
+
+        # Un solo hilo revalida; el resto espera y reutiliza el resultado
+        with self._lock:
+            snapshot = self._snapshot
+            if snapshot is not None and time.monotonic() - snapshot.checked_at < self.ttl:
+                return snapshot
+            version = table_version(db, "facilities")
+            # Los contadores solo crecen: una versión menor viene de una réplica retrasada
+            # y no debe sustituir a datos más nuevos
+            if (snapshot is not None and version is not None and snapshot.db_version is not None
+                    and version <= snapshot.db_version):
+                snapshot = replace(snapshot, checked_at=time.monotonic())
+                self._snapshot = snapshot
+                return snapshot
+            return self.load(db, version)
+
+    def get(self, db: Session, name: str) -> Optional[FacilityInfo]:
+        return self.snapshot(db).by_name.get(name)
+
+    def warm(self) -> None:
+        """Carga inicial tras sembrar la BD, para que la primera petición no pague la consulta."""
+        from src.db.session import SessionLocal
+
+        db = SessionLocal()
+        try:
+            snapshot = self.load(db)
+            logger.info("Registro de instalaciones cargado (%d instalaciones)", len(snapshot.items))
+        finally:
+            db.close()
+
+
+facility_registry = FacilityRegistry(settings.FACILITY_CACHE_TTL)
@@ -1,28 +1,42 @@
-import firebase_admin
-from firebase_admin import credentials, auth
 from src.core.config import settings
+from src.core.readiness import register
 import logging
 
 logger = logging.getLogger(__name__)
 
 def initialize_firebase():
     """Inicializa Firebase Admin con el archivo de credenciales"""
+    # Import perezoso: firebase_admin arrastra google-auth y compañía (~150 ms)
+    import firebase_admin
+    from firebase_admin import credentials
+
     try:
         if not firebase_admin._apps:
             cred = credentials.Certificate(settings.FIREBASE_CREDENTIALS_PATH)
             firebase_admin.initialize_app(cred)
             logger.info("Firebase Admin inicializado correctamente.")
     except Exception as e:
-        logger.error(f"Error al iniciar Firebase: {e}")
+        logger.error("Error al iniciar Firebase: %s", e)
+        raise
+
+
+# No crítica: se calienta en segundo plano al arrancar y se reintenta en el primer uso
+firebase_dependency = register("firebase", initialize_firebase, timeout=settings.FIREBASE_INIT_TIMEOUT)
+
 
 def verify_id_token(token: str):
     """
     Verifica el token ID de Firebase enviado por el cliente.
     Retorna el diccionario con los datos del usuario o None si falla.
     """
+    if not firebase_dependency.ensure():
+        return None
+
+    from firebase_admin import auth
+
     try:
         decoded_token = auth.verify_id_token(token)
         return decoded_token
     except Exception as e:
-        logger.error(f"Error verificando token de Firebase: {e}")
-        return None
\ No newline at end of file
+        logger.warning("Error verificando token de Firebase: %s", e)
+        return None
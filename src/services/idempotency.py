@@ -0,0 +1,121 @@
+import asyncio
+import hashlib
+import json
+import logging
+from datetime import datetime, timedelta, timezone
+from typing import Optional, Tuple
+
+from fastapi import HTTPException, Response
+from sqlalchemy import delete
+from sqlalchemy.exc import IntegrityError
+from sqlalchemy.orm import Session
+
+from src.core.config import settings
+from src.db.session import SessionLocal
+from src.models.idempotency_model import IdempotencyKey
+from src.services.occupancy import as_utc
+
+logger = logging.getLogger(__name__)
+
+MAX_KEY_LENGTH = 255
+REPLAY_HEADER = "Idempotent-Replayed"
+
+
+def fingerprint(payload: dict) -> str:
+    return hashlib.sha256(json.dumps(payload, sort_keys=True, separators=(",", ":")).encode()).hexdigest()
+
+
+def _replay(record: IdempotencyKey) -> Response:
+    return Response(
+        content=record.response_body,
+        status_code=record.status_code,
+        media_type="application/json",
+        headers={REPLAY_HEADER: "true"},
+    )
+
+
+def _stored(db: Session, user_id: int, key: str, request_hash: str) -> Optional[Response]:
+    record = db.get(IdempotencyKey, (user_id, key))
+    if record is None:
+        return None
+    if as_utc(record.expires_at) <= datetime.now(timezone.utc):
+        # Caducada pero aún sin purgar: la clave vuelve a estar libre
+        db.delete(record)
+        db.flush()
+        return None
+    if record.request_hash != request_hash:
+        raise HTTPException(status_code=422, detail="Idempotency-Key ya usada con otra petición distinta")
+    return _replay(record)
+
+
+def claim(db: Session, user_id: int, key: str,
+          payload: dict) -> Tuple[Optional[IdempotencyKey], Optional[Response]]:
+    """
+    Reclama la clave dentro de la transacción de la reserva. Devuelve (reclamación, None)
+    si esta petición es la primera, o (None, respuesta guardada) si es un reenvío.
+
+    Si la primera petición sigue en curso, el INSERT de la clave espera en el índice único
+    a que termine: con commit, esta devuelve su respuesta; con rollback, la reclama ella.
+    """
+    request_hash = fingerprint(payload)
+    replay = _stored(db, user_id, key, request_hash)
+    if replay is not None:
+        return None, replay
+
+    record = IdempotencyKey(
+        user_id=user_id,
+        key=key,
+        request_hash=request_hash,
+        expires_at=datetime.now(timezone.utc) + timedelta(hours=settings.IDEMPOTENCY_TTL_HOURS),
+    )
+    db.add(record)
+    try:
+        db.flush()
+    except IntegrityError:
+        db.rollback()
+        replay = _stored(db, user_id, key, request_hash)
+        if replay is None:
+            raise HTTPException(status_code=409, detail="Petición con la misma Idempotency-Key en curso; reinténtala.")
+        return None, replay
+    return record, None
+
+
+def complete(record: IdempotencyKey, status_code: int, body: str) -> None:
+    """Guarda la respuesta en la reclamación; se confirma con el commit de la reserva."""
+    record.status_code = status_code
+    record.response_body = body
+
+
+def store_error(db: Session, record: IdempotencyKey, exc: HTTPException) -> None:
+    """
+    Un rechazo de negocio (duplicado, aforo completo...) también se guarda: el reenvío debe
+    recibir el mismo error, no volver a intentar la reserva. La reserva ya se deshizo en su
+    savepoint; la reclamación sigue en la transacción y se confirma con el error, así que un
+    reenvío que espera en el índice único siempre recibe esta respuesta.
+    """
+    complete(record, exc.status_code, json.dumps({"detail": exc.detail}))
+    db.commit()
+
+
+def sweep_expired() -> int:
+    db = SessionLocal()
+    try:
+        deleted = db.execute(
+            delete(IdempotencyKey).where(IdempotencyKey.expires_at < datetime.now(timezone.utc))
+        ).rowcount
+        db.commit()
+        return deleted
+    finally:
+        db.close()
+
+
+async def sweep_periodically(interval: float) -> None:
+    """Purga de claves caducadas en segundo plano, mientras el worker esté vivo."""
+    while True:
+        await asyncio.sleep(interval)
+        try:
+            deleted = await asyncio.to_thread(sweep_expired)
+            if deleted:
+                logger.info("Claves de idempotencia caducadas purgadas: %d", deleted)
+        except Exception:
+            logger.exception("Error purgando claves de idempotencia")
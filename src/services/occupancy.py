@@ -0,0 +1,272 @@
+import asyncio
+import json
+import logging
+import select
+import threading
+from collections import defaultdict
+from datetime import datetime, timezone
+from typing import AsyncIterator, Dict, Iterable, List, Set, Tuple
+
+from sqlalchemy import event, func, text
+from sqlalchemy.orm import Session
+
+from src.core.config import settings
+from src.models.reservation_model import Reservation
+
+logger = logging.getLogger(__name__)
+
+# Canal de Postgres por el que todos los workers reciben los cambios de ocupación
+NOTIFY_CHANNEL = "occupancy"
+NOTIFY_SQL = text("SELECT pg_notify(:channel, :payload)")
+
+RESYNC = b"event: resync\ndata: {}\n\n"
+
+
+def format_sse(event_name: str, data) -> bytes:
+    return f"event: {event_name}\ndata: {json.dumps(data, default=str)}\n\n".encode()
+
+
+class Subscriber:
+    """
+    Una conexión SSE: cola acotada en el event loop donde se creó. Si el cliente no
+    consume al ritmo de los eventos, la cola se vacía y se le pide que resincronice
+    (vuelva a pedir /availability) en lugar de acumular memoria o frenar al resto.
+    """
+
+    def __init__(self, facility: str, day: str, max_queue: int):
+        self.facility = facility
+        self.day = day
+        self.loop = asyncio.get_running_loop()
+        self.queue: asyncio.Queue = asyncio.Queue(maxsize=max_queue)
+        self.dropped = 0
+
+    def push(self, message: bytes) -> None:
+        try:
+            self.queue.put_nowait(message)
+        except asyncio.QueueFull:
+            self.dropped += 1
+            while not self.queue.empty():
+                self.queue.get_nowait()
+            self.queue.put_nowait(RESYNC)
+
+
+class OccupancyBus:
+    """
+    Reparto de eventos de ocupación a las conexiones SSE de este worker, por
+    (instalación, día). El mensaje se serializa una sola vez y se entrega con una
+    única llamada al event loop por evento, tenga una o miles de suscripciones.
+    """
+
+    def __init__(self, max_queue: int):
+        self.max_queue = max_queue
+        self._subscribers: Dict[str, Dict[str, Set[Subscriber]]] = defaultdict(lambda: defaultdict(set))
+        self._lock = threading.Lock()
+
+    def subscribe(self, facility: str, day: str) -> Subscriber:
+        subscriber = Subscriber(facility, day, self.max_queue)
+        with self._lock:
+            self._subscribers[facility][day].add(subscriber)
+        return subscriber
+
+    def unsubscribe(self, subscriber: Subscriber) -> None:
+        with self._lock:
+            by_day = self._subscribers.get(subscriber.facility)
+            if by_day is None:
+                return
+            by_day[subscriber.day].discard(subscriber)
+            if not by_day[subscriber.day]:
+                del by_day[subscriber.day]
+            if not by_day:
+                del self._subscribers[subscriber.facility]
+
+    def facilities(self) -> List[str]:
+        with self._lock:
+            return list(self._subscribers)
+
+    def subscriber_count(self) -> int:
+        with self._lock:
+            return sum(len(subs) for by_day in self._subscribers.values() for subs in by_day.values())
+
+    def publish(self, payload: dict) -> None:
+        """Entrega un evento (seguro desde cualquier hilo). Sin `day` llega a todos los días."""
+        facility, day = payload["facility"], payload.get("day")
+        with self._lock:
+            by_day = self._subscribers.get(facility)
+            if not by_day:
+                return
+            if day is None:
+                targets = [sub for subs in by_day.values() for sub in subs]
+            else:
+                targets = list(by_day.get(day, ()))
+        if not targets:
+            return
+
+        message = format_sse(payload["type"], payload["data"])
+        by_loop: Dict[asyncio.AbstractEventLoop, List[Subscriber]] = defaultdict(list)
+        for subscriber in targets:
+            by_loop[subscriber.loop].append(subscriber)
+        for loop, subscribers in by_loop.items():
+            try:
+                loop.call_soon_threadsafe(_deliver, subscribers, message)
+            except RuntimeError:
+                pass  # Loop cerrado: la conexión ya no existe
+
+    async def stream(self, subscriber: Subscriber, snapshot: list, heartbeat: float) -> AsyncIterator[bytes]:
+        """
+        Cuerpo de la respuesta SSE: instantánea inicial y luego los eventos de la cola.
+        Un comentario periódico mantiene viva la conexión a través de proxies.
+        """
+        try:
+            yield format_sse("snapshot", snapshot)
+            while True:
+                try:
+                    yield await asyncio.wait_for(subscriber.queue.get(), timeout=heartbeat)
+                except asyncio.TimeoutError:
+                    yield b": ping\n\n"
+        finally:
+            self.unsubscribe(subscriber)
+
+
+def _deliver(subscribers: List[Subscriber], message: bytes) -> None:
+    for subscriber in subscribers:
+        subscriber.push(message)
+
+
+occupancy_bus = OccupancyBus(settings.SSE_QUEUE_SIZE)
+
+
+# --- Emisión de eventos desde los endpoints (solo tras el commit) ---
+
+def _emit(db: Session, payload: dict) -> None:
+    if db.get_bind().dialect.name == "postgresql":
+        # NOTIFY es transaccional: Postgres lo entrega a todos los workers al hacer commit
+        # (y lo descarta si hay rollback)
+        db.execute(NOTIFY_SQL, {"channel": NOTIFY_CHANNEL, "payload": json.dumps(payload, default=str)})
+    else:
+        # Sin Postgres (un solo proceso) se reparte localmente en el after_commit de la sesión
+        db.info.setdefault("occupancy_events", []).append(payload)
+
+
+@event.listens_for(Session, "after_commit")
+def _publish_local_events(session: Session) -> None:
+    for payload in session.info.pop("occupancy_events", ()):
+        occupancy_bus.publish(payload)
+
+
+@event.listens_for(Session, "after_rollback")
+def _discard_local_events(session: Session) -> None:
+    session.info.pop("occupancy_events", None)
+
+
+def notify_slot(db: Session, facility: str, start_time: datetime, end_time: datetime, capacity: int) -> None:
+    """
+    Encola el nuevo recuento de un tramo (mismo agrupado que /availability). Se llama
+    dentro de la transacción, después del flush, para que el recuento incluya el cambio.
+    """
+    count = db.query(func.count(Reservation.id)).filter(
+        Reservation.facility == facility,
+        Reservation.start_time == start_time,
+    ).scalar()
+    _emit(db, {
+        "type": "slot",
+        "facility": facility,
+        # Día en UTC, como agrupan /availability y las suscripciones (no el del huso del cliente)
+        "day": as_utc(start_time).date().isoformat(),
+        "data": {"start": start_time.isoformat(), "end": end_time.isoformat(), "count": count, "capacity": capacity},
+    })
+
+
+def as_utc(value: datetime) -> datetime:
+    # Las fechas sin zona se guardan como UTC: se comparan igual que en la BD.
+    # Las que traen huso se pasan a UTC (su fecha es la del día en la BD, no la del cliente)
+    return value.astimezone(timezone.utc) if value.tzinfo is not None else value.replace(tzinfo=timezone.utc)
+
+
+def notify_slots(db: Session, facility: str, slots: Iterable[Tuple[datetime, datetime]], capacity: int) -> None:
+    """Como notify_slot para varios tramos de la instalación, con un único recuento agrupado."""
+    slots = dict(slots)
+    if not slots:
+        return
+    counts = {
+        as_utc(start_time): count
+        for start_time, count in db.query(Reservation.start_time, func.count(Reservation.id)).filter(
+            Reservation.facility == facility,
+            Reservation.start_time.in_(list(slots)),
+        ).group_by(Reservation.start_time)
+    }
+    for start_time, end_time in slots.items():
+        _emit(db, {
+            "type": "slot",
+            "facility": facility,
+            "day": as_utc(start_time).date().isoformat(),
+            "data": {"start": start_time.isoformat(), "end": end_time.isoformat(),
+                     "count": counts.get(as_utc(start_time), 0), "capacity": capacity},
+        })
+
+
+def notify_capacity(db: Session, facility: str, capacity: int) -> None:
+    """Cambio de aforo: afecta a todos los días suscritos de la instalación."""
+    _emit(db, {"type": "capacity", "facility": facility, "data": {"capacity": capacity}})
+
+
+# --- Recepción entre workers (LISTEN) ---
+
+class OccupancyListener:
+    """
+    Hilo que mantiene una conexión dedicada con LISTEN y reenvía cada NOTIFY al bus
+    local. Si la conexión cae, reintenta y pide a los clientes que resincronicen.
+    """
+
+    def __init__(self, engine, bus: OccupancyBus, poll_timeout: float = 5.0):
+        self.engine = engine
+        self.bus = bus
+        self.poll_timeout = poll_timeout
+        self._stop = threading.Event()
+        self._thread = threading.Thread(target=self._run, name="occupancy-listener", daemon=True)
+
+    def start(self) -> None:
+        self._thread.start()
+
+    def stop(self) -> None:
+        self._stop.set()
+        self._thread.join(timeout=self.poll_timeout + 1)
+
+    def _connect(self):
+        raw = self.engine.raw_connection()
+        raw.detach()  # Conexión propia y permanente: no ocupa hueco del pool
+        connection = raw.driver_connection
+        connection.autocommit = True
+        with connection.cursor() as cursor:
+            cursor.execute(f"LISTEN {NOTIFY_CHANNEL}")
+        return connection
+
+    def _run(self) -> None:
+        connection = None
+        while not self._stop.is_set():
+            try:
+                if connection is None:
+                    connection = self._connect()
+                    logger.info("Escuchando cambios de ocupación (LISTEN %s)", NOTIFY_CHANNEL)
+                if select.select([connection], [], [], self.poll_timeout) == ([], [], []):
+                    continue
+                connection.poll()
+                while connection.notifies:
+                    notification = connection.notifies.pop(0)
+                    self.bus.publish(json.loads(notification.payload))
+            except Exception as e:
+                logger.warning("Conexión LISTEN perdida (%s), reintentando", e)
+                if connection is not None:
+                    try:
+                        connection.close()
+                    except Exception:
+                        pass
+                    connection = None
+                self._resync_all()
+                self._stop.wait(self.poll_timeout)
+        if connection is not None:
+            connection.close()
+
+    def _resync_all(self) -> None:
+        # Durante la desconexión se han podido perder eventos
+        for facility in self.bus.facilities():
+            self.bus.publish({"type": "resync", "facility": facility, "data": {}})
@@ -0,0 +1,232 @@
+import asyncio
+import hashlib
+import logging
+import math
+import threading
+import time
+from dataclasses import dataclass
+from datetime import datetime, timezone
+from typing import Callable, Dict, List, Mapping, Optional, Tuple
+
+from fastapi import HTTPException, Request
+from sqlalchemy import delete, select, tuple_
+from sqlalchemy.dialects.postgresql import insert
+from sqlalchemy.engine import Engine
+
+from src.core.config import settings
+from src.db.session import engine
+from src.models.rate_limit_model import RateLimitCounter
+
+logger = logging.getLogger(__name__)
+
+# Cada cuánto se purgan los contadores caducados
+SWEEP_SECONDS = 300.0
+
+# "ruta:ip" / "ruta:email" -> "peticiones/segundos". Rutas con bcrypt o envío de correo
+DEFAULT_LIMITS: Dict[str, str] = {
+    "login:ip": "20/60",
+    "login:email": "10/300",
+    "register:ip": "10/3600",
+    "register:email": "3/3600",
+    "forgot-password:ip": "5/900",
+    "forgot-password:email": "3/900",
+    "resend-verification:ip": "5/900",
+    "resend-verification:email": "3/900",
+    "reset-password:ip": "10/900",
+    "reset-password:email": "5/900",
+    "support:ip": "5/3600",
+    "support:email": "3/3600",
+}
+
+# (clave, duración de la ventana) -> (peticiones en la ventana anterior, en la actual)
+Hit = Tuple[str, int]
+Counts = Tuple[int, int]
+
+
+@dataclass(frozen=True)
+class Rate:
+    limit: int
+    seconds: int
+
+    @classmethod
+    def parse(cls, value: str) -> "Rate":
+        limit, _, seconds = value.partition("/")
+        rate = cls(int(limit), int(seconds))
+        if rate.limit < 1 or rate.seconds < 1:
+            raise ValueError(f"Límite de peticiones inválido: {value!r}")
+        return rate
+
+    def estimate(self, counts: Counts, now: float) -> float:
+        """Ventana deslizante aproximada: la anterior pesa lo que aún solapa con la actual."""
+        previous, current = counts
+        return previous * (1 - (now % self.seconds) / self.seconds) + current
+
+    def retry_after(self, counts: Counts, now: float) -> int:
+        """Segundos hasta que otra petición cabría en la ventana deslizante."""
+        previous, current = counts
+        offset = now % self.seconds
+        room = self.limit - current - 1
+        if room >= 0 and previous:
+            # Cabe en esta ventana en cuanto la anterior pese lo suficientemente poco
+            return max(1, math.ceil((1 - room / previous) * self.seconds - offset))
+        # En la siguiente ventana: la actual pasa a ser la anterior
+        needed = max(0.0, 1 - (self.limit - 1) / current) if current else 0.0
+        return max(1, math.ceil(self.seconds - offset + needed * self.seconds))
+
+
+def load_limits(overrides: Mapping[str, str]) -> Dict[str, Rate]:
+    return {name: Rate.parse(value) for name, value in {**DEFAULT_LIMITS, **overrides}.items()}
+
+
+class MemoryBackend:
+    """
+    Contadores en la memoria del proceso. Exactos con un solo worker; con varios cada
+    uno cuenta lo suyo (el límite efectivo se multiplica por el número de workers).
+    """
+
+    def __init__(self, max_counters: int = 100_000):
+        self.max_counters = max_counters
+        # (clave, inicio de ventana) -> [peticiones, caducidad]
+        self._counters: Dict[Tuple[str, int], List[float]] = {}
+        self._lock = threading.Lock()
+
+    def hit(self, hits: List[Hit], now: float) -> List[Counts]:
+        counts = []
+        with self._lock:
+            for key, seconds in hits:
+                window_start = int(now // seconds) * seconds
+                counter = self._counters.setdefault((key, window_start), [0, window_start + 2 * seconds])
+                counter[0] += 1
+                previous = self._counters.get((key, window_start - seconds))
+                counts.append((int(previous[0]) if previous else 0, int(counter[0])))
+            if len(self._counters) > self.max_counters:
+                self._prune(now)
+        return counts
+
+    def _prune(self, now: float) -> int:
+        expired = [counter for counter, (_, expires_at) in self._counters.items() if expires_at <= now]
+        for counter in expired:
+            del self._counters[counter]
+        return len(expired)
+
+    def sweep(self) -> int:
+        with self._lock:
+            return self._prune(time.time())
+
+
+class PostgresBackend:
+    """
+    Contadores compartidos por todos los workers en una tabla UNLOGGED. Por petición, una
+    transacción corta y propia (no se deshace con la del endpoint): un INSERT ... ON CONFLICT
+    que suma en la ventana actual de todas las claves y una lectura de la ventana anterior.
+    """
+
+    def __init__(self, engine: Engine):
+        self.engine = engine
+
+    def hit(self, hits: List[Hit], now: float) -> List[Counts]:
+        table = RateLimitCounter.__table__
+        windows = [(key, int(now // seconds) * seconds, seconds) for key, seconds in hits]
+        upsert = insert(table).values([
+            {
+                "key": key,
+                "window_start": window_start,
+                "hits": 1,
+                "expires_at": datetime.fromtimestamp(window_start + 2 * seconds, timezone.utc),
+            }
+            for key, window_start, seconds in windows
+        ])
+        upsert = upsert.on_conflict_do_update(
+            index_elements=[table.c.key, table.c.window_start],
+            set_={"hits": table.c.hits + 1},
+        ).returning(table.c.key, table.c.hits)
+        previous_windows = select(table.c.key, table.c.hits).where(
+            tuple_(table.c.key, table.c.window_start).in_(
+                [(key, window_start - seconds) for key, window_start, seconds in windows]
+            )
+        )
+        with self.engine.begin() as connection:
+            current = dict(connection.execute(upsert).all())
+            previous = dict(connection.execute(previous_windows).all())
+        return [(previous.get(key, 0), current[key]) for key, _, _ in windows]
+
+    def sweep(self) -> int:
+        with self.engine.begin() as connection:
+            return connection.execute(
+                delete(RateLimitCounter).where(RateLimitCounter.expires_at <= datetime.now(timezone.utc))
+            ).rowcount
+
+
+class RateLimiter:
+    """
+    Límite de peticiones por IP y por email con ventana deslizante (dos ventanas fijas
+    ponderadas), con límites configurables por ruta. Cuentan también los intentos
+    rechazados: quien insiste sin respetar Retry-After sigue bloqueado.
+    """
+
+    def __init__(self, backend, limits: Dict[str, Rate], enabled: bool = True,
+                 clock: Callable[[], float] = time.time):
+        self.backend = backend
+        self.limits = limits
+        self.enabled = enabled
+        self.clock = clock
+
+    def check(self, request: Request, route: str, email: Optional[str] = None) -> None:
+        """Cuenta la petición y lanza 429 (con Retry-After) si supera algún límite de la ruta."""
+        if not self.enabled:
+            return
+        # IP del cliente tal como la ve uvicorn (detrás de un proxy, con --proxy-headers)
+        ip = request.client.host if request.client else None
+        checks: List[Tuple[str, Rate]] = []
+        for kind, value in (("ip", ip), ("email", email.strip().lower() if email else None)):
+            rate = self.limits.get(f"{route}:{kind}")
+            if rate is not None and value:
+                digest = hashlib.blake2s(f"{route}:{kind}:{value}".encode(), digest_size=16).hexdigest()
+                checks.append((digest, rate))
+        if not checks:
+            return
+
+        now = self.clock()
+        try:
+            counts = self.backend.hit([(key, rate.seconds) for key, rate in checks], now)
+        except Exception:
+            # Sin contadores se deja pasar: mejor sin límite un rato que sin login
+            logger.exception("Contadores de rate limit no disponibles (%s)", route)
+            return
+
+        retry_after = max(
+            (rate.retry_after(count, now) for (_, rate), count in zip(checks, counts)
+             if rate.estimate(count, now) > rate.limit),
+            default=None,
+        )
+        if retry_after is not None:
+            raise HTTPException(
+                status_code=429,
+                detail=f"Demasiadas peticiones. Vuelve a intentarlo en {retry_after} segundos.",
+                headers={"Retry-After": str(retry_after)},
+            )
+
+
+def _backend():
+    if settings.RATE_LIMIT_BACKEND == "memory":
+        return MemoryBackend()
+    if settings.RATE_LIMIT_BACKEND == "postgres" or engine.dialect.name == "postgresql":
+        return PostgresBackend(engine)
+    return MemoryBackend()
+
+
+rate_limiter = RateLimiter(_backend(), load_limits(settings.RATE_LIMITS), settings.RATE_LIMIT_ENABLED)
+
+
+def get_rate_limiter() -> RateLimiter:
+    return rate_limiter
+
+
+async def sweep_periodically(interval: float = SWEEP_SECONDS) -> None:
+    """Purga de contadores caducados en segundo plano, mientras el worker esté vivo."""
+    while True:
+        await asyncio.sleep(interval)
+        try:
+            await asyncio.to_thread(rate_limiter.backend.sweep)
+        except Exception:
+            logger.exception("Error purgando contadores de rate limit")
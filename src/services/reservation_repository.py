@@ -0,0 +1,223 @@
+import itertools
+import threading
+from abc import ABC, abstractmethod
+from bisect import bisect_left, bisect_right
+from collections import Counter
+from datetime import date, datetime, time, timedelta, timezone
+from typing import Dict, List, Optional
+
+from fastapi import Depends, HTTPException
+from sqlalchemy import func
+from sqlalchemy.orm import Session
+
+from src.db.session import get_db, get_read_db
+from src.models.reservation_model import Reservation
+from src.services.booking import book, duplicate_error, full_error, price_with_tax
+from src.services.facility_registry import FacilityInfo
+from src.services.occupancy import as_utc
+
+
+def group_slots(reservations, capacity: int) -> list:
+    """Agrupa las reservas por hora de inicio (sin BD, para poder medirlo aislado)."""
+    slots_data = {}
+    for res in reservations:
+        start_iso = res.start_time.isoformat()
+
+        if start_iso not in slots_data:
+            slots_data[start_iso] = {
+                "start": start_iso,
+                "end": res.end_time.isoformat(),
+                "count": 0,
+                "capacity": capacity
+            }
+
+        slots_data[start_iso]["count"] += 1
+
+    return list(slots_data.values())
+
+
+class ReservationRepository(ABC):
+    """
+    Reservas, disponibilidad y estadísticas sin depender de dónde se guardan. La reserva
+    sigue las mismas reglas en todas las implementaciones: 400 si el usuario ya tiene una
+    reserva que solapa, 409 si el tramo está completo.
+    """
+
+    @abstractmethod
+    def book(self, user_id: int, facility_conf: FacilityInfo,
+             start_time: datetime, end_time: datetime) -> Reservation:
+        ...
+
+    @abstractmethod
+    def get(self, reservation_id: int) -> Optional[Reservation]:
+        ...
+
+    @abstractmethod
+    def cancel(self, reservation: Reservation) -> None:
+        ...
+
+    @abstractmethod
+    def day_slots(self, facility_conf: FacilityInfo, day: date) -> list:
+        """Tramos ocupados de un día con su recuento y el aforo de la instalación."""
+
+    @abstractmethod
+    def stats(self) -> dict:
+        """Total de reservas, ingresos y la instalación más reservada."""
+
+
+class SqlReservationRepository(ReservationRepository):
+    """La BD de siempre. No hace commit: la transacción la cierra el endpoint."""
+
+    def __init__(self, db: Session):
+        self.db = db
+
+    def book(self, user_id: int, facility_conf: FacilityInfo,
+             start_time: datetime, end_time: datetime) -> Reservation:
+        # Aforo 1: INSERT directo protegido por la restricción de exclusión.
+        # Resto: bloqueo de la instalación + duplicados + recuento
+        return book(self.db, user_id, facility_conf, start_time, end_time)
+
+    def get(self, reservation_id: int) -> Optional[Reservation]:
+        return self.db.query(Reservation).filter(Reservation.id == reservation_id).first()
+
+    def cancel(self, reservation: Reservation) -> None:
+        self.db.delete(reservation)
+        self.db.flush()
+
+    def day_slots(self, facility_conf: FacilityInfo, day: date) -> list:
+        reservations = self.db.query(Reservation).filter(
+            Reservation.facility == facility_conf.name,
+            func.date(Reservation.start_time) == day
+        ).all()
+        # Capacidad dinámica (registro de instalaciones)
+        return group_slots(reservations, facility_conf.capacity)
+
+    def stats(self) -> dict:
+        total_res = self.db.query(Reservation).count()
+        total_money = self.db.query(func.sum(Reservation.price)).scalar() or 0.0
+
+        popular = self.db.query(
+            Reservation.facility, func.count(Reservation.id)
+        ).group_by(Reservation.facility).order_by(func.count(Reservation.id).desc()).first()
+
+        return {
+            "total_reservations": total_res,
+            "total_earnings": round(total_money, 2),
+            "popular_facility": popular[0] if popular else "Sin datos"
+        }
+
+
+class _FacilityIntervals:
+    """Reservas de una instalación ordenadas por inicio (listas paralelas para bisect)."""
+
+    def __init__(self):
+        self.lock = threading.Lock()
+        self.starts: List[datetime] = []
+        self.items: List[Reservation] = []
+        # Duración más larga vista: acota hacia atrás la búsqueda de solapes
+        self.longest = timedelta(0)
+
+    def overlapping(self, start: datetime, end: datetime) -> List[Reservation]:
+        # Solo pueden solapar las que empiezan antes del fin y no antes de (inicio - duración máxima)
+        lo = bisect_right(self.starts, start - self.longest)
+        hi = bisect_left(self.starts, end)
+        return [res for res in self.items[lo:hi] if as_utc(res.end_time) > start]
+
+    def add(self, reservation: Reservation) -> None:
+        start = as_utc(reservation.start_time)
+        index = bisect_right(self.starts, start)
+        self.starts.insert(index, start)
+        self.items.insert(index, reservation)
+        self.longest = max(self.longest, as_utc(reservation.end_time) - start)
+
+    def remove(self, reservation: Reservation) -> None:
+        start = as_utc(reservation.start_time)
+        index = bisect_left(self.starts, start)
+        while self.items[index] is not reservation:
+            index += 1
+        del self.starts[index]
+        del self.items[index]
+
+
+class MemoryReservationRepository(ReservationRepository):
+    """
+    Reservas en memoria, con un array ordenado de intervalos por instalación. Mismas
+    reglas que la BD con un cerrojo por instalación en lugar del bloqueo de fila: sirve
+    para tests de concurrencia y simulaciones de miles de vecinos sin Postgres.
+    """
+
+    def __init__(self):
+        self._facilities: Dict[str, _FacilityIntervals] = {}
+        self._by_id: Dict[int, Reservation] = {}
+        self._ids = itertools.count(1)
+        self._lock = threading.Lock()
+
+    def _intervals(self, facility: str) -> _FacilityIntervals:
+        with self._lock:
+            intervals = self._facilities.get(facility)
+            if intervals is None:
+                intervals = self._facilities[facility] = _FacilityIntervals()
+            return intervals
+
+    def book(self, user_id: int, facility_conf: FacilityInfo,
+             start_time: datetime, end_time: datetime) -> Reservation:
+        intervals = self._intervals(facility_conf.name)
+        with intervals.lock:
+            overlapping = intervals.overlapping(as_utc(start_time), as_utc(end_time))
+            if any(res.user_id == user_id for res in overlapping):
+                raise duplicate_error()
+            if len(overlapping) >= facility_conf.capacity:
+                raise full_error(len(overlapping), facility_conf.capacity)
+
+            reservation = Reservation(
+                id=next(self._ids),
+                facility=facility_conf.name,
+                start_time=start_time,
+                end_time=end_time,
+                user_id=user_id,
+                price=price_with_tax(facility_conf),
+                created_at=datetime.now(timezone.utc),
+            )
+            intervals.add(reservation)
+        with self._lock:
+            self._by_id[reservation.id] = reservation
+        return reservation
+
+    def get(self, reservation_id: int) -> Optional[Reservation]:
+        with self._lock:
+            return self._by_id.get(reservation_id)
+
+    def cancel(self, reservation: Reservation) -> None:
+        with self._lock:
+            if self._by_id.pop(reservation.id, None) is None:
+                raise HTTPException(status_code=404, detail="Reserva no encontrada")
+        intervals = self._intervals(reservation.facility)
+        with intervals.lock:
+            intervals.remove(reservation)
+
+    def day_slots(self, facility_conf: FacilityInfo, day: date) -> list:
+        intervals = self._intervals(facility_conf.name)
+        first = datetime.combine(day, time.min, tzinfo=timezone.utc)
+        with intervals.lock:
+            lo = bisect_left(intervals.starts, first)
+            hi = bisect_left(intervals.starts, first + timedelta(days=1))
+            reservations = intervals.items[lo:hi]
+        return group_slots(reservations, facility_conf.capacity)
+
+    def stats(self) -> dict:
+        with self._lock:
+            reservations = list(self._by_id.values())
+        counts = Counter(res.facility for res in reservations)
+        return {
+            "total_reservations": len(reservations),
+            "total_earnings": round(sum(res.price for res in reservations), 2),
+            "popular_facility": counts.most_common(1)[0][0] if counts else "Sin datos"
+        }
+
+
+def get_repository(db: Session = Depends(get_db)) -> ReservationRepository:
+    return SqlReservationRepository(db)
+
+
+def get_read_repository(db: Session = Depends(get_read_db)) -> ReservationRepository:
+    return SqlReservationRepository(db)
@@ -1,38 +1,70 @@
-from minio import Minio
-from minio.error import S3Error
+import logging
 import os
+from functools import lru_cache
 from dotenv import load_dotenv
+from src.core.config import settings
+from src.core.readiness import register
 
 load_dotenv()
 
+logger = logging.getLogger(__name__)
+
 MINIO_URL = os.getenv("MINIO_URL", "localhost:9000")
 ACCESS_KEY = os.getenv("MINIO_ACCESS_KEY", "minioadmin")
 SECRET_KEY = os.getenv("MINIO_SECRET_KEY", "minioadmin")
 BUCKET_NAME = os.getenv("MINIO_BUCKET_NAME", "avatars")
 SECURE = os.getenv("MINIO_SECURE", "False").lower() == "true"
 
-client = Minio(
-    MINIO_URL,
-    access_key=ACCESS_KEY,
-    secret_key=SECRET_KEY,
-    secure=SECURE
-)
+
+@lru_cache(maxsize=1)
+def get_client():
+    """Cliente MinIO creado (e importado) en el primer uso para no penalizar el arranque"""
+    import urllib3
+    from minio import Minio
+
+    # Timeouts acotados y sin reintentos: si MinIO no responde no queremos bloquear al worker
+    http_client = urllib3.PoolManager(
+        timeout=urllib3.Timeout(connect=settings.MINIO_INIT_TIMEOUT, read=settings.MINIO_READ_TIMEOUT),
+        retries=False,
+    )
+    return Minio(
+        MINIO_URL,
+        access_key=ACCESS_KEY,
+        secret_key=SECRET_KEY,
+        secure=SECURE,
+        http_client=http_client
+    )
+
 
 def init_bucket():
     """Crea el bucket si no existe y lo hace público (read-only)"""
+    from minio.error import S3Error
+
+    client = get_client()
     try:
         if not client.bucket_exists(BUCKET_NAME):
             client.make_bucket(BUCKET_NAME)
             # Política pública para leer imágenes
             policy = '{"Version":"2012-10-17","Statement":[{"Effect":"Allow","Principal":{"AWS":["*"]},"Action":["s3:GetObject"],"Resource":["arn:aws:s3:::%s/*"]}]}' % BUCKET_NAME
             client.set_bucket_policy(BUCKET_NAME, policy)
-            print(f"Bucket '{BUCKET_NAME}' creado exitosamente.")
+            logger.info("Bucket '%s' creado exitosamente.", BUCKET_NAME)
     except S3Error as e:
-        print(f"Error MinIO: {e}")
+        logger.error("Error MinIO: %s", e)
+        raise
+
+
+# No crítica: el bucket se verifica en segundo plano y, si falla, en la primera subida
+storage_dependency = register("minio", init_bucket, timeout=settings.MINIO_INIT_TIMEOUT)
+
 
 def upload_file(file_data, filename, content_type):
+    if not storage_dependency.ensure():
+        return None
+
+    from minio.error import S3Error
+
     try:
-        client.put_object(
+        get_client().put_object(
             BUCKET_NAME,
             filename,
             file_data,
@@ -43,5 +75,21 @@ def upload_file(file_data, filename, content_type):
         # Retornar URL accesible
         return f"http://localhost:9000/{BUCKET_NAME}/{filename}"
     except S3Error as e:
-        print(f"Error subiendo archivo: {e}")
-        return None
\ No newline at end of file
+        logger.error("Error subiendo archivo %s: %s", filename, e)
+        return None
+
+
+def delete_file(file_url: str) -> bool:
+    """Borra un objeto del bucket a partir de la URL pública devuelta por upload_file"""
+    if not storage_dependency.ensure():
+        return False
+
+    from minio.error import S3Error
+
+    filename = file_url.rsplit("/", 1)[-1]
+    try:
+        get_client().remove_object(BUCKET_NAME, filename)
+        return True
+    except S3Error as e:
+        logger.error("Error borrando archivo %s: %s", filename, e)
+        return False
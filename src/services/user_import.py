@@ -0,0 +1,167 @@
+import csv
+import io
+import logging
+import multiprocessing
+import os
+import random
+import threading
+from concurrent.futures import ProcessPoolExecutor
+from datetime import datetime, timedelta, timezone
+from typing import List, Optional, Tuple
+
+from pydantic import ValidationError
+from sqlalchemy.dialects import postgresql, sqlite
+from sqlalchemy.orm import Session
+
+from src.core.config import settings
+from src.core.security import get_password_hash
+from src.models.user_model import User
+from src.schemas.user_schema import UserCreate
+
+logger = logging.getLogger(__name__)
+
+IMPORT_FIELDS = ("email", "password", "full_name", "apartment", "phone", "address", "postal_code")
+REQUIRED_FIELDS = {"email", "password"}
+MAX_IMPORT_ROWS = 5000
+# Filas por INSERT multi-fila (10 columnas x 500 filas queda muy lejos del límite de parámetros)
+INSERT_CHUNK_SIZE = 500
+# Por debajo de esto arrancar procesos cuesta más que hashear en el propio hilo
+PARALLEL_HASH_THRESHOLD = 8
+
+# Un alta masiva tarda en leerse: el código dura más que los 15 minutos del registro normal
+IMPORT_CODE_TTL = timedelta(hours=48)
+IMPORT_CODE_EXPIRES_TEXT = "Expira en 48 horas"
+
+
+def parse_csv(content: str) -> Tuple[List[Tuple[int, UserCreate]], List[dict]]:
+    """
+    Valida cada fila con las mismas reglas que el registro (UserCreate).
+    Devuelve las filas válidas (número de fila, datos) y los errores por fila.
+    """
+    reader = csv.DictReader(io.StringIO(content))
+    missing = REQUIRED_FIELDS - set(reader.fieldnames or ())
+    if missing:
+        raise ValueError(f"Faltan columnas obligatorias en el CSV: {', '.join(sorted(missing))}")
+
+    valid, errors, seen = [], [], set()
+    # La fila 1 es la cabecera: se numera como en una hoja de cálculo
+    for row_number, row in enumerate(reader, start=2):
+        if row_number - 1 > MAX_IMPORT_ROWS:
+            raise ValueError(f"El CSV supera el máximo de {MAX_IMPORT_ROWS} filas por importación")
+
+        data = {field: (row.get(field) or "").strip() for field in IMPORT_FIELDS}
+        try:
+            user_in = UserCreate(**{field: value for field, value in data.items() if value})
+        except ValidationError as e:
+            errors.append({
+                "row": row_number,
+                "email": data["email"] or None,
+                "error": "; ".join(err["msg"] for err in e.errors()),
+            })
+            continue
+
+        email_key = user_in.email.lower()
+        if email_key in seen:
+            errors.append({"row": row_number, "email": user_in.email, "error": "Email repetido en el fichero"})
+            continue
+        seen.add(email_key)
+        valid.append((row_number, user_in))
+
+    return valid, errors
+
+
+# Pool de hashing compartido por todas las importaciones del proceso: se crea con la primera
+# y se cierra al apagar (shutdown_hash_pool, en el lifespan)
+_hash_pool: Optional[ProcessPoolExecutor] = None
+_hash_pool_lock = threading.Lock()
+
+
+def _get_hash_pool(workers: int) -> ProcessPoolExecutor:
+    global _hash_pool
+    with _hash_pool_lock:
+        if _hash_pool is None:
+            # spawn y no fork: el servidor tiene hilos (logging, LISTEN, threadpool, pools de la BD)
+            # y un hijo clonado con uno de sus cerrojos tomado se quedaría bloqueado
+            _hash_pool = ProcessPoolExecutor(max_workers=workers, mp_context=multiprocessing.get_context("spawn"))
+        return _hash_pool
+
+
+def shutdown_hash_pool() -> None:
+    global _hash_pool
+    with _hash_pool_lock:
+        pool, _hash_pool = _hash_pool, None
+    if pool is not None:
+        pool.shutdown(cancel_futures=True)
+
+
+def hash_passwords(passwords: List[str], workers: int = 0) -> List[str]:
+    """
+    Cientos de hashes bcrypt son segundos de CPU: se reparten entre los procesos del pool
+    para no serializarlos en un único hilo del servidor. El pool es único y acotado, así
+    que importaciones simultáneas comparten sus procesos en vez de multiplicarlos.
+    """
+    workers = workers or os.cpu_count() or 1
+    if workers == 1 or len(passwords) < PARALLEL_HASH_THRESHOLD:
+        return [get_password_hash(password) for password in passwords]
+
+    pool = _get_hash_pool(workers)
+    return list(pool.map(get_password_hash, passwords, chunksize=max(1, len(passwords) // (workers * 4))))
+
+
+def _insert_for(db: Session):
+    # Ambos dialectos soportan ON CONFLICT DO NOTHING ... RETURNING (SQLite en los tests)
+    if db.get_bind().dialect.name == "sqlite":
+        return sqlite.insert
+    return postgresql.insert
+
+
+def import_users(db: Session, content: str) -> Tuple[dict, List[Tuple[str, str]]]:
+    """
+    Importa residentes desde CSV con INSERT multi-fila y ON CONFLICT (email) DO NOTHING:
+    los emails ya registrados se omiten sin abortar el resto. Devuelve el informe y la
+    lista de (email, código) a los que hay que enviar la verificación.
+    """
+    valid, errors = parse_csv(content)
+    report = {"created": 0, "skipped": [], "errors": errors}
+    if not valid:
+        return report, []
+
+    hashes = hash_passwords([user_in.password for _, user_in in valid], settings.IMPORT_HASH_WORKERS)
+    expires_at = datetime.now(timezone.utc) + IMPORT_CODE_TTL
+    admin_email = settings.ADMIN_EMAIL.strip().lower()
+
+    rows = []
+    for (_, user_in), hashed_password in zip(valid, hashes):
+        rows.append({
+            "email": user_in.email,
+            "hashed_password": hashed_password,
+            "full_name": user_in.full_name,
+            "apartment": user_in.apartment,
+            "phone": user_in.phone,
+            "address": user_in.address,
+            "postal_code": user_in.postal_code,
+            "role": "admin" if user_in.email.strip().lower() == admin_email else "user",
+            "is_active": False,
+            "verification_code": "".join(str(random.randint(0, 9)) for _ in range(6)),
+            "verification_code_expires_at": expires_at,
+        })
+
+    insert = _insert_for(db)
+    created = set()
+    for start in range(0, len(rows), INSERT_CHUNK_SIZE):
+        statement = (
+            insert(User)
+            .values(rows[start:start + INSERT_CHUNK_SIZE])
+            .on_conflict_do_nothing(index_elements=[User.email])
+            .returning(User.email)
+        )
+        created.update(db.execute(statement).scalars())
+    db.commit()
+
+    report["created"] = len(created)
+    report["skipped"] = [row["email"] for row in rows if row["email"] not in created]
+    logger.info("Importación de residentes: %d creados, %d ya existían, %d con errores",
+                len(created), len(report["skipped"]), len(errors))
+
+    invitations = [(row["email"], row["verification_code"]) for row in rows if row["email"] in created]
+    return report, invitations
@@ -0,0 +1,121 @@
+from datetime import datetime, timezone
+from typing import List, Tuple
+
+from fastapi import HTTPException
+from sqlalchemy.exc import IntegrityError
+from sqlalchemy.orm import Session
+
+from src.models.facility_model import Facility
+from src.models.reservation_model import Reservation
+from src.models.user_model import User
+from src.models.waitlist_model import WaitlistEntry
+from src.services.booking import EXCLUSION_VIOLATION, duplicate_error, overlapping, price_with_tax, uses_exclusion
+from src.services.facility_registry import FacilityInfo
+from src.services.occupancy import as_utc
+
+
+def enqueue(db: Session, user_id: int, facility_conf: FacilityInfo,
+            start_time: datetime, end_time: datetime) -> WaitlistEntry:
+    """Apunta al usuario (sin commit) en la lista de espera de un tramo que está completo."""
+    # Mismo bloqueo que reservas y promociones: una cancelación simultánea no puede liberar
+    # la plaza entre el recuento y el alta (quedaría en espera sin nadie que lo promocione)
+    locked = db.query(Facility.id).filter(Facility.id == facility_conf.id).with_for_update().first()
+    if not locked:
+        raise HTTPException(status_code=404, detail="Instalación no encontrada o no disponible")
+
+    if overlapping(db.query(Reservation.id), facility_conf.name, start_time, end_time,
+                    Reservation.user_id == user_id).first():
+        raise duplicate_error()
+
+    occupied = overlapping(db.query(Reservation), facility_conf.name, start_time, end_time).count()
+    if occupied < facility_conf.capacity:
+        raise HTTPException(status_code=400, detail="Quedan plazas libres en este horario: resérvalo directamente.")
+
+    entry = WaitlistEntry(user_id=user_id, facility=facility_conf.name, start_time=start_time, end_time=end_time)
+    db.add(entry)
+    try:
+        db.flush()
+    except IntegrityError:
+        db.rollback()
+        raise HTTPException(status_code=400, detail="Ya estás en la lista de espera de este horario.")
+    return entry
+
+
+def promote(db: Session, facility_conf: FacilityInfo,
+            start_time: datetime, end_time: datetime) -> List[Tuple[str, Reservation]]:
+    """
+    Tras liberar plazas de un tramo (sin commit), convierte en reservas las primeras
+    entradas de su lista de espera, en la misma transacción que la cancelación.
+    Devuelve (email, reserva) de cada promoción para avisar a los interesados.
+
+    El bloqueo de la instalación ordena la promoción con las reservas normales; las
+    entradas se toman con SKIP LOCKED para que dos cancelaciones simultáneas del mismo
+    tramo no se esperen ni promocionen a la misma persona.
+    """
+    if as_utc(start_time) <= datetime.now(timezone.utc):
+        return []
+
+    locked = db.query(Facility.id).filter(Facility.id == facility_conf.id).with_for_update().first()
+    if not locked:
+        return []
+
+    exclusive = uses_exclusion(db, facility_conf)
+    promoted: List[Tuple[str, Reservation]] = []
+    while True:
+        free = facility_conf.capacity - overlapping(
+            db.query(Reservation), facility_conf.name, start_time, end_time).count()
+        if free <= 0:
+            return promoted
+
+        candidates = db.query(WaitlistEntry, User.email)\
+            .join(User, User.id == WaitlistEntry.user_id)\
+            .filter(
+                WaitlistEntry.facility == facility_conf.name,
+                WaitlistEntry.start_time == start_time,
+                WaitlistEntry.end_time == end_time,
+                WaitlistEntry.status == "waiting",
+            )\
+            .order_by(WaitlistEntry.created_at, WaitlistEntry.id)\
+            .with_for_update(skip_locked=True, of=WaitlistEntry)\
+            .limit(free)\
+            .all()
+        if not candidates:
+            return promoted
+
+        now = datetime.now(timezone.utc)
+        already_booked = {
+            user_id for (user_id,) in overlapping(
+                db.query(Reservation.user_id), facility_conf.name, start_time, end_time,
+                Reservation.user_id.in_([entry.user_id for entry, _ in candidates]),
+            )
+        }
+        for entry, email in candidates:
+            if entry.user_id in already_booked:
+                # Ya consiguió plaza por otra vía: sale de la cola sin ocupar hueco
+                entry.status = "expired"
+                continue
+            reservation = Reservation(
+                facility=facility_conf.name,
+                start_time=start_time,
+                end_time=end_time,
+                user_id=entry.user_id,
+                price=price_with_tax(facility_conf),
+                is_exclusive=exclusive,
+            )
+            if exclusive:
+                # Aforo 1: una reserva directa (sin bloqueo) puede haber ocupado ya el tramo
+                try:
+                    with db.begin_nested():
+                        db.add(reservation)
+                except IntegrityError as e:
+                    if getattr(e.orig, "pgcode", None) != EXCLUSION_VIOLATION:
+                        raise
+                    return promoted
+            else:
+                db.add(reservation)
+                db.flush()
+            entry.status = "promoted"
+            entry.reservation_id = reservation.id
+            entry.promoted_at = now
+            promoted.append((email, reservation))
+        db.flush()
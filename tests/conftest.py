@@ -0,0 +1,54 @@
+import pytest
+from sqlalchemy import create_engine, event
+from sqlalchemy.orm import sessionmaker
+from sqlalchemy.pool import StaticPool
+from src.main import app
+from src.db.base import Base
+from src.db.session import get_db, get_read_db
+from src.db.instrumentation import instrument_engine
+from src.models import user_model, reservation_model, facility_model, waitlist_model, idempotency_model, token_model  # noqa: F401 (registran las tablas)
+from src.services.rate_limit import MemoryBackend, RateLimiter, get_rate_limiter, load_limits
+
+
+@pytest.fixture(autouse=True)
+def rate_limiter():
+    """Rate limiter en memoria y limpio en cada test (sin Postgres ni contadores de otros tests)."""
+    limiter = RateLimiter(MemoryBackend(), load_limits({}))
+    app.dependency_overrides[get_rate_limiter] = lambda: limiter
+    yield limiter
+    app.dependency_overrides.pop(get_rate_limiter, None)
+
+
+@pytest.fixture
+def sqlite_db():
+    """
+    BD SQLite en memoria con el esquema real e instrumentada, para tests que
+    necesitan SQL de verdad (p. ej. contar consultas por endpoint).
+    """
+    engine = create_engine(
+        "sqlite://",
+        connect_args={"check_same_thread": False},
+        poolclass=StaticPool,
+    )
+
+    @event.listens_for(engine, "connect")
+    def enable_foreign_keys(dbapi_connection, _):
+        # SQLite no aplica ON DELETE CASCADE salvo que se activen las claves foráneas
+        dbapi_connection.execute("PRAGMA foreign_keys=ON")
+
+    instrument_engine(engine, slow_query_ms=1000)
+    Base.metadata.create_all(bind=engine)
+    TestingSession = sessionmaker(autocommit=False, autoflush=False, bind=engine)
+    db = TestingSession()
+
+    def override_get_db():
+        yield db
+
+    app.dependency_overrides[get_db] = override_get_db
+    app.dependency_overrides[get_read_db] = override_get_db
+
+    yield db
+
+    db.close()
+    app.dependency_overrides = {}
+    engine.dispose()
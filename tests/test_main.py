@@ -3,7 +3,7 @@ from fastapi.testclient import TestClient
 from unittest.mock import MagicMock
 from datetime import datetime, timedelta, timezone  # <--- AÑADIDO timezone
 from src.main import app
-from src.db.session import get_db
+from src.db.session import get_db, get_read_db
 from src.models.user_model import User
 from src.core.security import get_password_hash
 from src.core.deps import get_current_user, get_current_admin
@@ -23,8 +23,9 @@ def mock_db():
     def override_get_db():
         yield db
 
-    # Aplicamos el override
+    # Aplicamos el override (también a las lecturas que irían a réplica)
     app.dependency_overrides[get_db] = override_get_db
+    app.dependency_overrides[get_read_db] = override_get_db
 
     yield db  # Devolvemos el mock al test para que pueda configurarlo
 
@@ -38,6 +39,21 @@ def client():
     return TestClient(app)
 
 
+@pytest.fixture
+def facilities(monkeypatch):
+    """Registro de instalaciones aislado por test (precargado con Gym y Padel)"""
+    from src.routers import reservations as reservations_router
+    from src.services.facility_registry import FacilityInfo, FacilityRegistry
+
+    registry = FacilityRegistry(ttl=60)
+    registry.publish([
+        FacilityInfo(id=1, name="Gym", price=10.0, capacity=10),
+        FacilityInfo(id=2, name="Padel", price=10.0, capacity=50),
+    ])
+    monkeypatch.setattr(reservations_router, "facility_registry", registry)
+    return registry
+
+
 # --- TESTS DE AUTH ---
 
 def test_login_wrong_password(client, mock_db):
@@ -112,17 +128,13 @@ def test_create_reservation_end_before_start(client, mock_db):
     assert "debe ser anterior" in response.json()["detail"]
 
 
-def test_create_reservation_no_capacity(client, mock_db):
+def test_create_reservation_no_capacity(client, mock_db, facilities):
     """6. Verificar control de aforo lleno"""
     # Mockear usuario
     app.dependency_overrides[get_current_user] = lambda: User(id=1, role="user")
 
-    mock_facility = MagicMock(capacity=10, price=10.0)
-
-    # CORREGIDO: side_effect para manejar las múltiples llamadas a .first()
-    # 1ª llamada: Busca configuración Facility -> Devuelve mock_facility
-    # 2ª llamada: Busca duplicados (already_booked) -> Devuelve None (no tiene reserva)
-    mock_db.query.return_value.filter.return_value.first.side_effect = [mock_facility, None]
+    # La configuración (aforo 10) sale del registro; la BD solo busca duplicados -> None
+    mock_db.query.return_value.filter.return_value.first.return_value = None
 
     # Simulamos que ya hay 10 reservas en el count()
     mock_db.query.return_value.filter.return_value.count.return_value = 10
@@ -138,14 +150,12 @@ def test_create_reservation_no_capacity(client, mock_db):
     assert "Aforo completo" in response.json()["detail"]
 
 
-def test_create_reservation_duplicate_user(client, mock_db):
+def test_create_reservation_duplicate_user(client, mock_db, facilities):
     """7. Verificar que un usuario no reserve dos veces el mismo slot"""
     app.dependency_overrides[get_current_user] = lambda: User(id=1, role="user")
 
-    mock_facility = MagicMock(capacity=50, price=10.0)
-    # 1ª llamada: Configuración -> mock_facility
-    # 2ª llamada: Already Booked -> MagicMock() (simula que encontró una reserva)
-    mock_db.query.return_value.filter.return_value.first.side_effect = [mock_facility, MagicMock()]
+    # Already Booked -> MagicMock() (simula que encontró una reserva)
+    mock_db.query.return_value.filter.return_value.first.return_value = MagicMock()
 
     payload = {
         "facility": "Padel",
@@ -158,9 +168,8 @@ def test_create_reservation_duplicate_user(client, mock_db):
     assert "Ya tienes una plaza reservada" in response.json()["detail"]
 
 
-def test_get_availability_empty(client, mock_db):
+def test_get_availability_empty(client, mock_db, facilities):
     """8. Verificar disponibilidad cuando no hay reservas"""
-    mock_db.query.return_value.filter.return_value.first.return_value = MagicMock(capacity=10)
     mock_db.query.return_value.filter.return_value.all.return_value = []
 
     response = client.get("/api/v1/reservations/availability?facility=Gym&date_str=2026-01-01")
@@ -181,7 +190,7 @@ def test_cancel_reservation_permission_denied(client, mock_db):
     assert response.status_code == 403
 
 
-def test_update_facility_price_admin(client, mock_db):
+def test_update_facility_price_admin(client, mock_db, facilities):
     """10. Verificar que Admin puede cambiar precios"""
     # Usar la función importada como clave para el override
     app.dependency_overrides[get_current_admin] = lambda: User(id=1, role="admin")
@@ -192,4 +201,1076 @@ def test_update_facility_price_admin(client, mock_db):
     response = client.put("/api/v1/reservations/facilities/1?price=25.0&capacity=30")
 
     assert response.status_code == 200
-    assert mock_facility.price == 25.0
\ No newline at end of file
+    assert mock_facility.price == 25.0
+
+# --- TESTS DE ARRANQUE ---
+
+def test_startup_not_blocked_by_slow_dependency(monkeypatch):
+    """11. Una dependencia no crítica lenta no retrasa el arranque y /health/ready la reporta"""
+    import time
+    from src.core import readiness
+
+    def slow_minio():
+        time.sleep(2)
+
+    monkeypatch.setitem(readiness.dependencies, "database", readiness.Dependency("database", lambda: None, critical=True))
+    monkeypatch.setitem(readiness.dependencies, "firebase", readiness.Dependency("firebase", lambda: None))
+    monkeypatch.setitem(readiness.dependencies, "minio", readiness.Dependency("minio", slow_minio, timeout=0.2))
+
+    started = time.monotonic()
+    with TestClient(app) as startup_client:
+        elapsed = time.monotonic() - started
+        response = startup_client.get("/health/ready")
+
+    assert elapsed < 1.0
+    assert response.status_code == 200
+    body = response.json()
+    assert body["dependencies"]["database"]["state"] == "ready"
+    assert body["dependencies"]["minio"]["state"] != "ready"
+
+
+def test_health_ready_unavailable_when_critical_fails(client, monkeypatch):
+    """12. /health/ready devuelve 503 si una dependencia crítica no está lista"""
+    from src.core import readiness
+
+    def broken_db():
+        raise RuntimeError("sin conexión")
+
+    dependency = readiness.Dependency("database", broken_db, critical=True)
+    dependency.ensure()
+    monkeypatch.setitem(readiness.dependencies, "database", dependency)
+
+    response = client.get("/health/ready")
+
+    assert response.status_code == 503
+    assert response.json()["dependencies"]["database"]["error"] == "sin conexión"
+
+
+def test_init_db_single_insert_without_rehash(monkeypatch):
+    """13. La siembra usa un único INSERT de instalaciones y no recalcula el hash del admin"""
+    from src.scripts import init_db as init_module
+
+    monkeypatch.setattr(init_module, "alembic_at_head", lambda connection: True)
+    hash_mock = MagicMock()
+    monkeypatch.setattr(init_module, "get_password_hash", hash_mock)
+
+    db = MagicMock()
+    db.execute.return_value.scalar.return_value = True  # advisory lock obtenido
+    db.execute.return_value.first.return_value = (1,)  # el admin ya existe
+
+    init_module.init_db(db)
+
+    statements = [str(call.args[0]) for call in db.execute.call_args_list]
+    facility_inserts = [s for s in statements if s.startswith("INSERT INTO facilities")]
+    assert len(facility_inserts) == 1
+    assert "ON CONFLICT" in facility_inserts[0]
+    hash_mock.assert_not_called()
+    db.commit.assert_called_once()
+
+
+# --- TESTS DE MÉTRICAS ---
+
+def test_metrics_use_route_template(client, mock_db):
+    """14. /metrics expone la latencia agrupada por plantilla de ruta, no por URL concreta"""
+    app.dependency_overrides[get_current_user] = lambda: User(id=1, role="user")
+    mock_db.query.return_value.filter.return_value.first.return_value = MagicMock(id=7, user_id=999)
+
+    client.delete("/api/v1/reservations/7")
+    response = client.get("/metrics")
+
+    assert response.status_code == 200
+    assert response.headers["content-type"].startswith("text/plain")
+    body = response.text
+    assert 'route="/api/v1/reservations/{reservation_id}"' in body
+    assert 'status="403"' in body
+    assert "/api/v1/reservations/7" not in body
+    assert "http_requests_in_flight" in body
+    assert "threadpool_threads_in_use" in body
+
+
+# --- TESTS DE CONSULTAS SQL ---
+
+def test_my_reservations_single_query(client, sqlite_db):
+    """15. Listar mis reservas es una sola consulta, sin N+1 al serializar"""
+    from src.db.instrumentation import query_count
+    from src.models.reservation_model import Reservation
+
+    user = User(email="vecino@test.com", hashed_password="x", is_active=True)
+    sqlite_db.add(user)
+    sqlite_db.commit()
+    start = datetime(2026, 1, 20, 10, 0, tzinfo=timezone.utc)
+    sqlite_db.add_all([
+        Reservation(user_id=user.id, facility="Gimnasio", start_time=start + timedelta(days=i),
+                    end_time=start + timedelta(days=i, hours=1))
+        for i in range(5)
+    ])
+    sqlite_db.commit()
+    sqlite_db.refresh(user)
+    app.dependency_overrides[get_current_user] = lambda: user
+
+    response = client.get("/api/v1/reservations/me")
+
+    assert response.status_code == 200
+    assert len(response.json()) == 5
+    assert query_count(response) <= 1
+
+
+def test_assert_max_queries_helper(sqlite_db):
+    """16. El helper de tests detecta cuándo se supera el número de consultas"""
+    from src.db.instrumentation import assert_max_queries
+
+    with assert_max_queries(1) as stats:
+        sqlite_db.query(User).all()
+    assert stats.count == 1
+
+    with pytest.raises(AssertionError):
+        with assert_max_queries(1):
+            sqlite_db.query(User).all()
+            sqlite_db.query(User).count()
+
+
+# --- TESTS DE LOGGING ---
+
+def test_queue_logging_does_not_block_on_slow_sink():
+    """17. Con QueueHandler el hilo de la petición no espera a un destino de logs lento"""
+    from benchmarks.logging_overhead import SlowSink, build_logger, simulate_requests
+    from logging import StreamHandler
+    from logging.handlers import QueueHandler, QueueListener
+    from queue import SimpleQueue
+
+    log_queue = SimpleQueue()
+    listener = QueueListener(log_queue, StreamHandler(SlowSink(0.01)))
+    listener.start()
+    try:
+        per_request_us = simulate_requests(build_logger("test.queue", QueueHandler(log_queue)), 20)
+    finally:
+        listener.stop()
+
+    # Cada petición emite 2 líneas INFO: síncrono serían >= 20 ms por petición
+    assert per_request_us < 5000
+
+
+def test_request_id_is_propagated(client):
+    """18. La cabecera X-Request-ID se respeta y se devuelve en la respuesta"""
+    response = client.get("/", headers={"X-Request-ID": "abc123"})
+
+    assert response.headers["x-request-id"] == "abc123"
+    assert len(client.get("/").headers["x-request-id"]) == 32
+
+
+# --- TESTS DE PROFILING ---
+
+def test_profiling_header_requires_admin(client, mock_db, monkeypatch):
+    """19. La cabecera X-Profile de un no-admin se rechaza"""
+    from src.core import profiling
+    monkeypatch.setattr(profiling, "authorize_admin", lambda authorization: False)
+
+    response = client.get("/", headers={"X-Profile": "1", "Authorization": "Bearer x"})
+
+    assert response.status_code == 403
+
+
+def test_profiling_stores_profile_for_admin(client, mock_db, monkeypatch):
+    """20. Un admin obtiene el id del perfil y puede descargarlo después"""
+    from src.core import profiling
+    monkeypatch.setattr(profiling, "authorize_admin", lambda authorization: True)
+    app.dependency_overrides[get_current_admin] = lambda: User(id=1, role="admin")
+
+    assert "x-profile-id" not in client.get("/").headers
+    response = client.get("/", headers={"X-Profile": "1", "Authorization": "Bearer admin"})
+
+    assert response.status_code == 200
+    assert response.json() == {"message": "La app esta corriendo... OK"}
+    profile_id = response.headers["x-profile-id"]
+
+    listed = client.get("/api/v1/admin/profiles/").json()
+    assert listed[0]["id"] == int(profile_id)
+    assert listed[0]["path"] == "/"
+
+    download = client.get(f"/api/v1/admin/profiles/{profile_id}")
+    assert download.status_code == 200
+    assert "attachment" in download.headers["content-disposition"]
+
+
+# --- TESTS DE SERIALIZACIÓN RÁPIDA ---
+
+def test_fast_reservations_match_standard_response(client, sqlite_db):
+    """21. ?fast=true devuelve exactamente el mismo JSON que la ruta con Pydantic"""
+    from src.models.reservation_model import Reservation
+
+    user = User(email="rapido@test.com", hashed_password="x", is_active=True, role="admin")
+    sqlite_db.add(user)
+    sqlite_db.commit()
+    start = datetime(2026, 1, 20, 10, 0)
+    sqlite_db.add_all([
+        Reservation(user_id=user.id, facility="Sauna", start_time=start + timedelta(hours=i),
+                    end_time=start + timedelta(hours=i + 1))
+        for i in range(3)
+    ])
+    sqlite_db.commit()
+    sqlite_db.refresh(user)
+    app.dependency_overrides[get_current_user] = lambda: user
+
+    standard = client.get("/api/v1/reservations/")
+    fast = client.get("/api/v1/reservations/?fast=true")
+
+    assert fast.status_code == 200
+    assert fast.json() == standard.json()
+    assert len(fast.json()) == 3
+
+
+# --- TESTS DE COMPRESIÓN Y ETAGS ---
+
+def _compression_app():
+    from starlette.applications import Starlette
+    from starlette.responses import PlainTextResponse, StreamingResponse
+    from starlette.routing import Route
+    from src.core.compression import CompressionMiddleware
+
+    def big(request):
+        return PlainTextResponse("reserva " * 1000)
+
+    def small(request):
+        return PlainTextResponse("ok")
+
+    def stream(request):
+        return StreamingResponse(iter([b"a" * 2000, b"b" * 2000]), media_type="text/plain")
+
+    routes = [Route("/big", big), Route("/small", small), Route("/stream", stream)]
+    return CompressionMiddleware(Starlette(routes=routes), minimum_size=1024)
+
+
+def test_compression_large_and_streaming_responses():
+    """22. Se comprimen las respuestas grandes y en streaming, no las pequeñas"""
+    compression_client = TestClient(_compression_app())
+
+    big = compression_client.get("/big", headers={"Accept-Encoding": "gzip"})
+    small = compression_client.get("/small", headers={"Accept-Encoding": "gzip"})
+    stream = compression_client.get("/stream", headers={"Accept-Encoding": "gzip"})
+
+    assert big.headers["content-encoding"] == "gzip"
+    assert int(big.headers["content-length"]) < 1000
+    assert big.text == "reserva " * 1000
+    assert "content-encoding" not in small.headers
+    assert stream.headers["content-encoding"] == "gzip"
+    assert stream.text == "a" * 2000 + "b" * 2000
+
+    # Las codificaciones con q=0 están rechazadas, no aceptadas
+    refused_br = compression_client.get("/big", headers={"Accept-Encoding": "br;q=0, gzip"})
+    refused_gzip = compression_client.get("/big", headers={"Accept-Encoding": "gzip;q=0"})
+    refused_all = compression_client.get("/big", headers={"Accept-Encoding": "identity, *;q=0"})
+    assert refused_br.headers["content-encoding"] == "gzip"
+    assert "content-encoding" not in refused_gzip.headers
+    assert "content-encoding" not in refused_all.headers
+
+
+def test_reservations_not_modified_with_matching_etag(client, mock_db, monkeypatch):
+    """23. Con If-None-Match igual a la versión actual se devuelve 304 sin consultar la lista"""
+    from src.routers import reservations as reservations_router
+    monkeypatch.setattr(reservations_router, "table_etag", lambda db, table, *scope: 'W/"reservations-5-all"')
+    app.dependency_overrides[get_current_user] = lambda: User(id=1, role="admin")
+
+    response = client.get("/api/v1/reservations/", headers={"If-None-Match": 'W/"reservations-5-all"'})
+
+    assert response.status_code == 304
+    assert response.headers["etag"] == 'W/"reservations-5-all"'
+    mock_db.query.assert_not_called()
+
+
+# --- TESTS DE BÚSQUEDA DE USUARIOS ---
+
+def test_search_users_keyset_pagination(client, sqlite_db):
+    """24. El buscador filtra por nombre/email/apartamento, pagina por keyset y no expone el hash"""
+    sqlite_db.add_all([
+        User(email="ana@test.com", full_name="Ana López", apartment="1A", hashed_password="h"),
+        User(email="juan@test.com", full_name="Juan Pérez", apartment="2B", hashed_password="h"),
+        User(email="mariana@test.com", full_name="Mariana Ruiz", apartment="3C", hashed_password="h"),
+        User(email="otro@test.com", full_name="Pedro Ana", apartment="4D", hashed_password="h"),
+    ])
+    sqlite_db.commit()
+    app.dependency_overrides[get_current_admin] = lambda: User(id=99, role="admin")
+
+    first = client.get("/api/v1/users/search?q=ana&limit=2").json()
+    second = client.get(f"/api/v1/users/search?q=ana&limit=2&cursor={first['next_cursor']}").json()
+
+    assert [u["email"] for u in first["items"]] == ["ana@test.com", "mariana@test.com"]
+    assert [u["email"] for u in second["items"]] == ["otro@test.com"]
+    assert second["next_cursor"] is None
+    assert "hashed_password" not in first["items"][0]
+    assert client.get("/api/v1/users/search?q=2b").json()["items"][0]["email"] == "juan@test.com"
+
+
+# --- TESTS DE BORRADO DE CUENTA ---
+
+def test_delete_account_single_statement_db_cascade(client, sqlite_db, monkeypatch):
+    """25. Borrar la cuenta es un único DELETE (más la revocación de sus tokens y la lectura de sus reservas futuras): las reservas caen por el ON DELETE CASCADE"""
+    from src.db.instrumentation import query_count
+    from src.models.reservation_model import Reservation
+    from src.routers import users as users_router
+
+    user = User(email="baja@test.com", hashed_password="x", avatar_url="http://minio/avatars/a.png")
+    sqlite_db.add(user)
+    sqlite_db.commit()
+    start = datetime(2026, 2, 1, 10, 0, tzinfo=timezone.utc)
+    sqlite_db.add_all([
+        Reservation(user_id=user.id, facility="Sauna", start_time=start + timedelta(days=i),
+                    end_time=start + timedelta(days=i, hours=1))
+        for i in range(3)
+    ])
+    sqlite_db.commit()
+    sqlite_db.refresh(user)
+    app.dependency_overrides[get_current_user] = lambda: user
+    deleted_files = []
+    monkeypatch.setattr(users_router, "delete_file", deleted_files.append)
+
+    response = client.delete("/api/v1/users/me")
+
+    assert response.status_code == 204
+    assert query_count(response) == 3  # Ninguna reserva futura: nada que promocionar
+    assert sqlite_db.query(Reservation).count() == 0
+    assert deleted_files == ["http://minio/avatars/a.png"]
+
+
+def test_delete_account_promotes_waitlist_for_freed_slots(client, sqlite_db, monkeypatch):
+    """43. Las plazas futuras que libera una baja pasan a la lista de espera y se avisa a los streams"""
+    import asyncio
+    from src.models.facility_model import Facility
+    from src.models.reservation_model import Reservation
+    from src.models.waitlist_model import WaitlistEntry
+    from src.routers import users as users_router
+    from src.services.facility_registry import FacilityRegistry
+    from src.services.occupancy import occupancy_bus
+
+    leaving = User(email="semarcha@test.com", hashed_password="x", is_active=True)
+    waiting = User(email="espera@test.com", hashed_password="x", is_active=True)
+    sqlite_db.add_all([leaving, waiting, Facility(name="Sauna", price=10.0, capacity=1)])
+    sqlite_db.commit()
+    start = datetime(2031, 5, 5, 18, 0, tzinfo=timezone.utc)
+    end = start + timedelta(hours=1)
+    sqlite_db.add_all([
+        Reservation(user_id=leaving.id, facility="Sauna", start_time=start, end_time=end),
+        WaitlistEntry(user_id=waiting.id, facility="Sauna", start_time=start, end_time=end),
+    ])
+    sqlite_db.commit()
+    leaving_id, waiting_id = leaving.id, waiting.id
+    monkeypatch.setattr(users_router, "facility_registry", FacilityRegistry(ttl=60))
+    sent = []
+    monkeypatch.setattr(users_router, "send_waitlist_promotion_email", lambda email, *_: sent.append(email))
+    app.dependency_overrides[get_current_user] = lambda: User(id=leaving_id, role="user")
+
+    async def scenario():
+        subscriber = occupancy_bus.subscribe("Sauna", "2031-05-05")
+        try:
+            response = await asyncio.to_thread(client.delete, "/api/v1/users/me")
+            message = await asyncio.wait_for(subscriber.queue.get(), timeout=2)
+        finally:
+            occupancy_bus.unsubscribe(subscriber)
+        return response, message
+
+    response, message = asyncio.run(scenario())
+
+    assert response.status_code == 204
+    assert message.startswith(b"event: slot") and b'"count": 1' in message
+    assert [r.user_id for r in sqlite_db.query(Reservation).filter(Reservation.facility == "Sauna")] == [waiting_id]
+    assert sqlite_db.query(WaitlistEntry.status).scalar() == "promoted"
+    assert sent == ["espera@test.com"]
+
+
+# --- TESTS DE IMPORTACIÓN MASIVA ---
+
+def test_import_users_csv_reports_per_row(client, sqlite_db, monkeypatch):
+    """26. La importación CSV crea en un solo INSERT, omite emails existentes e informa errores por fila"""
+    from src.db.instrumentation import query_count
+    from src.routers import users as users_router
+
+    sqlite_db.add(User(email="existe@test.com", hashed_password="h"))
+    sqlite_db.commit()
+    app.dependency_overrides[get_current_admin] = lambda: User(id=99, role="admin")
+    sent = []
+    monkeypatch.setattr(users_router, "send_verification_emails", lambda invitations, _: sent.extend(invitations))
+
+    csv_content = (
+        "email,password,full_name,apartment\n"
+        "nuevo@test.com,Segura123,Nuevo Vecino,1A\n"
+        "existe@test.com,Segura123,Ya Registrado,2B\n"
+        "malo@test.com,corta,Sin Mayúsculas,3C\n"
+        "NUEVO@test.com,Segura123,Repetido,1A\n"
+    )
+    response = client.post(
+        "/api/v1/users/import",
+        files={"file": ("vecinos.csv", csv_content.encode(), "text/csv")},
+    )
+
+    assert response.status_code == 200
+    report = response.json()
+    assert report["created"] == 1
+    assert report["skipped"] == ["existe@test.com"]
+    assert [(e["row"], e["email"]) for e in report["errors"]] == [(4, "malo@test.com"), (5, "NUEVO@test.com")]
+    assert query_count(response) == 1
+    assert [email for email, _ in sent] == ["nuevo@test.com"]
+    created = sqlite_db.query(User).filter(User.email == "nuevo@test.com").one()
+    assert created.is_active is False and created.verification_code == sent[0][1]
+
+
+# --- TESTS DEL REGISTRO DE INSTALACIONES ---
+
+def test_facilities_served_from_registry_with_etag(client, sqlite_db, monkeypatch):
+    """27. /facilities sale del registro en memoria (ETag, 304 sin SQL) y update_facility lo refresca"""
+    from src.db.instrumentation import query_count
+    from src.models.facility_model import Facility
+    from src.routers import reservations as reservations_router
+    from src.services.facility_registry import FacilityRegistry
+
+    sqlite_db.add_all([
+        Facility(name="Piscina", price=8.0, capacity=20),
+        Facility(name="Sauna", price=10.0, capacity=10),
+    ])
+    sqlite_db.commit()
+    monkeypatch.setattr(reservations_router, "facility_registry", FacilityRegistry(ttl=60))
+    app.dependency_overrides[get_current_admin] = lambda: User(id=99, role="admin")
+
+    first = client.get("/api/v1/reservations/facilities")
+    etag = first.headers["etag"]
+    cached = client.get("/api/v1/reservations/facilities", headers={"If-None-Match": etag})
+    client.put("/api/v1/reservations/facilities/2?price=12.5&capacity=8")
+    updated = client.get("/api/v1/reservations/facilities", headers={"If-None-Match": etag})
+
+    assert [f["name"] for f in first.json()] == ["Piscina", "Sauna"]
+    assert cached.status_code == 304
+    assert query_count(cached) == 0
+    assert updated.status_code == 200
+    assert updated.headers["etag"] != etag
+    assert updated.json()[1]["price"] == 12.5 and updated.json()[1]["capacity"] == 8
+
+
+# --- TESTS DE OCUPACIÓN EN DIRECTO (SSE) ---
+
+def test_occupancy_bus_fanout_and_backpressure():
+    """28. Un evento llega a todos los suscritos del día; un cliente lento recibe `resync` y no crece su cola"""
+    import asyncio
+    from src.services.occupancy import RESYNC, OccupancyBus
+
+    async def scenario():
+        bus = OccupancyBus(max_queue=2)
+        fast = [bus.subscribe("Sauna", "2026-03-01") for _ in range(3)]
+        other_day = bus.subscribe("Sauna", "2026-03-02")
+        slow = bus.subscribe("Sauna", "2026-03-01")
+
+        stream = bus.stream(fast[0], [{"start": "x", "count": 1}], heartbeat=1)
+        snapshot = await stream.__anext__()
+        for count in (1, 2, 3):
+            bus.publish({"type": "slot", "facility": "Sauna", "day": "2026-03-01", "data": {"count": count}})
+            await asyncio.sleep(0)
+            for subscriber in fast[1:]:
+                await subscriber.queue.get()
+            if count < 3:
+                await fast[0].queue.get()
+        streamed = await stream.__anext__()
+        await stream.aclose()
+        return snapshot, streamed, other_day.queue.qsize(), slow, bus.subscriber_count()
+
+    snapshot, streamed, other_day_pending, slow, remaining = asyncio.run(scenario())
+
+    assert snapshot.startswith(b"event: snapshot")
+    assert b'"count": 3' in streamed
+    assert other_day_pending == 0
+    assert slow.queue.qsize() == 1 and slow.queue.get_nowait() == RESYNC and slow.dropped == 1
+    assert remaining == 4  # El stream cerrado se da de baja
+
+
+def test_booking_commit_publishes_slot_delta(client, sqlite_db, monkeypatch):
+    """29. Tras el commit de una reserva los suscritos reciben el nuevo recuento del tramo"""
+    import asyncio
+    from src.models.facility_model import Facility
+    from src.routers import reservations as reservations_router
+    from src.services.facility_registry import FacilityRegistry
+    from src.services.occupancy import occupancy_bus
+
+    user = User(email="socio@test.com", hashed_password="x", is_active=True)
+    sqlite_db.add_all([user, Facility(name="Piscina", price=8.0, capacity=20)])
+    sqlite_db.commit()
+    sqlite_db.refresh(user)
+    monkeypatch.setattr(reservations_router, "facility_registry", FacilityRegistry(ttl=60))
+    app.dependency_overrides[get_current_user] = lambda: user
+    payload = {"facility": "Piscina", "start_time": "2026-03-02T10:00:00Z", "end_time": "2026-03-02T11:00:00Z"}
+
+    async def scenario():
+        subscriber = occupancy_bus.subscribe("Piscina", "2026-03-02")
+        try:
+            response = await asyncio.to_thread(client.post, "/api/v1/reservations/", json=payload)
+            message = await asyncio.wait_for(subscriber.queue.get(), timeout=2)
+        finally:
+            occupancy_bus.unsubscribe(subscriber)
+        return response, message
+
+    response, message = asyncio.run(scenario())
+
+    assert response.status_code == 200
+    assert message.startswith(b"event: slot")
+    assert b'"count": 1' in message and b'"capacity": 20' in message
+
+
+def test_slot_delta_uses_utc_day_for_offset_bookings(client, sqlite_db, monkeypatch):
+    """42. Una reserva con huso (+02:00) avisa a los suscritos de su día en UTC, como /availability"""
+    import asyncio
+    from src.models.facility_model import Facility
+    from src.routers import reservations as reservations_router
+    from src.services.facility_registry import FacilityRegistry
+    from src.services.occupancy import occupancy_bus
+
+    user = User(email="madrugador@test.com", hashed_password="x", is_active=True)
+    sqlite_db.add_all([user, Facility(name="Piscina", price=8.0, capacity=20)])
+    sqlite_db.commit()
+    user_id = user.id
+    monkeypatch.setattr(reservations_router, "facility_registry", FacilityRegistry(ttl=60))
+    app.dependency_overrides[get_current_user] = lambda: User(id=user_id, role="user")
+    # 01:00 del día 3 en Madrid son las 23:00 del día 2 en UTC
+    payload = {"facility": "Piscina", "start_time": "2026-03-03T01:00:00+02:00", "end_time": "2026-03-03T02:00:00+02:00"}
+
+    async def scenario():
+        utc_day = occupancy_bus.subscribe("Piscina", "2026-03-02")
+        local_day = occupancy_bus.subscribe("Piscina", "2026-03-03")
+        try:
+            response = await asyncio.to_thread(client.post, "/api/v1/reservations/", json=payload)
+            message = await asyncio.wait_for(utc_day.queue.get(), timeout=2)
+            return response, message, local_day.queue.qsize()
+        finally:
+            occupancy_bus.unsubscribe(utc_day)
+            occupancy_bus.unsubscribe(local_day)
+
+    response, message, local_day_pending = asyncio.run(scenario())
+
+    assert response.status_code == 200
+    assert message.startswith(b"event: slot") and b'"count": 1' in message
+    assert local_day_pending == 0
+
+
+# --- TESTS DE RÉPLICAS DE LECTURA ---
+
+def test_read_replica_routing_and_primary_stickiness(monkeypatch):
+    """30. Lecturas en round-robin entre réplicas sanas; al primario si van retrasadas o tras escribir"""
+    from src.db.replicas import PrimaryStickiness, PrimaryStickinessMiddleware, ReplicaRouter
+
+    router = ReplicaRouter(["sqlite://", "sqlite://"], max_lag=5, check_interval=60, slow_query_ms=1000)
+    lags = iter([0.5, 30.0])
+    for replica in router.replicas:
+        replica.lag = next(lags)
+        replica.usable = replica.lag <= router.max_lag
+        replica.next_check = float("inf")
+    picks = [router.pick() for _ in range(4)]
+    assert picks == [router.replicas[0].session_factory] * 4
+
+    router.replicas[0].usable = False
+    assert router.pick() is None  # Ninguna sana: primario
+
+    stickiness = PrimaryStickiness(window=5)
+    assert not stickiness.is_sticky("Bearer abc", None)
+    stickiness.mark("Bearer abc")
+    assert stickiness.is_sticky("Bearer abc", None)
+    assert not stickiness.is_sticky("Bearer otro", None)
+
+    from starlette.applications import Starlette
+    from starlette.responses import PlainTextResponse
+    from starlette.routing import Route
+
+    write_app = PrimaryStickinessMiddleware(
+        Starlette(routes=[Route("/", lambda request: PlainTextResponse("ok"), methods=["GET", "POST"])]),
+        stickiness,
+    )
+    write_client = TestClient(write_app)
+    cookie = write_client.post("/", headers={"Authorization": "Bearer abc"}).cookies.get("primary_until")
+    assert cookie and stickiness.is_sticky(None, cookie)
+    assert "set-cookie" not in write_client.get("/").headers
+    assert "set-cookie" not in write_client.post("/").headers  # Sin credencial (login, contacto...)
+    assert not stickiness.is_sticky(None, "1e20")  # Más allá de la ventana: manipulada
+
+
+# --- TESTS DE RESTRICCIÓN DE EXCLUSIÓN (AFORO 1) ---
+
+def test_exclusive_booking_maps_exclusion_violation_to_409(client, mock_db, facilities):
+    """31. Aforo 1 en Postgres: INSERT directo sin bloqueo; la violación de exclusión se traduce a 409"""
+    from sqlalchemy.exc import IntegrityError
+    from src.services.facility_registry import FacilityInfo
+
+    facilities.publish([FacilityInfo(id=3, name="Pádel court 1", price=15.0, capacity=1)])
+    app.dependency_overrides[get_current_user] = lambda: User(id=1, role="user")
+    mock_db.get_bind.return_value.dialect.name = "postgresql"
+    # El INSERT va en un savepoint: la violación llega al cerrarlo
+    mock_db.begin_nested.return_value.__exit__.side_effect = IntegrityError("INSERT", {}, MagicMock(pgcode="23P01"))
+    mock_db.query.return_value.filter.return_value.first.return_value = None  # El solape no es del usuario
+
+    payload = {"facility": "Pádel court 1", "start_time": "2026-01-20T10:00:00", "end_time": "2026-01-20T11:00:00"}
+    response = client.post("/api/v1/reservations/", json=payload)
+
+    assert response.status_code == 409
+    assert response.json()["detail"] == "Aforo completo (1/1 plazas ocupadas)."
+    mock_db.query.return_value.filter.return_value.with_for_update.assert_not_called()
+    assert mock_db.add.call_args.args[0].is_exclusive is True
+    # Solo se deshace el savepoint, no la transacción de la petición (p. ej. la clave de idempotencia)
+    mock_db.rollback.assert_not_called()
+
+
+# --- TESTS DEL ACTOR DE RESERVAS ---
+
+def test_booking_actor_decides_in_order_and_batches_inserts(sqlite_db):
+    """32. Modo actor: las peticiones simultáneas se deciden en orden en memoria y se guardan en un lote"""
+    import asyncio
+    from datetime import datetime
+    from sqlalchemy.orm import sessionmaker
+    from fastapi import HTTPException
+    from src.models.facility_model import Facility
+    from src.models.reservation_model import Reservation
+    from src.services.booking_actor import BookingActors
+    from src.services.facility_registry import FacilityInfo
+
+    facility = Facility(name="Sauna", price=10.0, capacity=2)
+    users = [User(email=f"actor{i}@example.com", hashed_password="x") for i in range(3)]
+    sqlite_db.add_all([facility, *users])
+    sqlite_db.commit()
+    conf = FacilityInfo(id=facility.id, name="Sauna", price=10.0, capacity=2)
+    u1, u2, u3 = (user.id for user in users)
+
+    actors = BookingActors(sessionmaker(autocommit=False, autoflush=False, bind=sqlite_db.get_bind()), max_batch=64)
+    start, end = datetime(2030, 1, 7, 9, 0), datetime(2030, 1, 7, 10, 0)
+
+    async def scenario():
+        try:
+            return await asyncio.gather(
+                *(actors.submit(conf, user_id, start, end) for user_id in (u1, u2, u1, u3)),
+                return_exceptions=True,
+            )
+        finally:
+            await actors.stop()
+
+    first, second, duplicate, overflow = asyncio.run(scenario())
+
+    assert isinstance(first, Reservation) and isinstance(second, Reservation)
+    assert first.price == 12.1 and first.id is not None
+    assert isinstance(duplicate, HTTPException) and duplicate.status_code == 400
+    assert isinstance(overflow, HTTPException) and overflow.status_code == 409
+    assert overflow.detail == "Aforo completo (2/2 plazas ocupadas)."
+    assert sqlite_db.query(Reservation).filter(Reservation.facility == "Sauna").count() == 2
+
+
+# --- TESTS DE RESERVAS MÚLTIPLES ---
+
+def test_recurring_booking_single_transaction_per_window_status(client, sqlite_db, monkeypatch):
+    """33. Repetición de lunes a viernes: un bloqueo, una consulta de ocupación, un INSERT y estado por tramo"""
+    from datetime import datetime, timezone
+    from src.db.instrumentation import query_count
+    from src.models.facility_model import Facility
+    from src.models.reservation_model import Reservation
+    from src.routers import reservations as reservations_router
+    from src.services.facility_registry import FacilityRegistry
+
+    resident = User(email="vecina@test.com", hashed_password="x", is_active=True)
+    neighbour = User(email="vecino@test.com", hashed_password="x", is_active=True)
+    sqlite_db.add_all([resident, neighbour, Facility(name="Sala de pesas", price=5.0, capacity=1)])
+    sqlite_db.commit()
+
+    def slot(day):
+        return datetime(2030, 1, day, 9, 0, tzinfo=timezone.utc), datetime(2030, 1, day, 10, 0, tzinfo=timezone.utc)
+
+    sqlite_db.add_all([
+        Reservation(facility="Sala de pesas", user_id=neighbour.id, price=6.05, start_time=slot(8)[0], end_time=slot(8)[1]),
+        Reservation(facility="Sala de pesas", user_id=resident.id, price=6.05, start_time=slot(10)[0], end_time=slot(10)[1]),
+    ])
+    sqlite_db.commit()
+    sqlite_db.refresh(resident)
+    registry = FacilityRegistry(ttl=60)
+    registry.load(sqlite_db)
+    monkeypatch.setattr(reservations_router, "facility_registry", registry)
+    app.dependency_overrides[get_current_user] = lambda: resident
+
+    payload = {
+        "facility": "Sala de pesas",
+        "recurrence": {
+            "start_time": "2030-01-07T09:00:00Z", "end_time": "2030-01-07T10:00:00Z",
+            "freq": "daily", "weekdays": [0, 1, 2, 3, 4], "until": "2030-01-13",
+        },
+    }
+    response = client.post("/api/v1/reservations/batch", json=payload)
+
+    assert response.status_code == 200
+    body = response.json()
+    assert [item["status"] for item in body["results"]] == ["created", "full", "created", "duplicate", "created"]
+    assert body["created"] == 3 and all(item["reservation_id"] for item in body["results"][::2])
+    assert body["results"][1]["detail"] == "Aforo completo (1/1 plazas ocupadas)."
+    # Bloqueo + ocupación de todos los tramos + INSERT (multi-fila en Postgres; SQLite inserta fila a fila) + recuento SSE
+    assert query_count(response) == 1 + 1 + 3 + 1
+    assert sqlite_db.query(Reservation).filter(Reservation.user_id == resident.id).count() == 4
+
+    both = {"facility": "Sala de pesas", "windows": [], "recurrence": payload["recurrence"]}
+    assert client.post("/api/v1/reservations/batch", json=both).status_code == 400
+
+
+def test_recurrence_without_matching_days_is_rejected_quickly(client, mock_db):
+    """40. Repeticiones sin ningún día que encaje o sin fin: 400/422 al momento, nunca un bucle hasta el overflow"""
+    import time
+    from datetime import date
+    from src.schemas.reservation_schema import ReservationRecurrence
+    from src.services.booking import expand_recurrence
+
+    app.dependency_overrides[get_current_user] = lambda: User(id=1, role="user")
+    monday = {"start_time": "2026-01-05T10:00:00", "end_time": "2026-01-05T11:00:00"}
+
+    def batch(**rule):
+        return client.post("/api/v1/reservations/batch", json={"facility": "Gym", "recurrence": {**monday, **rule}})
+
+    started = time.perf_counter()
+    weekly_on_wednesday = batch(freq="weekly", weekdays=[2], count=3)
+    assert weekly_on_wednesday.status_code == 400
+    assert "semanal" in weekly_on_wednesday.json()["detail"]
+    assert batch(freq="daily", weekdays=[9], count=3).status_code == 422
+    assert batch(freq="daily", until="9999-12-31").status_code == 400  # Más tramos de los permitidos
+    assert time.perf_counter() - started < 1
+    mock_db.query.assert_not_called()
+
+    # La expansión nunca pasa de un año desde el primer tramo
+    rule = ReservationRecurrence(**monday, freq="weekly", until=date(2100, 1, 1))
+    windows = expand_recurrence(rule)
+    assert len(windows) == 53
+    assert windows[-1][0] - windows[0][0] <= timedelta(days=366)
+
+
+def test_exclusive_batch_race_only_fails_losing_window(sqlite_db, monkeypatch):
+    """41. Aforo 1: si una reserva individual gana un tramo a mitad del lote, solo ese tramo queda como completo"""
+    from sqlalchemy import text
+    from src.models.facility_model import Facility
+    from src.models.reservation_model import Reservation
+    from src.services import booking
+    from src.services.facility_registry import FacilityInfo
+
+    resident = User(email="pista@test.com", hashed_password="x", is_active=True)
+    sqlite_db.add_all([resident, Facility(id=7, name="Pista", price=10.0, capacity=1)])
+    sqlite_db.commit()
+    # La restricción de exclusión de Postgres, simulada: el INSERT del día 8 choca con una reserva ajena
+    sqlite_db.execute(text(
+        "CREATE TRIGGER exclusion_race BEFORE INSERT ON reservations "
+        "WHEN NEW.start_time LIKE '2030-01-08%' BEGIN SELECT RAISE(ABORT, 'exclusion'); END"
+    ))
+    monkeypatch.setattr(booking, "uses_exclusion", lambda db, conf: True)
+    monkeypatch.setattr(booking, "EXCLUSION_VIOLATION", None)  # SQLite no da pgcode
+
+    windows = [(datetime(2030, 1, day, 9, tzinfo=timezone.utc), datetime(2030, 1, day, 10, tzinfo=timezone.utc))
+               for day in (7, 8, 9)]
+    outcomes = booking.book_many(sqlite_db, resident.id, FacilityInfo(id=7, name="Pista", price=10.0, capacity=1),
+                                 windows)
+    sqlite_db.commit()
+
+    assert [state for state, _, _ in outcomes] == ["created", "full", "created"]
+    assert outcomes[1][1] == "Aforo completo (1/1 plazas ocupadas)."
+    assert sqlite_db.query(Reservation).count() == 2
+
+
+# --- TESTS DE LISTA DE ESPERA ---
+
+def test_cancel_promotes_first_waitlisted_resident(client, sqlite_db, monkeypatch):
+    """34. Al cancelar, la plaza pasa al primero en espera en la misma transacción y se le avisa por email"""
+    from src.models.facility_model import Facility
+    from src.models.reservation_model import Reservation
+    from src.models.waitlist_model import WaitlistEntry
+    from src.routers import reservations as reservations_router
+    from src.services.facility_registry import FacilityRegistry
+
+    holder, first, second = (User(email=f"espera{i}@test.com", hashed_password="x", is_active=True) for i in range(3))
+    sqlite_db.add_all([holder, first, second, Facility(name="Pista de tenis", price=12.0, capacity=1)])
+    sqlite_db.commit()
+    for user in (holder, first, second):
+        sqlite_db.refresh(user)
+    monkeypatch.setattr(reservations_router, "facility_registry", FacilityRegistry(ttl=60))
+    sent = []
+    monkeypatch.setattr(reservations_router, "send_waitlist_promotion_email",
+                        lambda email, facility, start: sent.append((email, facility)))
+    payload = {"facility": "Pista de tenis", "start_time": "2030-05-06T18:00:00Z", "end_time": "2030-05-06T19:00:00Z"}
+
+    def as_user(user):
+        app.dependency_overrides[get_current_user] = lambda: user
+
+    as_user(first)
+    assert client.post("/api/v1/reservations/waitlist", json=payload).status_code == 400  # Aún hay plaza
+    as_user(holder)
+    booked = client.post("/api/v1/reservations/", json=payload).json()
+    as_user(first)
+    assert client.post("/api/v1/reservations/", json=payload).status_code == 409
+    assert client.post("/api/v1/reservations/waitlist", json=payload).status_code == 201
+    assert client.post("/api/v1/reservations/waitlist", json=payload).status_code == 400  # Ya en la cola
+    as_user(second)
+    assert client.post("/api/v1/reservations/waitlist", json=payload).status_code == 201
+
+    as_user(holder)
+    assert client.delete(f"/api/v1/reservations/{booked['id']}").status_code == 204
+
+    owners = [r.user_id for r in sqlite_db.query(Reservation).filter(Reservation.facility == "Pista de tenis")]
+    assert owners == [first.id]
+    statuses = dict(sqlite_db.query(WaitlistEntry.user_id, WaitlistEntry.status))
+    assert statuses == {first.id: "promoted", second.id: "waiting"}
+    assert sent == [(first.email, "Pista de tenis")]
+
+    as_user(first)
+    mine = client.get("/api/v1/reservations/waitlist/me").json()
+    assert [(entry["status"], entry["reservation_id"] is not None) for entry in mine] == [("promoted", True)]
+
+
+# --- TESTS DE IDEMPOTENCIA ---
+
+def test_idempotency_key_replays_stored_response(client, sqlite_db, monkeypatch):
+    """35. Reenvíos con la misma Idempotency-Key: misma respuesta, sin bloqueo ni segunda reserva"""
+    from datetime import datetime, timedelta, timezone
+    from sqlalchemy.orm import sessionmaker
+    from src.db.instrumentation import query_count
+    from src.models.facility_model import Facility
+    from src.models.idempotency_model import IdempotencyKey
+    from src.models.reservation_model import Reservation
+    from src.routers import reservations as reservations_router
+    from src.services import idempotency
+    from src.services.facility_registry import FacilityRegistry
+
+    resident, neighbour = (User(email=f"movil{i}@test.com", hashed_password="x", is_active=True) for i in range(2))
+    sqlite_db.add_all([resident, neighbour, Facility(name="Pádel court 3", price=15.0, capacity=1)])
+    sqlite_db.commit()
+    sqlite_db.refresh(resident)
+    sqlite_db.refresh(neighbour)
+    monkeypatch.setattr(reservations_router, "facility_registry", FacilityRegistry(ttl=60))
+    payload = {"facility": "Pádel court 3", "start_time": "2030-02-04T19:00:00Z", "end_time": "2030-02-04T20:00:00Z"}
+
+    # Usuarios sueltos: los de la sesión compartida caducan con cada commit y se recargarían
+    resident_id, neighbour_id = resident.id, neighbour.id
+    app.dependency_overrides[get_current_user] = lambda: User(id=resident_id, role="user")
+    first = client.post("/api/v1/reservations/", json=payload, headers={"Idempotency-Key": "k-1"})
+    again = client.post("/api/v1/reservations/", json=payload, headers={"Idempotency-Key": "k-1"})
+    assert first.status_code == again.status_code == 200
+    assert again.json() == first.json() and again.headers["Idempotent-Replayed"] == "true"
+    assert query_count(again) == 1  # Solo la lectura de la clave
+    other = dict(payload, start_time="2030-02-04T21:00:00Z", end_time="2030-02-04T22:00:00Z")
+    assert client.post("/api/v1/reservations/", json=other, headers={"Idempotency-Key": "k-1"}).status_code == 422
+
+    app.dependency_overrides[get_current_user] = lambda: User(id=neighbour_id, role="user")
+    rejected = client.post("/api/v1/reservations/", json=payload, headers={"Idempotency-Key": "k-1"})
+    replayed = client.post("/api/v1/reservations/", json=payload, headers={"Idempotency-Key": "k-1"})
+    assert rejected.status_code == replayed.status_code == 409
+    assert replayed.json() == rejected.json() and replayed.headers["Idempotent-Replayed"] == "true"
+    # El error queda en la misma reclamación (solo se deshizo el savepoint de la reserva)
+    assert sqlite_db.query(IdempotencyKey.status_code).filter(IdempotencyKey.user_id == neighbour_id).scalar() == 409
+    assert sqlite_db.query(Reservation).filter(Reservation.facility == "Pádel court 3").count() == 1
+
+    sqlite_db.query(IdempotencyKey).filter(IdempotencyKey.user_id == resident_id)\
+        .update({IdempotencyKey.expires_at: datetime.now(timezone.utc) - timedelta(minutes=1)})
+    sqlite_db.commit()
+    monkeypatch.setattr(idempotency, "SessionLocal", sessionmaker(bind=sqlite_db.get_bind()))
+    assert idempotency.sweep_expired() == 1
+    assert sqlite_db.query(IdempotencyKey).count() == 1
+
+
+# --- TESTS DEL REPOSITORIO DE RESERVAS ---
+
+def test_memory_repository_matches_sql_repository(sqlite_db):
+    """36. Misma secuencia aleatoria de reservas y cancelaciones: mismos resultados en memoria y en SQL"""
+    import random
+    from datetime import date, datetime, timedelta, timezone
+    from fastapi import HTTPException
+    from src.models.facility_model import Facility
+    from src.models.reservation_model import Reservation
+    from src.services.facility_registry import FacilityInfo
+    from src.services.reservation_repository import MemoryReservationRepository, SqlReservationRepository
+
+    users = [User(email=f"sim{i}@test.com", hashed_password="x") for i in range(8)]
+    padel, pool = Facility(name="Pádel", price=15.0, capacity=1), Facility(name="Piscina", price=8.0, capacity=3)
+    sqlite_db.add_all([*users, padel, pool])
+    sqlite_db.commit()
+    confs = [FacilityInfo(id=f.id, name=f.name, price=f.price, capacity=f.capacity) for f in (padel, pool)]
+    user_ids = [user.id for user in users]
+    day = date(2030, 1, 7)
+
+    for seed in range(5):
+        rng = random.Random(seed)
+        sql, memory = SqlReservationRepository(sqlite_db), MemoryReservationRepository()
+        sqlite_db.query(Reservation).delete()
+        booked = []  # (id en SQL, id en memoria)
+
+        for _ in range(150):
+            if booked and rng.random() < 0.25:
+                sql_id, memory_id = booked.pop(rng.randrange(len(booked)))
+                sql.cancel(sql.get(sql_id))
+                sqlite_db.commit()
+                memory.cancel(memory.get(memory_id))
+                continue
+            conf, user_id = rng.choice(confs), rng.choice(user_ids)
+            start = datetime(2030, 1, 7, 9, tzinfo=timezone.utc) + timedelta(hours=rng.randrange(6))
+            end = start + timedelta(hours=rng.choice((1, 1, 2)))
+            outcomes = []
+            for repository in (sql, memory):
+                try:
+                    outcomes.append(repository.book(user_id, conf, start, end))
+                except HTTPException as e:
+                    outcomes.append(e.status_code)
+            if isinstance(outcomes[0], Reservation):
+                sqlite_db.commit()
+                assert isinstance(outcomes[1], Reservation)
+                booked.append((outcomes[0].id, outcomes[1].id))
+            else:
+                sqlite_db.rollback()
+                assert outcomes[0] == outcomes[1]
+
+        for conf in confs:
+            def slots(repository):
+                return sorted((slot["start"][:16], slot["count"]) for slot in repository.day_slots(conf, day))
+            assert slots(sql) == slots(memory)
+        assert sql.stats() == memory.stats()
+
+
+def test_memory_repository_concurrent_residents_never_exceed_capacity():
+    """37. Simulación: miles de vecinos a la vez sobre pocos tramos; nunca se supera el aforo"""
+    import random
+    from concurrent.futures import ThreadPoolExecutor
+    from datetime import datetime, timedelta, timezone
+    from fastapi import HTTPException
+    from src.services.facility_registry import FacilityInfo
+    from src.services.reservation_repository import MemoryReservationRepository
+
+    facilities = [FacilityInfo(id=1, name="Piscina", price=8.0, capacity=20),
+                  FacilityInfo(id=2, name="Pádel court 1", price=15.0, capacity=1)]
+    slots = [datetime(2030, 1, 7, 9, tzinfo=timezone.utc) + timedelta(hours=h) for h in range(5)]
+
+    for seed in range(3):
+        rng = random.Random(seed)
+        repository = MemoryReservationRepository()
+        attempts = [(rng.randrange(3000), rng.choice(facilities), rng.choice(slots)) for _ in range(5000)]
+
+        def attempt(args):
+            user_id, conf, start = args
+            try:
+                repository.book(user_id, conf, start, start + timedelta(hours=1))
+                return True
+            except HTTPException:
+                return False
+
+        with ThreadPoolExecutor(max_workers=32) as pool:
+            accepted = sum(pool.map(attempt, attempts))
+
+        assert accepted == repository.stats()["total_reservations"]
+        booked = [repository.get(reservation_id) for reservation_id in range(1, accepted + 1)]
+        holders = {(res.facility, res.start_time, res.user_id) for res in booked}
+        assert len(holders) == accepted  # Nadie tiene dos plazas en el mismo tramo
+
+        for conf in facilities:
+            counts = {slot["start"]: slot["count"] for slot in repository.day_slots(conf, slots[0].date())}
+            for start in slots:
+                contenders = {user_id for user_id, c, s in attempts if c is conf and s == start}
+                assert counts.get(start.isoformat(), 0) == min(conf.capacity, len(contenders))
+
+
+# --- TESTS DE TOKENS DE REFRESCO Y REVOCACIÓN ---
+
+def test_refresh_rotation_and_revocation_without_user_query(client, sqlite_db, monkeypatch):
+    """38. Tokens cortos autorizados por claims (sin SELECT del usuario), refresco rotatorio y revocación"""
+    from src.core import deps
+    from src.core.security import create_access_token
+    from src.db.instrumentation import query_count
+    from src.models.token_model import RefreshToken
+    from src.services import auth_tokens
+
+    local = auth_tokens.RevocationSet()
+    monkeypatch.setattr(auth_tokens, "revocations", local)
+    monkeypatch.setattr(deps, "revocations", local)
+    sqlite_db.add(User(email="tokens@test.com", hashed_password=get_password_hash("Vecina2026"), is_active=True))
+    sqlite_db.commit()
+
+    login = client.post("/api/v1/auth/login", data={"username": "tokens@test.com", "password": "Vecina2026"})
+    assert login.status_code == 200
+    first = login.json()
+    stored = sqlite_db.query(RefreshToken).one()
+    assert stored.token_hash == auth_tokens.hash_token(first["refresh_token"])  # Solo el hash
+
+    def me(tokens):
+        return client.get("/api/v1/reservations/me", headers={"Authorization": f"Bearer {tokens['access_token']}"})
+
+    response = me(first)
+    assert response.status_code == 200
+    assert query_count(response) <= 1  # Solo el listado: el usuario sale del token
+
+    # Los tokens anteriores (solo con el email) ya no autorizan
+    old_style = create_access_token({"sub": "tokens@test.com"})
+    assert client.get("/api/v1/reservations/me", headers={"Authorization": f"Bearer {old_style}"}).status_code == 401
+
+    # Rotación: el par nuevo vale; reutilizar el de refresco anterior revoca toda la sesión
+    second = client.post("/api/v1/auth/refresh", json={"refresh_token": first["refresh_token"]}).json()
+    assert me(second).status_code == 200
+    reused = client.post("/api/v1/auth/refresh", json={"refresh_token": first["refresh_token"]})
+    assert reused.status_code == 401
+    assert me(first).status_code == 401
+    assert me(second).status_code == 401
+    assert client.post("/api/v1/auth/refresh", json={"refresh_token": second["refresh_token"]}).status_code == 401
+
+    # Logout de una sesión nueva; otro worker lo ve al sincronizar con la tabla
+    third = client.post("/api/v1/auth/login", data={"username": "tokens@test.com", "password": "Vecina2026"}).json()
+    assert me(third).status_code == 200
+    assert client.post("/api/v1/auth/logout", json={"refresh_token": third["refresh_token"]}).status_code == 204
+    assert me(third).status_code == 401
+
+    other_worker = auth_tokens.RevocationSet()
+    other_worker.sync(sqlite_db)
+    assert len(other_worker) == len(local) == 2
+
+    # logout-all invalida lo emitido antes, no los inicios de sesión posteriores
+    fourth = client.post("/api/v1/auth/login", data={"username": "tokens@test.com", "password": "Vecina2026"}).json()
+    headers = {"Authorization": f"Bearer {fourth['access_token']}"}
+    assert client.post("/api/v1/auth/logout-all", headers=headers).status_code == 204
+    assert me(fourth).status_code == 401
+    fifth = client.post("/api/v1/auth/login", data={"username": "tokens@test.com", "password": "Vecina2026"}).json()
+    assert me(fifth).status_code == 200
+
+
+# --- TESTS DE RATE LIMITING ---
+
+def test_rate_limit_sliding_window_per_ip_and_email(mock_db):
+    """39. Límite por email y por IP con ventana deslizante: 429 con Retry-After, y se respeta al esperarlo"""
+    import random
+    from types import SimpleNamespace
+    from fastapi import HTTPException
+    from src.services.rate_limit import MemoryBackend, RateLimiter, get_rate_limiter, load_limits
+
+    clock = [60_000 + 30.0]  # A mitad de una ventana de 60 s
+    limiter = RateLimiter(MemoryBackend(), load_limits({"login:email": "3/60", "login:ip": "5/60"}),
+                          clock=lambda: clock[0])
+    app.dependency_overrides[get_rate_limiter] = lambda: limiter
+    mock_db.query.return_value.filter.return_value.first.return_value = None
+
+    async def from_one_ip(scope, receive, send):
+        # El TestClient no rellena la IP del cliente
+        await app({**scope, "client": ("203.0.113.7", 50000)}, receive, send)
+
+    client = TestClient(from_one_ip)
+
+    def login(email):
+        return client.post("/api/v1/auth/login", data={"username": email, "password": "x"})
+
+    assert [login("a@test.com").status_code for _ in range(3)] == [401, 401, 401]
+    blocked = login("A@test.com ")  # El email se normaliza
+    assert blocked.status_code == 429
+    assert blocked.headers["retry-after"] == "60"
+    assert mock_db.query.call_count == 3  # El rechazo no llega a la BD
+
+    # Otro email desde la misma IP: cabe uno más y luego manda el límite por IP
+    assert login("b@test.com").status_code == 401
+    assert login("b@test.com").status_code == 429
+
+    # En la ventana siguiente la anterior solo pesa la mitad
+    clock[0] += 60
+    assert login("a@test.com").status_code == 401
+
+    # Propiedad: tras esperar Retry-After, la siguiente petición siempre se admite
+    request = SimpleNamespace(client=SimpleNamespace(host="10.0.0.1"))
+    for seed in range(20):
+        rng = random.Random(seed)
+        now = [rng.uniform(0, 10_000)]
+        rate = f"{rng.randint(1, 10)}/{rng.choice([10, 60, 900])}"
+        limiter = RateLimiter(MemoryBackend(), load_limits({"support:ip": rate}), clock=lambda: now[0])
+        for _ in range(200):
+            now[0] += rng.expovariate(1.0)
+            try:
+                limiter.check(request, "support")
+            except HTTPException as error:
+                assert error.status_code == 429
+                now[0] += int(error.headers["Retry-After"])
+                limiter.check(request, "support")
@@ -0,0 +1,20 @@
+import os
+from src.scripts.import_benchmark import LAZY_MODULES, measure_import
+
+# Presupuesto de importación de src.main (ms). Ajustable en máquinas lentas de CI.
+IMPORT_BUDGET_MS = float(os.getenv("IMPORT_BUDGET_MS", "3000"))
+
+
+def test_heavy_services_are_not_imported_at_startup():
+    """Firebase, MinIO, SMTP, jose y passlib solo se cargan en su primer uso"""
+    timings = measure_import("src.main")
+
+    loaded = [name for name in LAZY_MODULES if name in timings]
+    assert loaded == []
+
+
+def test_import_time_within_budget():
+    """Importar la aplicación completa no supera el presupuesto de arranque"""
+    timings = measure_import("src.main")
+
+    assert timings["src.main"] / 1000 < IMPORT_BUDGET_MS